@@ -0,0 +1,190 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .comparison import unique_label
+from .controller import DataController
+from .export import EXPORT_FORMATS
+from .formats import AUTO
+
+# Версия формата отчета и файлов сводок
+REPORT_VERSION = 1
+
+
+def capture_files(paths: list[str]) -> list[str]:
+    '''
+    Файлы для обработки: файлы из paths и файлы верхнего уровня
+    папок из paths (как при открытии папки в окне), без повторов.
+
+    Raises:
+        FileNotFoundError: путь не существует
+    '''
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if os.path.isfile(os.path.join(path, name))
+            ))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            raise FileNotFoundError(f'Нет файла или папки {path}')
+    return list(dict.fromkeys(os.path.abspath(path) for path in files))
+
+
+def summarize_file(filepath: str,
+                   num_func: str = AUTO,
+                   convert_path: str | None = None,
+                   with_vi: bool = False,
+                   cache_dir: str | None = None) -> dict:
+    '''
+    Декодирование файла, сводка и статистика каналов; при convert_path
+    все каналы записываются в файл Parquet, HDF5 или CSV. Ошибка записи
+    не отменяет сводку, а сохраняется в error. Выполняется в рабочем
+    процессе, поэтому возвращает только данные для JSON.
+
+    Общий кэш окна не используется: без cache_dir файл декодируется
+    без кэша, иначе кэш ведется в cache_dir.
+
+    Returns:
+        dict: path, packets, duration, start/end (метки времени пакетов, нс),
+        gaps и gap_seconds (пропуски данных), channels, flags (каналы,
+        хранящиеся переходами), stats (см. ChannelStats.result), seconds
+        (время обработки), output и rows (записанный файл), error
+    '''
+    start = time.perf_counter()
+    ctrl = DataController(cache_dir, use_cache=cache_dir is not None)
+    ctrl.read_data_from_file(filepath, num_func)
+    data = ctrl.get_data_main()
+    channels = [name for name, _ in ctrl.get_headers_for_left_menu()]
+    task = ctrl.stats_task()
+    if task is not None:
+        task()
+    gaps = ctrl.get_gaps()
+    summary = {
+        'path': filepath,
+        'packets': len(data),
+        'duration': float(data['time'].iloc[-1]) if len(data) else 0.0,
+        'start': int(data['timestamp'].iloc[0]) if len(data) else None,
+        'end': int(data['timestamp'].iloc[-1]) if len(data) else None,
+        'gaps': len(gaps),
+        'gap_seconds': float((gaps[:, 1] - gaps[:, 0]).sum()),
+        'channels': len(channels),
+        'flags': ctrl.get_flags(),
+        'stats': ctrl.get_stats(),
+        'output': None,
+        'rows': None,
+        'error': None,
+    }
+    if convert_path is not None:
+        try:
+            summary['rows'] = ctrl.export(convert_path, channels, with_vi=with_vi)
+            summary['output'] = convert_path
+        except (OSError, ValueError) as error:
+            summary['error'] = f'Не удалось записать {convert_path}: {error}'
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+
+def run_batch(files: list[str],
+              num_func: str = AUTO,
+              output_dir: str | None = None,
+              convert: str | None = None,
+              with_vi: bool = False,
+              max_workers: int | None = None,
+              progress=None,
+              cache_dir: str | None = None) -> list[dict]:
+    '''
+    Параллельная обработка файлов (см. summarize_file) в рабочих процессах.
+    Ошибка одного файла не прерывает обработку остальных.
+
+    При output_dir сводка каждого файла записывается в output_dir/<имя>.json,
+    а при convert (расширение: .parquet, .h5, .csv) рядом записываются
+    столбцы файла. Одинаковые имена файлов из разных папок различаются
+    номером, как подписи записей для сравнения.
+
+    Args:
+        files (list[str]): пути к файлам
+        num_func (str): формат пакетов из реестра или AUTO
+        output_dir (str | None): папка для сводок и преобразованных файлов
+        convert (str | None): расширение преобразованных файлов
+        with_vi (bool): записывать кадры data_vi в преобразованные файлы
+        max_workers (int | None): количество рабочих процессов
+        progress (callable | None): вызывается как progress(результат файла,
+            обработано файлов, всего файлов)
+        cache_dir (str | None): папка кэша декодирования и статистики,
+            по умолчанию кэш не используется. Общий кэш окна указывать
+            не следует: процессы вытесняли бы из него записи открытых файлов
+
+    Returns:
+        list[dict]: результаты в порядке files: сводка с status 'ok'
+        (или 'error', если не удалось записать преобразованный файл)
+        либо, если файл не прочитан, path, status 'error' и error
+    '''
+    if convert is not None:
+        # неизвестное расширение - ошибка запуска, а не каждого файла
+        convert = '.' + convert.lower().lstrip('.')
+        if convert not in EXPORT_FORMATS:
+            raise ValueError(
+                f'Неизвестный формат преобразования {convert}, допустимы: {", ".join(EXPORT_FORMATS)}'
+            )
+        if output_dir is None:
+            raise ValueError('Для преобразования файлов нужна папка результатов')
+    stems = []
+    for path in files:
+        stems.append(unique_label(os.path.splitext(path)[0], stems))
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    results: list[dict | None] = [None] * len(files)
+    with ProcessPoolExecutor(max_workers or os.cpu_count() or 1) as pool:
+        futures = {}
+        for i, path in enumerate(files):
+            convert_path = None
+            if convert is not None:
+                convert_path = os.path.join(output_dir, stems[i] + convert)
+            future = pool.submit(
+                summarize_file, path, num_func, convert_path, with_vi, cache_dir
+            )
+            futures[future] = i
+        for done, future in enumerate(as_completed(futures), 1):
+            i = futures[future]
+            try:
+                result = future.result()
+                result['status'] = 'ok' if result['error'] is None else 'error'
+            except Exception as error:
+                result = {
+                    'path': files[i], 'status': 'error',
+                    'error': str(error) or type(error).__name__,
+                }
+            if output_dir is not None:
+                result['summary'] = os.path.join(output_dir, stems[i] + '.json')
+                with open(result['summary'], 'w', encoding='utf-8') as f:
+                    json.dump(result, f, ensure_ascii=False, indent=1)
+            results[i] = result
+            if progress is not None:
+                progress(result, done, len(files))
+    return results
+
+
+def batch_report(results: list[dict], num_func: str) -> dict:
+    '''
+    Отчет о пакетной обработке для JSON: версия, формат пакетов,
+    количество обработанных и необработанных файлов и результаты.
+    Статистика каналов, записанная в сводки файлов, в отчет не входит.
+    '''
+    failed = sum(result['status'] != 'ok' for result in results)
+    return {
+        'version': REPORT_VERSION,
+        'format': num_func,
+        'files': len(results),
+        'ok': len(results) - failed,
+        'failed': failed,
+        'results': [
+            {key: value for key, value in result.items()
+             if key != 'stats' or 'summary' not in result}
+            for result in results
+        ],
+    }
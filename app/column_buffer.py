@@ -0,0 +1,113 @@
+import numpy as np
+
+
+def missing_dtype(dtype: np.dtype, row_shape: tuple) -> np.dtype:
+    '''
+    Тип столбца, который есть не во всех строках. Пропуски в одномерных
+    столбцах отмечаются NaN, поэтому они переводятся в тип с плавающей
+    точкой. Пропуски в матрицах заполняются нулями без смены типа.
+    '''
+    if row_shape:
+        return np.dtype(dtype)
+    return np.result_type(dtype, np.float32)
+
+
+def fill_value(dtype: np.dtype):
+    return np.nan if np.dtype(dtype).kind == 'f' else 0
+
+
+def merge_schemas(schemas: list[dict[str, tuple[np.dtype, tuple]]]) -> dict[str, tuple[np.dtype, tuple]]:
+    '''
+    Объединение наборов столбцов {название: (тип, форма строки)}
+    разных форматов пакетов в общий набор.
+    '''
+    merged = {}
+    for schema in schemas:
+        for name, (dtype, row_shape) in schema.items():
+            if name in merged:
+                dtype = np.result_type(merged[name][0], dtype)
+            merged[name] = (np.dtype(dtype), row_shape)
+    return {
+        name: (dtype if all(name in schema for schema in schemas)
+               else missing_dtype(dtype, row_shape), row_shape)
+        for name, (dtype, row_shape) in merged.items()
+    }
+
+
+class ColumnBuffer:
+    '''
+    Набор столбцов с запасом емкости для дописывания данных в конец.
+
+    Представления, выданные columns(), остаются корректными после
+    дописывания: при нехватке емкости выделяются новые массивы,
+    а старые продолжают жить, пока на них есть ссылки.
+
+    Набор столбцов может меняться между вызовами append(): недостающие
+    значения заполняются NaN (в матрицах нулями), а тип столбца
+    при необходимости расширяется так же, как в merge_schemas().
+    '''
+
+    def __init__(self, capacity: int = 0) -> None:
+        '''__init__
+
+        Args:
+            capacity (int): начальная емкость в строках
+        '''
+        self._capacity = capacity
+        self._size = 0
+        self._arrays: dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _grow(self, required: int) -> None:
+        capacity = max(required, self._capacity * 3 // 2, 1024)
+        for name, values in self._arrays.items():
+            new_values = np.empty((capacity,) + values.shape[1:], dtype=values.dtype)
+            new_values[:self._size] = values[:self._size]
+            self._arrays[name] = new_values
+        self._capacity = capacity
+
+    def _conform(self, columns: dict[str, np.ndarray]) -> None:
+        '''
+        Приведение набора и типов столбцов к объединению с дописываемыми.
+        '''
+        for name, values in columns.items():
+            row_shape = values.shape[1:]
+            if name not in self._arrays:
+                dtype = missing_dtype(values.dtype, row_shape) if self._size else values.dtype
+                array = np.empty((self._capacity,) + row_shape, dtype=dtype)
+                array[:self._size] = fill_value(dtype)
+                self._arrays[name] = array
+                continue
+            dtype = np.result_type(self._arrays[name].dtype, values.dtype)
+            if dtype != self._arrays[name].dtype:
+                self._arrays[name] = self._arrays[name].astype(dtype)
+        for name, array in self._arrays.items():
+            if name not in columns:
+                dtype = missing_dtype(array.dtype, array.shape[1:])
+                if dtype != array.dtype:
+                    self._arrays[name] = array.astype(dtype)
+
+    def append(self, columns: dict[str, np.ndarray]) -> None:
+        '''
+        Дописывание строк.
+        '''
+        count = len(next(iter(columns.values())))
+        if not self._arrays:
+            self._capacity = max(self._capacity, count)
+        if self._size + count > self._capacity:
+            self._grow(self._size + count)
+        self._conform(columns)
+        for name, array in self._arrays.items():
+            values = columns.get(name)
+            array[self._size:self._size + count] = (
+                fill_value(array.dtype) if values is None else values
+            )
+        self._size += count
+
+    def columns(self) -> dict[str, np.ndarray]:
+        '''
+        Представления заполненной части столбцов без копирования.
+        '''
+        return {name: values[:self._size] for name, values in self._arrays.items()}
@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+
+
+class ComparedCapture:
+    '''
+    Запись, открытая для сравнения с основной.
+
+    У записи свой контроллер: столбцы из кэша декодирования отображены
+    в память и не копируются, пирамиды прореживания и плитки точек
+    строятся один раз и используются всеми графиками. На графиках время
+    записи сдвигается на offset секунд относительно основной записи.
+    '''
+
+    def __init__(self, label: str, controller, offset: float = 0.0) -> None:
+        '''__init__
+
+        Args:
+            label (str): подпись записи на графиках
+            controller (DataController): контроллер с прочитанной записью
+            offset (float): сдвиг времени записи относительно основной, с
+        '''
+        self.label = label
+        self.ctrl = controller
+        self.offset = offset
+
+    def has_channel(self, name: str) -> bool:
+        return any(header == name for header, _ in self.ctrl.get_headers_for_left_menu() or [])
+
+    def query(self,
+              channels: list[str],
+              t_start: float,
+              t_end: float,
+              max_points: int) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+        '''
+        Точки каналов записи для диапазона времени основной записи
+        (см. DataController.query), время уже сдвинуто на offset.
+        '''
+        points = self.ctrl.query(channels, t_start - self.offset, t_end - self.offset, max_points)
+        return {name: (x + self.offset, y) for name, (x, y) in points.items()}
+
+    def timestamp_offset(self, main) -> float:
+        '''
+        Сдвиг, при котором совпадают метки времени захвата пакетов
+        обеих записей, например для записей одного сеанса разными
+        регистраторами.
+
+        Args:
+            main (DataController): контроллер основной записи
+        '''
+        own, other = self.ctrl.get_data_main(), main.get_data_main()
+        if 'timestamp' not in own or 'timestamp' not in other or not len(own) or not len(other):
+            raise ValueError('В записи нет меток времени пакетов')
+        return (int(own['timestamp'].iloc[0]) - int(other['timestamp'].iloc[0])) / 1e9
+
+
+def unique_label(path: str, labels) -> str:
+    '''
+    Подпись записи по имени файла или папки, не совпадающая с labels.
+    '''
+    base = os.path.basename(os.path.normpath(path)) or path
+    label, number = base, 2
+    while label in labels:
+        label = f'{base} ({number})'
+        number += 1
+    return label
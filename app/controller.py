@@ -1,102 +1,642 @@
+import copy
 import os
+from collections import OrderedDict, namedtuple
+from functools import partial
 
 import numpy as np
 import pandas as pd
 
-from .model import get_data_from_file_1, get_data_from_file_2
+from .column_buffer import ColumnBuffer
+from .decode_cache import DecodeCache
+from .lod import LodPyramid, TileCache, insert_breaks
+from .dir_loader import dir_key, load_dir, load_dir_to_store
+from .export import export_columns
+from .model import (
+    AUTO, column_scales, decoder_version, find_gaps, iter_decode, scale_values, select_layouts
+)
+from .out_of_core import MEMORY_BUDGET, SegmentStore, release_pages
+from .pcap_reader import ReadState
+from .profiling import profiled, span
+from .search import Condition, find_intervals
+from .stats import ChannelStats, StatsCache, update_stats
+from .transitions import Transitions, find_change
+from .waterfall import WaterfallPyramid
+
+# Количество столбцов с примененными коэффициентами, которые держатся в памяти
+SCALED_CACHE_SIZE = 16
+# Количество условий поиска, результаты которых держатся в памяти
+SEARCH_CACHE_SIZE = 16
+
+# Данные, опубликованные чтением: таблица, матрица data_vi, названия каналов
+# в порядке столбцов файла и признаки, хранящиеся переходами (в таблицу
+# не входят). Опубликованный набор не меняется, новые или дописанные данные
+# заменяют его целиком (см. DataController._set_table)
+_Table = namedtuple('_Table', ['data', 'data_vi', 'channels', 'flags'])
+_EMPTY_TABLE = _Table(None, None, [], {})
+
+
+def nearest_indexes(values: np.ndarray, positions):
+    '''
+    Индексы ближайших к positions элементов отсортированного массива values.
+
+    Args:
+        values (np.ndarray): отсортированный по возрастанию непустой массив
+        positions: число или массив чисел
+
+    Returns:
+        индекс или массив индексов той же формы, что и positions
+    '''
+    positions = np.asarray(positions, dtype=np.float64)
+    if len(values) == 1:
+        return np.zeros(positions.shape, dtype=np.intp)
+    right = np.searchsorted(values, positions).clip(1, len(values) - 1)
+    left = right - 1
+    closer_left = np.abs(positions - values[left]) <= np.abs(values[right] - positions)
+    return np.where(closer_left, left, right)
 
 
 class DataController:
-    def __init__(self) -> None:
-        self._data: None | pd.DataFrame = None
+    def __init__(self, cache_dir: str | None = None, use_cache: bool = True) -> None:
+        '''__init__
+
+        Args:
+            cache_dir (str | None): папка кэша декодирования и статистики,
+                по умолчанию общая (см. default_cache_dir)
+            use_cache (bool): брать декодированные файлы и статистику из кэша
+                и сохранять их в кэш
+        '''
+        # файл читается в отдельном потоке, пока графики уже показывают
+        # прочитанную часть: поток чтения только заменяет ссылку на набор
+        # данных, а каждый метод берет ее один раз и работает с одним набором
+        self._table = _EMPTY_TABLE
         self.filepath = None
         self._time_index = 0
+        self.load_errors: list[tuple[str, str]] = []
+        self._lod: dict[str, LodPyramid] = {}
+        self._tiles = TileCache()
+        self._waterfall: WaterfallPyramid | None = None
+        # в таблице хранятся исходные значения, коэффициенты применяются
+        # в get_column(), результат держится в небольшом кэше
+        # вместе с развернутыми в столбцы признаками
+        self._scales: dict[str, float] = {}
+        self._scaled: OrderedDict[str, np.ndarray] = OrderedDict()
+        # пропуски данных и количество строк, для которого они найдены
+        self._gaps: tuple[int, np.ndarray] | None = None
+        # хранилище столбцов на диске для папок, не помещающихся в память
+        self._store: SegmentStore | None = None
+        self.use_cache = use_cache
+        self.cache = DecodeCache(decoder_version(), cache_dir)
+        self.stats_cache = StatsCache(self.cache.cache_dir)
+        # статистика каналов: ключ источника для кэша (None - не кэшируется),
+        # количество учтенных строк, накопители и результат по каналам
+        self._stats_key: dict | None = None
+        self._stats_rows = 0
+        self._stats_parts: dict[str, ChannelStats] = {}
+        self._stats: dict[str, dict] | None = None
+        # интервалы строк, найденные по условиям, и количество строк,
+        # для которого они найдены
+        self._search: OrderedDict[str, tuple[int, np.ndarray]] = OrderedDict()
+        # состояние слежения за дописываемым файлом: буфер столбцов,
+        # положение в файле и формат пакетов
+        self._follow: tuple[ColumnBuffer, ReadState, str] | None = None
 
     def get_all_data(self) -> pd.DataFrame | None:
-        return self._data
+        return self._table.data
 
     def get_data_main(self) -> pd.DataFrame | None:
-        if self._data is None:
+        return self._table.data
+
+    def get_lod(self, name: str, table: _Table | None = None) -> LodPyramid:
+        '''
+        Пирамида прореживания канала. Строится при первом обращении
+        и используется всеми графиками этого канала.
+        '''
+        table = self._table if table is None else table
+        lod = self._lod.get(name)
+        time, values = table.data['time'].to_numpy(), self.get_column(name, table)
+        if lod is None or len(lod) > len(time):
+            lod = LodPyramid(time, values)
+            self._lod[name] = lod
+        elif len(lod) < len(time):
+            # во время чтения файла данные дописываются в конец
+            lod.extend(time, values)
+        return lod
+
+    @profiled('query')
+    def query(self,
+              channels: list[str],
+              t_start: float,
+              t_end: float,
+              max_points: int) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+        '''
+        Прореженные точки каналов для диапазона времени [t_start, t_end]
+        с разрывами на месте пропусков данных (см. LodPyramid.query).
+        Плитки точек хранятся в общем кэше, поэтому возврат к уже
+        показанному диапазону и связанные графики одних каналов
+        не пересчитывают точки.
+
+        Returns:
+            dict[str, tuple[np.ndarray, np.ndarray]]: время и значения каждого канала
+        '''
+        table = self._table
+        gaps = self.get_gaps(table)
+        time = table.data['time'].to_numpy()
+        result = {}
+        for name in channels:
+            flag = table.flags.get(name)
+            if flag is not None:
+                points = flag.query(time, t_start, t_end, max_points)
+            else:
+                points = self.get_lod(name, table).query(t_start, t_end, max_points, self._tiles)
+            result[name] = insert_breaks(*points, gaps)
+        return result
+
+    def get_column(self, name: str, table: _Table | None = None) -> np.ndarray:
+        '''
+        Значения канала с учетом коэффициента. Для каналов с коэффициентом
+        и признаков, хранящихся переходами, значения вычисляются при первом
+        обращении и хранятся в кэше на SCALED_CACHE_SIZE последних каналов;
+        после дописывания данных пересчитывается только новая часть.
+        '''
+        table = self._table if table is None else table
+        flag = table.flags.get(name)
+        if flag is None:
+            values = table.data[name].to_numpy()
+            coef = self._scales.get(name)
+            if coef is None:
+                return values
+            if self._store is not None:
+                return self._store.scaled(name, values, coef)
+            size, tail = len(values), lambda start: scale_values(values[start:], coef)
+        else:
+            size, tail = len(flag), flag.expand
+        scaled = self._scaled.pop(name, None)
+        if scaled is None or len(scaled) > size:
+            scaled = tail(0)
+        elif len(scaled) < size:
+            scaled = np.concatenate((scaled, tail(len(scaled))))
+        self._scaled[name] = scaled
+        if len(self._scaled) > SCALED_CACHE_SIZE:
+            self._scaled.popitem(last=False)
+        return scaled
+
+    def get_flags(self) -> list[str]:
+        '''
+        Битовые признаки: хранящиеся переходами и оставленные столбцами.
+        '''
+        table = self._table
+        return [
+            name for name in table.channels
+            if name in table.flags or table.data[name].dtype == bool
+        ]
+
+    @profiled('table.build')
+    def _set_table(self, columns: dict[str, np.ndarray]) -> None:
+        '''
+        Новые или дописанные столбцы данных. Битовые признаки переводятся
+        в переходы (для дописанных столбцов - только новые строки), если
+        переходы занимают заметно меньше столбца (см. Transitions.is_compact);
+        часто меняющиеся признаки остаются в таблице. Признаки из кэша
+        декодирования приходят уже переходами: кортежами (индексы, значения).
+
+        Вызывается из потока чтения: опубликованный набор данных не меняется,
+        переходы дописываются в копии, а новый набор публикуется одной
+        заменой ссылки self._table.
+        '''
+        previous = self._table
+        data_vi = columns.pop('data_vi')
+        kept = set(previous.channels) - set(previous.flags)
+        channels = [name for name in columns if name not in ('time', 'timestamp')]
+        flags = {}
+        for name, values in list(columns.items()):
+            if isinstance(values, tuple):
+                # переходы из кэша декодирования
+                flags[name] = Transitions.from_runs(*values, len(columns['time']))
+                del columns[name]
+                continue
+            if values.dtype != bool or name in kept:
+                continue
+            flag = previous.flags.get(name)
+            if flag is None or len(flag) > len(values):
+                flag = Transitions(values.dtype)
+            else:
+                # extend заменяет массивы копии, массивы опубликованных переходов не меняются
+                flag = copy.copy(flag)
+            flag.extend(values)
+            if flag.is_compact():
+                flags[name] = flag
+                del columns[name]
+        self._table = _Table(pd.DataFrame(columns, copy=False), data_vi, channels, flags)
+
+    def _reset_derived(self, num_func: str) -> None:
+        '''
+        Сброс данных и величин, вычисленных по прежним данным, перед
+        чтением нового файла или папки. Кэши заменяются новыми, а не
+        очищаются: метод, начатый до сброса, дорабатывает с прежними.
+        '''
+        self._table = _EMPTY_TABLE
+        self._stats_key = None
+        self._stats_rows = 0
+        self._stats_parts = {}
+        self._stats = None
+        self._search = OrderedDict()
+        self._scales = column_scales(num_func)
+        self._scaled = OrderedDict()
+        self._gaps = None
+        self._lod = {}
+        self._tiles = TileCache()
+        self._waterfall = None
+        self._store = None
+
+    def get_gaps(self, table: _Table | None = None) -> np.ndarray:
+        '''
+        Пропуски данных (потерянные пакеты, перерывы записи):
+        матрица (K, 2) с временем начала и конца каждого пропуска.
+        '''
+        table = self._table if table is None else table
+        time = table.data['time'].to_numpy()
+        if self._gaps is None or self._gaps[0] != len(time):
+            self._gaps = (len(time), find_gaps(time))
+        return self._gaps[1]
+
+    def get_stats(self) -> dict[str, dict] | None:
+        '''
+        Статистика каналов (см. ChannelStats.result) или None,
+        если она еще не посчитана.
+        '''
+        return self._stats
+
+    def stats_task(self):
+        '''
+        Расчет статистики каналов для выполнения в отдельном потоке.
+
+        Статистика источника, посчитанная раньше, берется из кэша сразу.
+        Иначе возвращается функция task(progress), которая считает
+        статистику строк, еще не учтенных (после дописывания данных -
+        только новых), по данным на момент вызова stats_task(); результат
+        не сохраняется, если до окончания расчета был открыт другой источник.
+
+        Returns:
+            функция расчета или None, если статистика уже посчитана
+        '''
+        table = self._table
+        if table.data is None:
             return None
-        return self._data.drop('data_vi', axis=1)
+        rows = len(table.data)
+        if self._stats is None and self._stats_key is not None:
+            cached = self.stats_cache.load(self._stats_key)
+            if cached is not None and set(cached) == set(table.channels):
+                self._stats = cached
+                self._stats_rows = rows
+        if self._stats_rows >= rows:
+            return None
+        # опубликованные данные не меняются, поэтому передаются без копирования
+        columns = {
+            name: table.flags[name] if name in table.flags else table.data[name].to_numpy()
+            for name in table.channels
+        }
+        start, parts, key = self._stats_rows, self._stats_parts, self._stats_key
+        scales = dict(self._scales)
+
+        def task(progress=None) -> None:
+            with span('stats'):
+                result = update_stats(columns, start, rows, parts, progress=progress)
+            stats = {
+                name: part.result(scales.get(name, 1.0)) for name, part in result.items()
+            }
+            # накопители заменяются при открытии другого источника
+            if self._stats_parts is not parts:
+                return
+            self._stats_parts, self._stats_rows, self._stats = result, rows, stats
+            if key is not None:
+                self.stats_cache.store(key, stats)
+
+        return task
 
-    def get_data_vi(self) -> pd.DataFrame | None:
-        if self._data is None:
+    def window_stats(self, channels: list[str], t_start: float, t_end: float) -> dict[str, dict]:
+        '''
+        Статистика каналов для диапазона времени [t_start, t_end].
+        '''
+        table = self._table
+        time = table.data['time'].to_numpy()
+        start = int(np.searchsorted(time, t_start, 'left'))
+        stop = int(np.searchsorted(time, t_end, 'right'))
+        columns = {
+            name: table.flags[name] if name in table.flags else table.data[name].to_numpy()
+            for name in channels
+        }
+        return {
+            name: part.result(self._scales.get(name, 1.0))
+            for name, part in update_stats(columns, start, stop).items()
+        }
+
+    def _get_values(self, table: _Table, name: str, start: int, stop: int) -> np.ndarray:
+        '''
+        Значения канала с учетом коэффициента в строках [start, stop).
+        Страницы столбцов на диске освобождаются после чтения.
+        '''
+        flag = table.flags.get(name)
+        if flag is not None:
+            return flag.expand(start, stop)
+        values = table.data[name].to_numpy()
+        coef = self._scales.get(name)
+        part = np.array(values[start:stop]) if coef is None else \
+            scale_values(values[start:stop], coef)
+        release_pages(values)
+        return part
+
+    @profiled('search')
+    def search(self, expression: str) -> np.ndarray:
+        '''
+        Интервалы строк, в которых выполняется условие над каналами
+        (см. Condition), например "EH > 3 and z_RIP == 1". Результаты
+        последних SEARCH_CACHE_SIZE условий хранятся в кэше, поэтому
+        переходы между найденными интервалами ничего не пересчитывают.
+
+        Returns:
+            np.ndarray: матрица (K, 2): первая строка интервала и строка после последней
+
+        Raises:
+            ValueError: ошибка в условии
+        '''
+        table = self._table
+        if table.data is None:
+            raise ValueError('Нет данных для поиска')
+        condition = Condition(expression, table.channels + ['time'])
+        rows = len(table.data)
+        cached = self._search.pop(condition.key, None)
+        if cached is None or cached[0] != rows:
+            get_values = partial(self._get_values, table)
+            cached = (rows, find_intervals(condition, get_values, rows))
+        self._search[condition.key] = cached
+        if len(self._search) > SEARCH_CACHE_SIZE:
+            self._search.popitem(last=False)
+        return cached[1]
+
+    def go_to_hit(self, expression: str, backward=False) -> None:
+        '''
+        Переход к началу следующего (или предыдущего) интервала,
+        в котором выполняется условие. Двоичный поиск по началам интервалов.
+        StopIteration, если интервалов больше нет; индекс при этом не меняется.
+        '''
+        starts = self.search(expression)[:, 0]
+        if backward:
+            i = int(np.searchsorted(starts, self._time_index, 'left')) - 1
+            if i < 0:
+                raise StopIteration
+        else:
+            i = int(np.searchsorted(starts, self._time_index, 'right'))
+            if i >= len(starts):
+                raise StopIteration
+        self._time_index = int(starts[i])
+
+    def get_waterfall(self) -> WaterfallPyramid:
+        '''
+        Пирамида изображений data_vi для водопада, строится при первом обращении.
+        '''
+        table = self._table
+        time = table.data['time'].to_numpy()
+        if self._waterfall is None or len(self._waterfall) > len(time):
+            self._waterfall = WaterfallPyramid(time, table.data_vi)
+        elif len(self._waterfall) < len(time):
+            self._waterfall.extend(time, table.data_vi)
+        return self._waterfall
+
+    def get_data_vi(self) -> np.ndarray | None:
+        '''
+        Кадр data_vi для текущего индекса времени (представление без копирования).
+        '''
+        data_vi = self._table.data_vi
+        if data_vi is None:
             return None
-        data = self._data.iloc[self._time_index]['data_vi']
-        time = np.arange(len(data))
-        return pd.DataFrame({'time': time, 'data_vi': data})
+        return data_vi[self._time_index]
 
-    def get_headers_for_left_menu(self) -> list[tuple[str, int]] | None:
-        if self._data is None:
+    def get_headers_for_left_menu(self) -> list[tuple[str, int | None]] | None:
+        '''
+        Каналы и количество значений канала без NaN (None, пока
+        статистика не посчитана).
+        '''
+        table = self._table
+        if table.data is None:
             return None
-        all_headers = list(self._data.columns)
-        all_headers.remove('data_vi')
-        all_headers.remove('time')
-        all_headers = [(name, len(self._data[name])) for name in all_headers]
-        return all_headers
+        stats = self._stats or {}
+        return [(name, stats[name]['count'] if name in stats else None) for name in table.channels]
 
-    def set_fake_data(self) -> pd.DataFrame:
+    def set_fake_data(self) -> tuple[pd.DataFrame, np.ndarray]:
         # временные данные
         time = np.arange(0, 10, 0.1)
         sin_values = np.sin(time)
-        data_vi = [np.random.rand(25) for _ in time]
+        data_vi = np.random.rand(len(time), 25)
         df = pd.DataFrame(
             {
                 'time': time,
                 'sin': sin_values,
-                'data_vi': data_vi
             })
-        return df
+        return df, data_vi
 
-    def read_data_from_file(self, filepath: str, num_func) -> None:
+    def read_data_from_file(self,
+                            filepath: str,
+                            num_func=AUTO,
+                            progress=None,
+                            follow: bool = False) -> None:
+        '''
+        Чтение файла частями. После каждой части данные уже доступны
+        через контроллер, а progress(прочитано байт, размер файла)
+        сообщает о ходе чтения. Исключение из progress прерывает чтение,
+        прочитанная часть данных при этом сохраняется.
+
+        При follow=True кэш не используется, а после чтения запоминается
+        положение в файле, чтобы read_new_data() дочитывал дописанные записи.
+        '''
         self.filepath = filepath
-        if num_func == '1':
-            self._data = get_data_from_file_1(filepath)
-        else:
-            self._data = get_data_from_file_2(filepath)
+        self._follow = None
+        self._reset_derived(num_func)
+        # ключ вычисляется один раз, до декодирования: хэш содержимого
+        # многогигабайтного файла дорог, а записанные в кэш столбцы должны
+        # соответствовать именно тем байтам, по которым вычислен ключ
+        description = None
+        if self.use_cache and not follow:
+            description = self.cache.describe(filepath, num_func)
+        columns = None if description is None else self.cache.load(description)
+        self._stats_key = description
+        if columns is not None:
+            self._set_table(columns)
+            if progress is not None:
+                size = os.path.getsize(filepath)
+                progress(size, size)
+            return
+        # оценка сверху количества пакетов, чтобы не перевыделять буферы
+        capacity = os.path.getsize(filepath) // (min(select_layouts(num_func)) + 16)
+        buffer = ColumnBuffer(capacity)
+        state = ReadState()
+        for done, total in iter_decode(filepath, num_func, buffer, state=state):
+            self._set_columns(buffer)
+            if progress is not None:
+                progress(done, total)
+        if follow:
+            self._follow = (buffer, state, num_func)
+        elif description is not None:
+            # признаки сохраняются переходами: кэш меньше, а при повторном
+            # открытии столбцы признаков не читаются и не просматриваются
+            columns = buffer.columns()
+            columns.update(
+                (name, (flag.starts, flag.values)) for name, flag in self._table.flags.items()
+            )
+            self.cache.store(description, columns)
         # self._data = self.get_fake_data()
 
-    def read_data_from_dir(self, dirpath: str) -> None:
+    def _set_columns(self, buffer: ColumnBuffer) -> None:
+        self._set_table(buffer.columns())
+
+    def is_following(self) -> bool:
+        return self._follow is not None
+
+    def read_new_data(self) -> int:
+        '''
+        Декодирование записей, дописанных в файл после предыдущего чтения
+        в режиме слежения. Неполная запись в конце файла откладывается
+        до следующего вызова. Если текущий кадр был последним,
+        он переносится на новый последний кадр.
+
+        Returns:
+            int: количество новых строк
+        '''
+        if self._follow is None:
+            return 0
+        buffer, state, num_func = self._follow
+        if os.path.getsize(self.filepath) <= state.pos:
+            return 0
+        count = len(buffer)
+        for _ in iter_decode(self.filepath, num_func, buffer, state=state):
+            pass
+        if len(buffer) == count:
+            return 0
+        self._set_columns(buffer)
+        if self._time_index == count - 1:
+            self._time_index = len(buffer) - 1
+        return len(buffer) - count
+
+    def read_data_from_dir(self,
+                           dirpath: str,
+                           num_func=AUTO,
+                           progress=None,
+                           out_of_core: bool | None = None,
+                           memory_budget: int = MEMORY_BUDGET) -> None:
+        '''
+        Чтение всех файлов папки в порядке времени первого пакета.
+        Ошибки отдельных файлов сохраняются в self.load_errors.
+
+        Папка, файлы которой вместе больше memory_budget (или при
+        out_of_core=True), читается в хранилище столбцов на диске
+        (см. load_dir_to_store): графики, поиск по времени и кадры data_vi
+        читают с диска только нужные части.
+        '''
         self.filepath = dirpath
-        data = []
-        files = [f for f in os.listdir(dirpath) if os.path.isfile(os.path.join(dirpath, f))]
-        for file in files:
-            filepath = os.path.join(dirpath, file)
-            try:
-                file_data = get_data_from_file2(filepath)
-            except:
-                continue
-            else:
-                data.append(file_data)
-        self._data = pd.concat(data, ignore_index=True)
-        if self._data is None:
-            raise ValueError
-        self._data['time'] = np.arange(0, len(self._data)*0.002, 0.002)
+        self._reset_derived(num_func)
+        if out_of_core is None:
+            size = sum(
+                entry.stat().st_size for entry in os.scandir(dirpath) if entry.is_file()
+            )
+            out_of_core = size > memory_budget
+        if out_of_core:
+            self._store = SegmentStore.for_dir(dirpath, self.cache.cache_dir)
+            data, data_vi, self.load_errors = load_dir_to_store(
+                dirpath, self._store, num_func, progress, memory_budget=memory_budget
+            )
+            # хранилище входит в размер кэша декодирования
+            self.cache.clean()
+        else:
+            data, data_vi, self.load_errors = load_dir(dirpath, num_func, progress)
+        columns = {name: data[name].to_numpy() for name in data.columns}
+        del data
+        columns['data_vi'] = data_vi
+        self._set_table(columns)
+        if self.use_cache:
+            self._stats_key = dir_key(dirpath, num_func)
+
+    def export(self,
+               filepath: str,
+               columns: list[str],
+               t_range: tuple[float, float] | None = None,
+               with_vi: bool = False,
+               progress=None) -> int:
+        '''
+        Запись каналов диапазона времени в файл Parquet, HDF5 или CSV
+        (см. export_columns). Используются данные на момент вызова,
+        поэтому запись можно выполнять в отдельном потоке.
+        '''
+        table = self._table
+        if table.data is None:
+            raise ValueError('Нет данных для экспорта')
+        return export_columns(
+            filepath, table.data, table.data_vi, self._scales, columns,
+            t_range, with_vi, flags=table.flags, progress=progress
+        )
+
+    def get_indexes_on_pos_x(self, positions) -> np.ndarray | None:
+        '''
+        Индексы ближайших по времени отсчетов для набора координат x.
+        Двоичный поиск по отсортированному столбцу времени.
+        '''
+        data = self._table.data
+        if data is None or not len(data):
+            return None
+        return nearest_indexes(data['time'].to_numpy(), positions)
 
     def get_value_on_pos_x(self, pos_x=None):
-        if self._data is None:
+        data = self._table.data
+        if data is None or not len(data):
             return None
-        time_col = self._data['time']
-        if pos_x:
-            self._time_index = (time_col - pos_x).abs().idxmin()
-        return time_col.iloc[self._time_index]
+        time_col = data['time'].to_numpy()
+        if pos_x is not None:
+            self._time_index = int(nearest_indexes(time_col, pos_x))
+        return time_col[self._time_index]
+
+    def get_time_index(self) -> int:
+        return self._time_index
 
     def set_next_time_index(self, backward=False, num=1) -> None:
-        if self._data is None:
+        data = self._table.data
+        if data is None:
             raise ValueError
         if backward:
             self._time_index -= num
         else:
             self._time_index += num
-        if self._time_index >= len(self._data):
-            self._time_index = len(self._data) - 1
+        if self._time_index >= len(data):
+            self._time_index = len(data) - 1
             raise StopIteration
         if self._time_index < 0:
             self._time_index = 0
             raise StopIteration
 
+    def go_to_transition(self, channels: list[str] | None = None, backward=False) -> None:
+        '''
+        Переход к ближайшему изменению значения признаков channels
+        (по умолчанию всех признаков) после текущего индекса времени
+        или до него. Для признаков, хранящихся переходами, - двоичный
+        поиск по индексам переходов.
+        StopIteration, если изменений больше нет; индекс при этом не меняется.
+        '''
+        table = self._table
+        if table.data is None:
+            raise ValueError
+        if channels is None:
+            channels = self.get_flags()
+        found = []
+        for name in channels:
+            flag = table.flags.get(name)
+            if flag is not None:
+                index = flag.next_transition(self._time_index, backward)
+            else:
+                index = find_change(table.data[name].to_numpy(), self._time_index, backward)
+            if index is not None:
+                found.append(index)
+        if not found:
+            raise StopIteration
+        self._time_index = max(found) if backward else min(found)
+
 
 if __name__ == '__main__':
     ctrl = DataController()
-    print(ctrl._data)
+    print(ctrl.get_data_main())
@@ -0,0 +1,264 @@
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from .profiling import profiled
+
+# Размер блоков, по которым считается хэш содержимого файла
+_HASH_BLOCK = 1 << 20
+_META = 'meta.json'
+# Версия формата записи: записи другого формата декодируются заново
+_FORMAT = 2
+# Папка хранилищ папок с данными (см. out_of_core.SegmentStore)
+DIRS_DIR = 'dirs'
+# Папка статистики каналов (см. stats.StatsCache)
+STATS_DIR = 'stats'
+
+
+def default_cache_dir() -> str:
+    return os.environ.get(
+        'VIDGRAPHICS_CACHE_DIR',
+        os.path.join(os.path.expanduser('~'), '.cache', 'vidgraphics')
+    )
+
+
+def content_hash(filepath: str) -> str:
+    '''
+    Хэш содержимого файла по начальному, среднему и последнему блокам.
+    Полное чтение многогигабайтного файла заняло бы столько же,
+    сколько само декодирование.
+    '''
+    size = os.path.getsize(filepath)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(filepath, 'rb') as f:
+        for offset in sorted({0, max(0, size // 2 - _HASH_BLOCK // 2),
+                              max(0, size - _HASH_BLOCK)}):
+            f.seek(offset)
+            digest.update(f.read(_HASH_BLOCK))
+    return digest.hexdigest()
+
+
+def key_name(key: dict) -> str:
+    '''
+    Имя записи по ключу источника данных.
+    '''
+    return hashlib.blake2b(json.dumps(key, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+
+class DecodeCache:
+    '''
+    Кэш декодированных столбцов на диске.
+
+    Каждая запись хранится в отдельной папке в виде .npy файлов,
+    которые при повторном открытии отображаются в память.
+    Запись определяется путем, размером, временем изменения,
+    хэшем содержимого файла, функцией распаковки и версией декодера.
+    При превышении max_bytes удаляются давно не использованные записи.
+    Хранилища папок в cache_dir/dirs и статистика каналов в cache_dir/stats
+    входят в тот же размер и удаляются по тем же правилам; статистика
+    источника удаляется и вместе с его записью.
+    '''
+
+    def __init__(self,
+                 version: int | str,
+                 cache_dir: str | None = None,
+                 max_bytes: int = 4 * 2**30) -> None:
+        '''__init__
+
+        Args:
+            version (int | str): версия декодера, записи других версий не используются
+            cache_dir (str | None): папка кэша
+            max_bytes (int): максимальный суммарный размер записей
+        '''
+        self.version = version
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+
+    def describe(self, filepath: str, num_func: str) -> dict:
+        '''
+        Ключ записи: путь, размер, время изменения и хэш содержимого файла,
+        функция распаковки и версия декодера.
+        '''
+        filepath = os.path.abspath(filepath)
+        stat = os.stat(filepath)
+        return {
+            'path': filepath,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'hash': content_hash(filepath),
+            'num_func': str(num_func),
+            'version': self.version,
+        }
+
+    def _entries(self) -> list[tuple[str, str, dict]]:
+        '''
+        Записи кэша, хранилища папок и файлы статистики: путь, путь
+        к описанию и описание. Время изменения описания служит временем
+        последнего обращения к записи.
+        '''
+        paths = []
+        for directory in (self.cache_dir, os.path.join(self.cache_dir, DIRS_DIR)):
+            if os.path.isdir(directory):
+                paths.extend(
+                    (os.path.join(directory, name), os.path.join(directory, name, _META))
+                    for name in os.listdir(directory)
+                )
+        stats_dir = os.path.join(self.cache_dir, STATS_DIR)
+        if os.path.isdir(stats_dir):
+            paths.extend(
+                (os.path.join(stats_dir, name),) * 2
+                for name in os.listdir(stats_dir) if name.endswith('.json')
+            )
+        entries = []
+        for path, meta_path in paths:
+            try:
+                with open(meta_path, encoding='utf-8') as f:
+                    entries.append((path, meta_path, json.load(f)))
+            except (OSError, ValueError):
+                continue
+        return entries
+
+    def _remove(self, path: str, meta: dict) -> None:
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            with contextlib.suppress(OSError):
+                os.remove(path)
+        if 'key' in meta:
+            with contextlib.suppress(OSError):
+                os.remove(os.path.join(self.cache_dir, STATS_DIR, key_name(meta['key']) + '.json'))
+
+    @profiled('cache.load')
+    def load(self,
+             description: dict) -> dict[str, np.ndarray | tuple[np.ndarray, np.ndarray]] | None:
+        '''
+        Столбцы из кэша, отображенные в память, или None, если записи нет.
+        Признаки, сохраненные переходами, возвращаются кортежами
+        (индексы переходов, значения), как были переданы в store().
+
+        Args:
+            description (dict): ключ записи (см. describe)
+        '''
+        path = os.path.join(self.cache_dir, key_name(description))
+        meta_path = os.path.join(path, _META)
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta['key'] != description:
+                return None
+            if meta.get('format') != _FORMAT:
+                raise ValueError(meta.get('format'))
+            runs = set(meta['runs'])
+            columns = {
+                name: tuple(
+                    np.load(os.path.join(path, f'{i}.{part}.npy'), mmap_mode='r')
+                    for part in ('starts', 'values')
+                ) if name in runs
+                else np.load(os.path.join(path, f'{i}.npy'), mmap_mode='r')
+                for i, name in enumerate(meta['columns'])
+            }
+        except (OSError, ValueError, KeyError):
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+        # время изменения meta.json служит временем последнего обращения
+        os.utime(meta_path)
+        return columns
+
+    @profiled('cache.store')
+    def store(self,
+              description: dict,
+              columns: dict[str, np.ndarray | tuple[np.ndarray, np.ndarray]]) -> None:
+        '''
+        Сохранение столбцов в кэш. Вместо столбца можно передать кортеж
+        (индексы переходов, значения) признака, хранящегося переходами:
+        он сохраняется и загружается без разворачивания в столбец.
+        Ошибки записи не прерывают работу.
+
+        Ключ description вычисляется до декодирования, по тем же байтам,
+        что декодировались; если размер или время изменения файла с тех пор
+        изменились, запись не сохраняется.
+
+        Args:
+            description (dict): ключ записи (см. describe)
+            columns (dict): столбцы и переходы признаков
+        '''
+        tmp = None
+        try:
+            stat = os.stat(description['path'])
+            if (stat.st_size, stat.st_mtime_ns) != (description['size'], description['mtime_ns']):
+                return
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = os.path.join(self.cache_dir, key_name(description))
+            tmp = tempfile.mkdtemp(dir=self.cache_dir, prefix='.tmp')
+            nbytes = 0
+            runs = []
+            for i, (name, values) in enumerate(columns.items()):
+                if isinstance(values, tuple):
+                    runs.append(name)
+                    files = dict(zip((f'{i}.starts.npy', f'{i}.values.npy'), values))
+                else:
+                    files = {f'{i}.npy': values}
+                for file_name, array in files.items():
+                    array = np.ascontiguousarray(array)
+                    np.save(os.path.join(tmp, file_name), array)
+                    nbytes += array.nbytes
+            meta = {
+                'key': description,
+                'format': _FORMAT,
+                'columns': list(columns),
+                'runs': runs,
+                'nbytes': nbytes,
+            }
+            with open(os.path.join(tmp, _META), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(tmp, path)
+        except OSError:
+            if tmp is not None:
+                shutil.rmtree(tmp, ignore_errors=True)
+            return
+        self.clean()
+
+    def clean(self) -> None:
+        '''
+        Удаление записей других версий декодера и давно не использованных
+        записей сверх max_bytes.
+        '''
+        self.invalidate()
+        self.evict()
+
+    def evict(self) -> None:
+        '''
+        Удаление давно не использованных записей сверх max_bytes.
+        Последняя использованная запись не удаляется, даже если она
+        одна больше max_bytes: она может быть открыта прямо сейчас.
+        '''
+        entries = []
+        for path, meta_path, meta in self._entries():
+            try:
+                atime = os.path.getmtime(meta_path)
+                nbytes = meta['nbytes'] if 'nbytes' in meta else os.path.getsize(meta_path)
+            except OSError:
+                continue
+            entries.append((atime, path, nbytes, meta))
+        entries.sort(key=lambda entry: entry[0])
+        total = sum(entry[2] for entry in entries)
+        for _, path, nbytes, meta in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            self._remove(path, meta)
+            total -= nbytes
+
+    def invalidate(self, all_versions: bool = False) -> None:
+        '''
+        Удаление записей, созданных другой версией декодера,
+        либо всех записей при all_versions=True.
+        '''
+        for path, _, meta in self._entries():
+            if all_versions or meta.get('key', {}).get('version') != self.version:
+                self._remove(path, meta)
@@ -0,0 +1,116 @@
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import (QCheckBox, QFileDialog, QHBoxLayout, QPushButton,
+                             QTableWidget, QTableWidgetItem, QVBoxLayout, QWidget)
+
+from .profiling import PROFILER
+
+# Период обновления таблицы, мс
+REFRESH_INTERVAL = 1000
+# Столбцы таблицы: заголовок и ключ в Profiler.summary()
+COLUMNS = [
+    ('Интервал', None), ('Кол-во', 'count'), ('Всего, мс', 'total'),
+    ('Среднее, мс', 'mean'), ('p50, мс', 'p50'), ('p95, мс', 'p95'),
+    ('Макс, мс', 'max'), ('Гистограмма', 'histogram'),
+]
+# Символы столбиков гистограммы по возрастанию высоты
+_BARS = ' ▁▂▃▄▅▆▇█'
+
+
+def histogram_text(histogram: list[int]) -> str:
+    '''
+    Гистограмма строкой столбиков от первой до последней непустой корзины,
+    с границами в микросекундах, например "4мкс ▂█▃ 32мкс".
+    '''
+    used = [index for index, count in enumerate(histogram) if count]
+    if not used:
+        return ''
+    first, last = used[0], used[-1]
+    top = max(histogram)
+    bars = ''.join(
+        _BARS[-(-count * (len(_BARS) - 1) // top)] for count in histogram[first:last + 1]
+    )
+    low = (1 << first) >> 1
+    return f'{low}мкс {bars} {1 << last}мкс'
+
+
+class DiagnosticsWindow(QWidget):
+    '''
+    Окно диагностики: статистика интервалов общего сборщика
+    (см. profiling.PROFILER), включение сбора, сброс и сохранение
+    в JSON или Chrome trace. Пока окно открыто, таблица обновляется
+    каждые REFRESH_INTERVAL мс.
+    '''
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent, Qt.Window)
+        self.setWindowTitle('Диагностика')
+        self.resize(760, 360)
+        self.enabled_box = QCheckBox('Сбор интервалов')
+        self.enabled_box.setChecked(PROFILER.enabled)
+        self.enabled_box.toggled.connect(PROFILER.enable)
+        reset_button = QPushButton('Сбросить')
+        reset_button.clicked.connect(self.reset)
+        json_button = QPushButton('Сохранить JSON')
+        json_button.clicked.connect(self.save_json)
+        trace_button = QPushButton('Сохранить Chrome trace')
+        trace_button.clicked.connect(self.save_trace)
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.enabled_box)
+        buttons.addStretch()
+        for button in (reset_button, json_button, trace_button):
+            buttons.addWidget(button)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels([title for title, _ in COLUMNS])
+        self.table.verticalHeader().hide()
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout = QVBoxLayout(self)
+        layout.addLayout(buttons)
+        layout.addWidget(self.table)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event) -> None:
+        self.enabled_box.setChecked(PROFILER.enabled)
+        self.refresh()
+        self.timer.start(REFRESH_INTERVAL)
+        super().showEvent(event)
+
+    def hideEvent(self, event) -> None:
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self) -> None:
+        summary = PROFILER.summary()
+        self.table.setRowCount(len(summary))
+        for row, (name, values) in enumerate(summary.items()):
+            for column, (_, key) in enumerate(COLUMNS):
+                if key is None:
+                    text = name
+                elif key == 'histogram':
+                    text = histogram_text(values[key])
+                elif key == 'count':
+                    text = str(values[key])
+                else:
+                    text = f'{values[key]:.3f}'
+                item = QTableWidgetItem(text)
+                if key not in (None, 'histogram'):
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+        self.table.resizeColumnsToContents()
+
+    def reset(self) -> None:
+        PROFILER.reset()
+        self.refresh()
+
+    def save_json(self) -> None:
+        path, _ = QFileDialog.getSaveFileName(self, 'Сохранить статистику', '', 'JSON (*.json)')
+        if path:
+            PROFILER.dump_json(path)
+
+    def save_trace(self) -> None:
+        path, _ = QFileDialog.getSaveFileName(
+            self, 'Сохранить Chrome trace', '', 'Chrome trace (*.json)')
+        if path:
+            PROFILER.dump_chrome_trace(path)
@@ -0,0 +1,369 @@
+import os
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+
+from .column_buffer import fill_value, merge_schemas
+from .model import AUTO, decoder_version, get_data_from_file, packet_times, select_layouts
+from .out_of_core import MEMORY_BUDGET, SegmentStore, chunk_rows, release_pages
+from .pcap_reader import iter_packets, scan_packets
+
+DirData = namedtuple('DirData', ['data', 'data_vi', 'errors'])
+
+# Блок разделяемой памяти для одного столбца одного файла
+_Block = namedtuple('_Block', ['column', 'name', 'dtype', 'shape'])
+
+
+def _scan_file(filepath: str, num_func: str) -> tuple[dict[int, int], int | None]:
+    return scan_packets(filepath, select_layouts(num_func))
+
+
+def _decode_file(filepath: str, num_func: str, blocks: list[_Block]) -> None:
+    '''
+    Декодирование файла в рабочем процессе с записью столбцов
+    в блоки разделяемой памяти, созданные основным процессом.
+    Столбцы форматов, которых нет в файле, заполняются пропусками.
+    '''
+    df, data_vi = get_data_from_file(filepath, num_func)
+    count = len(df)
+    for block in blocks:
+        if count != block.shape[0]:
+            raise ValueError(
+                f'Количество пакетов изменилось: {count} != {block.shape[0]}'
+            )
+        shm = SharedMemory(name=block.name)
+        try:
+            target = np.ndarray(block.shape, block.dtype, buffer=shm.buf)
+            if block.column == 'data_vi':
+                target[...] = data_vi
+            elif block.column in df:
+                target[...] = df[block.column].to_numpy()
+            else:
+                target[...] = fill_value(target.dtype)
+        finally:
+            shm.close()
+
+
+def _decode_file_to_store(filepath: str,
+                          num_func: str,
+                          paths: dict[str, str],
+                          start: int,
+                          count: int,
+                          chunk_size: int) -> None:
+    '''
+    Декодирование файла в рабочем процессе частями по chunk_size пакетов
+    прямо в столбцы хранилища, строки start..start + count.
+    '''
+    layouts = select_layouts(num_func)
+    targets = {column: np.load(path, mmap_mode='r+') for column, path in paths.items()}
+    pos, stop = start, start + count
+    for segments, _, _ in iter_packets(filepath, layouts, chunk_size):
+        for packet_len, packets in segments:
+            size = len(packets.data)
+            if pos + size > stop:
+                raise ValueError(f'Количество пакетов изменилось: больше {count}')
+            columns = layouts[packet_len].decode(packets)
+            columns['timestamp'] = packets.timestamps
+            for column, target in targets.items():
+                values = columns.get(column)
+                target[pos:pos + size] = fill_value(target.dtype) if values is None else values
+            pos += size
+        for target in targets.values():
+            release_pages(target)
+    if pos != stop:
+        raise ValueError(f'Количество пакетов изменилось: {pos - start} != {count}')
+
+
+def _list_files(dirpath: str) -> list[str]:
+    return sorted(
+        os.path.join(dirpath, f) for f in os.listdir(dirpath)
+        if os.path.isfile(os.path.join(dirpath, f))
+    )
+
+
+def _scan_dir(pool, files: list[str], num_func: str, errors: list) -> tuple[list, dict]:
+    '''
+    Количество пакетов и метка времени первого пакета каждого файла.
+
+    Returns:
+        tuple[list, dict]: файлы с пакетами (первая метка времени, путь,
+        количество пакетов) в порядке времени и общий набор столбцов
+        всех форматов, встретившихся в папке, со столбцом timestamp
+    '''
+    scans = {pool.submit(_scan_file, path, num_func): path for path in files}
+    found = []
+    layouts = select_layouts(num_func)
+    lengths = set()
+    for future, path in scans.items():
+        try:
+            counts, start = future.result()
+        except Exception as error:
+            errors.append((path, str(error)))
+            continue
+        if counts:
+            found.append((start, path, sum(counts.values())))
+            lengths.update(counts)
+    found.sort()
+    if not found:
+        raise ValueError('В папке нет файлов с данными')
+    schema = merge_schemas(
+        [layout.schema for length, layout in layouts.items() if length in lengths]
+    )
+    # время пересчитывается от первого пакета папки после сборки
+    schema['timestamp'] = (np.dtype(np.int64), ())
+    return found, schema
+
+
+def _create_blocks(schema: dict, count: int) -> tuple[list[_Block], list[SharedMemory]]:
+    blocks, handles = [], []
+    for column, (dtype, row_shape) in schema.items():
+        shape = (count,) + row_shape
+        size = max(int(np.prod(shape)) * dtype.itemsize, 1)
+        shm = SharedMemory(create=True, size=size)
+        handles.append(shm)
+        blocks.append(_Block(column, shm.name, dtype.str, shape))
+    return blocks, handles
+
+
+def _release(handles: list[SharedMemory]) -> None:
+    for shm in handles:
+        shm.close()
+        shm.unlink()
+
+
+def load_dir(dirpath: str,
+             num_func: str = AUTO,
+             progress=None,
+             max_workers: int | None = None) -> DirData:
+    '''
+    Параллельное чтение всех файлов папки.
+
+    Сначала в рабочих процессах определяется количество пакетов и метка
+    времени первого пакета каждого файла, файлы упорядочиваются по времени
+    и под них выделяются итоговые массивы. Затем файлы декодируются
+    в рабочих процессах, результаты передаются через разделяемую память
+    и копируются в итоговые массивы на свое место. Время отсчитывается
+    от метки времени первого пакета папки.
+
+    Args:
+        dirpath (str): путь к папке
+        num_func (str): формат пакетов из реестра или AUTO
+        progress (callable | None): вызывается как progress(прочитано байт, всего байт)
+            после каждого файла, исключение из него прерывает чтение
+        max_workers (int | None): количество рабочих процессов
+
+    Returns:
+        DirData: таблица, матрица data_vi и список ошибок (путь, текст ошибки)
+    '''
+    files = _list_files(dirpath)
+    errors = []
+    max_workers = max_workers or os.cpu_count() or 1
+    if os.name == 'posix':
+        # рабочие процессы должны использовать тот же resource_tracker,
+        # иначе подключенные к блокам процессы посчитают их утечкой
+        resource_tracker.ensure_running()
+    with ProcessPoolExecutor(max_workers) as pool:
+        found, schema = _scan_dir(pool, files, num_func, errors)
+        offsets = np.cumsum([0] + [count for _, _, count in found])
+        result = {
+            column: np.empty((offsets[-1],) + row_shape, dtype=dtype)
+            for column, (dtype, row_shape) in schema.items()
+        }
+        failed = []
+        pending = {}
+        queue = list(enumerate(found))
+        sizes = [os.path.getsize(path) for _, path, _ in found]
+        done = 0
+        try:
+            # в памяти одновременно держатся блоки не более чем 2 * max_workers файлов
+            while queue or pending:
+                while queue and len(pending) < 2 * max_workers:
+                    i, (_, path, count) = queue.pop(0)
+                    blocks, handles = _create_blocks(schema, count)
+                    future = pool.submit(_decode_file, path, num_func, blocks)
+                    pending[future] = (i, path, blocks, handles)
+                completed, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    i, path, blocks, handles = pending.pop(future)
+                    try:
+                        future.result()
+                        for block, shm in zip(blocks, handles):
+                            result[block.column][offsets[i]:offsets[i + 1]] = np.ndarray(
+                                block.shape, block.dtype, buffer=shm.buf
+                            )
+                    except Exception as error:
+                        errors.append((path, str(error)))
+                        failed.append(i)
+                    finally:
+                        _release(handles)
+                    done += sizes[i]
+                    if progress is not None:
+                        progress(done, sum(sizes))
+        finally:
+            for future, (_, _, _, handles) in pending.items():
+                future.cancel()
+                _release(handles)
+
+    if failed:
+        keep = np.ones(offsets[-1], dtype=bool)
+        for i in failed:
+            keep[offsets[i]:offsets[i + 1]] = False
+        result = {column: values[keep] for column, values in result.items()}
+        if not keep.any():
+            raise ValueError('Не удалось прочитать ни одного файла')
+
+    data_vi = result.pop('data_vi')
+    result['time'] = packet_times(result['timestamp'], result['timestamp'][0])
+    return DirData(pd.DataFrame(result, copy=False), data_vi, errors)
+
+
+def _dir_key(files: list[str], num_func: str) -> dict:
+    stats = [os.stat(path) for path in files]
+    return {
+        # списки, а не кортежи: ключ сравнивается с прочитанным из JSON
+        'files': [
+            [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+            for path, stat in zip(files, stats)
+        ],
+        'num_func': str(num_func),
+        'version': decoder_version(),
+    }
+
+
+def dir_key(dirpath: str, num_func: str) -> dict:
+    '''
+    Ключ содержимого папки: пути, размеры и время изменения файлов,
+    функция распаковки и версия декодера.
+    '''
+    return _dir_key(_list_files(dirpath), num_func)
+
+
+def _compact(columns: dict[str, np.ndarray], segments: list[tuple[str, int, int]], rows: int) -> list:
+    '''
+    Сдвиг прочитанных сегментов (путь, первая строка, количество строк)
+    к началу столбцов частями по rows строк, на место строк файлов,
+    которые не удалось прочитать.
+
+    Returns:
+        list: сегменты с новыми номерами первых строк
+    '''
+    pos = 0
+    result = []
+    for path, start, count in segments:
+        if start != pos:
+            for part in range(0, count, rows):
+                end = min(part + rows, count)
+                for values in columns.values():
+                    values[pos + part:pos + end] = values[start + part:start + end]
+                    release_pages(values)
+        result.append((path, pos, count))
+        pos += count
+    return result
+
+
+def load_dir_to_store(dirpath: str,
+                      store: SegmentStore,
+                      num_func: str = AUTO,
+                      progress=None,
+                      max_workers: int | None = None,
+                      memory_budget: int = MEMORY_BUDGET) -> DirData:
+    '''
+    Чтение папки, не помещающейся в память, в хранилище столбцов на диске.
+
+    Порядок тот же, что в load_dir, но рабочие процессы записывают
+    декодированные пакеты частями прямо в отображенные в память столбцы
+    хранилища, а после каждой части возвращают страницы системе. Размер
+    частей и количество процессов выбираются по memory_budget. Если
+    файлы папки не изменились с прошлого чтения, хранилище открывается
+    без декодирования.
+
+    Returns:
+        DirData: таблица и матрица data_vi поверх файлов хранилища
+        и список ошибок (путь, текст ошибки)
+    '''
+    files = _list_files(dirpath)
+    key = _dir_key(files, num_func)
+    columns = store.load(key)
+    if columns is None:
+        columns = _fill_store(files, key, store, num_func, progress, max_workers, memory_budget)
+    elif progress is not None:
+        progress(1, 1)
+    data_vi = columns.pop('data_vi')
+    errors = [tuple(error) for error in store.meta['errors']]
+    return DirData(pd.DataFrame(columns, copy=False), data_vi, errors)
+
+
+def _fill_store(files: list[str],
+                key: dict,
+                store: SegmentStore,
+                num_func: str,
+                progress,
+                max_workers: int | None,
+                memory_budget: int) -> dict[str, np.ndarray]:
+    '''
+    Декодирование файлов папки в новое хранилище.
+    '''
+    errors = []
+    max_packet = max(select_layouts(num_func))
+    # на процесс приходится часть пакетов, их декодированные столбцы и биты
+    max_workers = max_workers or os.cpu_count() or 1
+    max_workers = max(min(max_workers, memory_budget // (4 * 1024 * max_packet)), 1)
+    chunk_size = min(max(memory_budget // (4 * max_workers * max_packet), 1024), 65536)
+    with ProcessPoolExecutor(max_workers) as pool:
+        found, schema = _scan_dir(pool, files, num_func, errors)
+        offsets = np.cumsum([0] + [count for _, _, count in found])
+        schema['time'] = (np.dtype(np.float64), ())
+        paths = store.create(schema, int(offsets[-1]))
+        targets = {column: path for column, path in paths.items() if column != 'time'}
+        sizes = [os.path.getsize(path) for _, path, _ in found]
+        futures = {
+            pool.submit(
+                _decode_file_to_store, path, num_func, targets,
+                int(offsets[i]), count, chunk_size
+            ): i
+            for i, (_, path, count) in enumerate(found)
+        }
+        segments = []
+        done = 0
+        try:
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    future.result()
+                    segments.append((found[i][1], int(offsets[i]), found[i][2]))
+                except Exception as error:
+                    errors.append((found[i][1], str(error)))
+                done += sizes[i]
+                if progress is not None:
+                    progress(done, sum(sizes))
+        finally:
+            for future in futures:
+                future.cancel()
+
+    columns = {
+        column: np.load(path, mmap_mode='r+') for column, path in paths.items()
+    }
+    row_bytes = sum(values.itemsize * int(np.prod(values.shape[1:])) for values in columns.values())
+    rows = chunk_rows(row_bytes, memory_budget)
+    segments = _compact(columns, sorted(segments, key=lambda segment: segment[1]), rows)
+    count = sum(segment[2] for segment in segments)
+    if not count:
+        raise ValueError('Не удалось прочитать ни одного файла')
+
+    timestamps, time = columns['timestamp'], columns['time']
+    previous = 0.0
+    for pos in range(0, count, rows):
+        end = min(pos + rows, count)
+        time[pos:end] = packet_times(timestamps[pos:end], timestamps[0], previous)
+        previous = time[end - 1]
+        release_pages(time)
+        release_pages(timestamps)
+    for values in columns.values():
+        values.flush()
+    store.commit(key, list(columns), count, segments, errors)
+    del columns, timestamps, time
+    return store.load(key)
@@ -0,0 +1,237 @@
+import binascii
+import contextlib
+import importlib
+import os
+import secrets
+
+import numpy as np
+import pandas as pd
+
+from .model import scale_values
+
+# Форматы экспорта по расширению файла
+EXPORT_FORMATS = {
+    '.parquet': 'parquet',
+    '.h5': 'hdf5',
+    '.hdf5': 'hdf5',
+    '.csv': 'csv',
+}
+# Количество строк, которые формируются и записываются за один раз
+EXPORT_CHUNK_ROWS = 65536
+# Количество строк CSV с кадрами data_vi, преобразуемых в текст за один раз:
+# строка кадра в тексте в несколько раз больше самого кадра
+_CSV_VI_ROWS = 1024
+
+
+def export_format(filepath: str) -> str:
+    '''
+    Формат экспорта по расширению файла.
+    '''
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext not in EXPORT_FORMATS:
+        raise ValueError(
+            f'Неизвестный формат экспорта {ext or filepath}, '
+            f'допустимы: {", ".join(EXPORT_FORMATS)}'
+        )
+    return EXPORT_FORMATS[ext]
+
+
+def _require(module: str, fmt: str):
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        raise ValueError(f'Для экспорта в {fmt} нужен пакет {module}') from None
+
+
+class _CsvWriter:
+    '''
+    data_vi записывается шестнадцатеричной строкой фиксированной длины.
+    '''
+
+    def __init__(self, filepath: str, columns: dict, samples: int | None, rows: int) -> None:
+        self.filepath = filepath
+        self.samples = samples
+        self.header = True
+
+    def write(self, chunk: dict[str, np.ndarray]) -> None:
+        vi = chunk.pop('data_vi', None)
+        if vi is None:
+            self._write(pd.DataFrame(chunk, copy=False))
+            return
+        for pos in range(0, max(len(vi), 1), _CSV_VI_ROWS):
+            rows = slice(pos, pos + _CSV_VI_ROWS)
+            df = pd.DataFrame({name: values[rows] for name, values in chunk.items()}, copy=False)
+            hex_rows = np.frombuffer(
+                binascii.hexlify(np.ascontiguousarray(vi[rows]).tobytes()),
+                dtype=f'S{2 * self.samples}'
+            )
+            df['data_vi'] = hex_rows.astype(f'U{2 * self.samples}')
+            self._write(df)
+
+    def _write(self, df: pd.DataFrame) -> None:
+        df.to_csv(
+            self.filepath, mode='w' if self.header else 'a', header=self.header, index=False
+        )
+        self.header = False
+
+    def close(self) -> None:
+        pass
+
+
+class _ParquetWriter:
+    '''
+    data_vi записывается столбцом fixed_size_binary.
+    '''
+
+    def __init__(self, filepath: str, columns: dict, samples: int | None, rows: int) -> None:
+        self.pa = _require('pyarrow', 'Parquet')
+        parquet = _require('pyarrow.parquet', 'Parquet')
+        fields = [
+            self.pa.field(name, self.pa.from_numpy_dtype(dtype)) for name, dtype in columns.items()
+        ]
+        if samples is not None:
+            fields.append(self.pa.field('data_vi', self.pa.binary(samples)))
+        self.schema = self.pa.schema(fields)
+        self.samples = samples
+        self.writer = parquet.ParquetWriter(filepath, self.schema)
+
+    def write(self, chunk: dict[str, np.ndarray]) -> None:
+        pa = self.pa
+        vi = chunk.pop('data_vi', None)
+        arrays = [pa.array(values) for values in chunk.values()]
+        if vi is not None:
+            arrays.append(pa.FixedSizeBinaryArray.from_buffers(
+                pa.binary(self.samples), len(vi),
+                [None, pa.py_buffer(np.ascontiguousarray(vi).tobytes())]
+            ))
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class _Hdf5Writer:
+    '''
+    Каждый столбец - отдельный набор данных, data_vi - матрица (N, отсчеты) uint8.
+    Размер наборов известен заранее, части записываются на свое место.
+    '''
+
+    def __init__(self, filepath: str, columns: dict, samples: int | None, rows: int) -> None:
+        h5py = _require('h5py', 'HDF5')
+        self.file = h5py.File(filepath, 'w')
+        chunks = min(max(rows, 1), EXPORT_CHUNK_ROWS)
+        self.datasets = {
+            name: self.file.create_dataset(
+                name, (rows,), dtype=dtype, chunks=(chunks,), maxshape=(None,)
+            )
+            for name, dtype in columns.items()
+        }
+        if samples is not None:
+            self.datasets['data_vi'] = self.file.create_dataset(
+                'data_vi', (rows, samples), dtype=np.uint8,
+                chunks=(min(chunks, 1024), samples), maxshape=(None, samples)
+            )
+        self.pos = 0
+
+    def write(self, chunk: dict[str, np.ndarray]) -> None:
+        count = len(next(iter(chunk.values())))
+        for name, values in chunk.items():
+            self.datasets[name][self.pos:self.pos + count] = values
+        self.pos += count
+
+    def close(self) -> None:
+        self.file.close()
+
+
+_WRITERS = {'csv': _CsvWriter, 'parquet': _ParquetWriter, 'hdf5': _Hdf5Writer}
+
+
+def export_columns(filepath: str,
+                   data: pd.DataFrame,
+                   data_vi: np.ndarray | None,
+                   scales: dict[str, float],
+                   columns: list[str],
+                   t_range: tuple[float, float] | None = None,
+                   with_vi: bool = False,
+                   flags: dict | None = None,
+                   chunk_rows: int = EXPORT_CHUNK_ROWS,
+                   progress=None) -> int:
+    '''
+    Потоковая запись выбранных каналов диапазона времени в файл
+    Parquet, HDF5 или CSV (по расширению). Строки формируются и
+    записываются частями по chunk_rows, поэтому расход памяти не зависит
+    от размера записи. Коэффициенты каналов применяются к каждой части,
+    признаки, хранящиеся переходами, разворачиваются в столбцы тоже частями.
+
+    Args:
+        filepath (str): путь к создаваемому файлу, существующий файл
+            заменяется только после успешной записи
+        data (pd.DataFrame): таблица данных со столбцами time и timestamp
+        data_vi (np.ndarray | None): матрица кадров (N, отсчеты) uint8
+        scales (dict[str, float]): коэффициенты каналов
+        columns (list[str]): каналы для записи
+        t_range (tuple[float, float] | None): диапазон времени, по умолчанию все данные
+        with_vi (bool): записать кадры data_vi
+        flags (dict[str, Transitions] | None): признаки, хранящиеся переходами
+        chunk_rows (int): количество строк в части
+        progress (callable | None): вызывается как progress(записано строк, всего строк),
+            исключение из него прерывает запись
+
+    Returns:
+        int: количество записанных строк
+    '''
+    writer_class = _WRITERS[export_format(filepath)]
+    flags = flags or {}
+    unknown = [name for name in columns if name not in data and name not in flags]
+    if unknown:
+        raise ValueError(f'Нет каналов: {", ".join(unknown)}')
+    time = data['time'].to_numpy()
+    start, stop = 0, len(time)
+    if t_range is not None:
+        start = int(np.searchsorted(time, t_range[0], 'left'))
+        stop = int(np.searchsorted(time, t_range[1], 'right'))
+    names = ['time'] + [name for name in ('timestamp',) if name in data] + [
+        name for name in columns if name not in ('time', 'timestamp')
+    ]
+    sources = {name: flags[name] if name in flags else data[name].to_numpy() for name in names}
+    dtypes = {
+        name: scale_values(values[:0], scales[name]).dtype if name in scales
+        else values.values.dtype if name in flags else values.dtype
+        for name, values in sources.items()
+    }
+    samples = data_vi.shape[1] if with_vi and data_vi is not None else None
+    stop = max(stop, start)
+    total = stop - start
+    # запись идет во временный файл рядом с filepath, который заменяет
+    # filepath только после успешной записи: при отмене или ошибке
+    # существующий файл не портится, а временный удаляется
+    directory, basename = os.path.split(os.path.abspath(filepath))
+    tmp = os.path.join(directory, f'.{basename}.{secrets.token_hex(4)}.tmp')
+    writer = None
+    try:
+        writer = writer_class(tmp, dtypes, samples, total)
+        # при пустом диапазоне записывается только заголовок или схема
+        for pos in range(start, max(stop, start + 1), chunk_rows):
+            end = min(pos + chunk_rows, stop)
+            chunk = {
+                name: scale_values(values[pos:end], scales[name]) if name in scales
+                else values.expand(pos, end) if name in flags
+                else values[pos:end]
+                for name, values in sources.items()
+            }
+            if samples is not None:
+                chunk['data_vi'] = data_vi[pos:end]
+            writer.write(chunk)
+            if progress is not None:
+                progress(end - start, total)
+        writer.close()
+        writer = None
+        os.replace(tmp, filepath)
+    finally:
+        if writer is not None:
+            # ошибка закрытия недописанного файла не заменяет исходную ошибку
+            with contextlib.suppress(Exception):
+                writer.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp)
+    return total
@@ -0,0 +1,23 @@
+import json
+import os
+from functools import lru_cache
+
+# Сведения о форматах пакетов, которые нужны окну при запуске;
+# модуль не импортирует NumPy и pandas (см. model.py)
+
+LAYOUTS_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'resource', 'layouts.json'
+)
+# Выбор формата пакета по его длине
+AUTO = 'auto'
+# Период следования пакетов, с
+PACKET_PERIOD = 0.002
+
+
+@lru_cache(maxsize=None)
+def layout_titles(path: str = LAYOUTS_PATH) -> dict[str, str]:
+    '''
+    Названия форматов реестра и их подписи, без компиляции декодеров.
+    '''
+    with open(path, encoding='utf-8') as f:
+        return {name: description.get('title', name) for name, description in json.load(f).items()}
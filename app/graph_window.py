@@ -1,10 +1,19 @@
 from functools import partial
+from itertools import cycle
 
+import numpy as np
 import pandas as pd
 import pyqtgraph as pg
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import QRectF, Qt, QTimer
 from PyQt5.QtWidgets import QAction, QMenu
 
+from .profiling import profiled
+
+# Задержка пересчета точек после изменения диапазона X, мс
+RANGE_UPDATE_DELAY = 15
+# Стили линий записей для сравнения, по кругу
+COMPARE_STYLES = [Qt.PenStyle.DashLine, Qt.PenStyle.DotLine, Qt.PenStyle.DashDotLine]
+
 
 class BaseGraphWidget(pg.PlotWidget):
     def __init__(self,
@@ -32,6 +41,9 @@ class BaseGraphWidget(pg.PlotWidget):
         self.pos_x = 0
         self.pos_y = 0
         self.region_item = None
+        self.range_timer = QTimer(self)
+        self.range_timer.setSingleShot(True)
+        self.range_timer.timeout.connect(self.update_visible_curves)
         self.getAxis('left').setWidth(50)
         self.create_graph()
 
@@ -57,23 +69,84 @@ class BaseGraphWidget(pg.PlotWidget):
         self.setMenuEnabled(False)
         self.scene().sigMouseClicked.connect(self.mouse_click_event)
         self.scene().sigMouseMoved.connect(self.mouse_moved)
-        self.setClipToView(True)
-        self.setDownsampling(auto=True, mode='peak')
+        self.plot_columns()
+
+        self.display_text = pg.TextItem(text='',color=(255,255,255),anchor=(-0.1, 1))
+        self.addItem(self.display_text)
 
+    def plot_columns(self) -> None:
+        '''
+        Создание кривых для выбранных столбцов.
+        '''
         for item in self.columns:
-            data_for_graph = self.data.dropna(
-                subset=['time', item]).reset_index()
-            ox = data_for_graph.time.to_list()
-            oy = data_for_graph[item].to_list()
+            ox, oy = self.get_curve_data(item)
             pen = pg.mkPen(color=self.colors[0], width=1.5)
-            curve = pg.PlotDataItem(ox, oy, name=item, pen=pen)
+            curve = pg.PlotDataItem(ox, oy, name=item, pen=pen, connect='finite')
             self.curves[f'{item}'] = {'curve': curve, 'pen': pen}
             self.addItem(curve)
             self.colors.append(self.colors.pop(0))
-
-        self.display_text = pg.TextItem(text='',color=(255,255,255),anchor=(-0.1, 1))
-        self.addItem(self.display_text)
+        # точки пересчитываются под видимый диапазон, поэтому автомасштаб
+        # по X выключается, иначе он расширял бы диапазон вслед за данными
+        time = self.data['time']
+        if len(time):
+            self.setXRange(time.iloc[0], time.iloc[-1])
+        self.getPlotItem().vb.disableAutoRange(axis=pg.ViewBox.XAxis)
+        self.getPlotItem().vb.sigXRangeChanged.connect(self.schedule_update)
   
+    def get_curve_data(self, item: str, x_range=None) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        Точки канала для видимого диапазона, прореженные до ширины графика,
+        с разрывами линии на месте пропусков данных.
+        '''
+        if x_range is None:
+            x_range = (-np.inf, np.inf)
+        return self.ctrl.query([item], x_range[0], x_range[1], self.max_points())[item]
+
+    def max_points(self) -> int:
+        return 2 * max(int(self.getPlotItem().vb.width()), 500)
+
+    def schedule_update(self) -> None:
+        '''
+        Отложенный пересчет точек после изменения диапазона X: изменения,
+        пришедшие за RANGE_UPDATE_DELAY мс (перетаскивание, связанные
+        графики, воспроизведение), обрабатываются одним пересчетом.
+        '''
+        if not self.range_timer.isActive():
+            self.range_timer.start(RANGE_UPDATE_DELAY)
+
+    @profiled('graph.update')
+    def update_visible_curves(self) -> None:
+        self.range_timer.stop()
+        x_range = self.viewRange()[0]
+        points = self.ctrl.query(self.columns, x_range[0], x_range[1], self.max_points())
+        for item, data in points.items():
+            self.curves[item]['curve'].setData(*data)
+
+    def refresh_data(self) -> None:
+        '''
+        Перечитывание данных из контроллера, например после
+        завершения чтения файла, начатого до построения графика.
+        '''
+        self.data = self.get_data()
+        self.update_visible_curves()
+
+    def extend_data(self) -> None:
+        '''
+        Продление кривых после дописывания данных в режиме слежения
+        за файлом. Если был виден конец данных, диапазон сдвигается
+        вслед за новыми данными; связанные графики сдвигаются вместе с ним.
+        '''
+        time = self.data['time']
+        last = time.iloc[-1] if len(time) else None
+        self.data = self.get_data()
+        new_last = self.data['time'].iloc[-1]
+        x_min, x_max = self.viewRange()[0]
+        if last is not None and last <= x_max < new_last:
+            shift = new_last - last
+            self.setXRange(x_min + shift, x_max + shift, padding=0)
+        else:
+            self.update_visible_curves()
+
     def apply_theme(self, color):
         self.setBackground(color)
         legend_color = 'black' if color == 'white' else 'white'
@@ -88,6 +161,7 @@ class BaseGraphWidget(pg.PlotWidget):
             offset=(0, 0)
         )
 
+    @profiled('graph.mouse_move')
     def mouse_moved(self, ev):
         if self.sceneBoundingRect().contains(ev):
             mousePoint = self.getPlotItem().vb.mapSceneToView(ev)
@@ -106,8 +180,8 @@ class BaseGraphWidget(pg.PlotWidget):
 
     def clear_other_display_text(self):
         childs = self.main_window.mdi.subWindowList()
-        for i, child in enumerate(childs, 1):
-            widget = child.findChild(NormalGraphWidget)
+        for child in childs:
+            widget = child.widget()
             if widget is not self:
                 widget.display_text.setText('')
 
@@ -209,9 +283,15 @@ class VidGraphWidget(BaseGraphWidget):
     def get_data(self):
         return self.ctrl.get_data_vi()
 
+    def plot_columns(self) -> None:
+        pen = pg.mkPen(color=self.colors[0], width=1.5)
+        curve = pg.PlotDataItem(self.data, name='data_vi', pen=pen)
+        self.curves['data_vi'] = {'curve': curve, 'pen': pen}
+        self.addItem(curve)
+
     def set_new_data(self) -> None:
-        data = self.get_data()
-        self.curves['data_vi']['curve'].setData(data.time, data['data_vi'])
+        self.data = self.get_data()
+        self.curves['data_vi']['curve'].setData(self.data)
 
     def close(self):
         self.main_window.vid_graph_window = None
@@ -222,6 +302,44 @@ class VidGraphWidget(BaseGraphWidget):
 
 
 class NormalGraphWidget(BaseGraphWidget):
+    def plot_columns(self) -> None:
+        super().plot_columns()
+        self.plot_compared()
+
+    def plot_compared(self) -> None:
+        '''
+        Кривые тех же каналов из записей, открытых для сравнения: цветом
+        канала основной записи, пунктиром своего для каждой записи.
+        Вызывается заново при открытии, закрытии и сдвиге записей.
+        '''
+        for name in [name for name, data in self.curves.items() if 'capture' in data]:
+            self.removeItem(self.curves.pop(name)['curve'])
+        for item in self.columns:
+            color = self.curves[item]['pen'].color()
+            for capture, style in zip(self.main_window.compared.values(), cycle(COMPARE_STYLES)):
+                if not capture.has_channel(item):
+                    continue
+                name = f'{item} [{capture.label}]'
+                pen = pg.mkPen(color=color, width=1.5, style=style)
+                curve = pg.PlotDataItem(name=name, pen=pen, connect='finite')
+                self.curves[name] = {'curve': curve, 'pen': pen, 'capture': capture, 'channel': item}
+                self.addItem(curve)
+        self.update_visible_curves()
+
+    def update_visible_curves(self) -> None:
+        super().update_visible_curves()
+        x_range = self.viewRange()[0]
+        for capture in self.main_window.compared.values():
+            names = {
+                data['channel']: name for name, data in self.curves.items()
+                if data.get('capture') is capture
+            }
+            if not names:
+                continue
+            points = capture.query(list(names), x_range[0], x_range[1], self.max_points())
+            for item, data in points.items():
+                self.curves[names[item]]['curve'].setData(*data)
+
     def mouse_click_event(self, event) -> None:
         if (
             event.button() == Qt.MouseButton.LeftButton
@@ -237,14 +355,15 @@ class NormalGraphWidget(BaseGraphWidget):
         '''
         Метод добавления вертикальной линии.
         '''
-        if self.region_item:
-            self.removeItem(self.region_item)
-            self.region_item = None
-        pen = pg.mkPen('yellow', width=2)
         if pos_x:
             coordinate = self.ctrl.get_value_on_pos_x(pos_x)
         else:
             coordinate = self.ctrl.get_value_on_pos_x()
+        # при воспроизведении линия переносится, а не создается заново
+        if self.region_item:
+            self.region_item.setValue(coordinate)
+            return
+        pen = pg.mkPen('yellow', width=2)
         self.region_item = pg.InfiniteLine(coordinate, movable=False, pen=pen)
         self.addItem(self.region_item)
 
@@ -263,3 +382,51 @@ class NormalGraphWidget(BaseGraphWidget):
         self.parent.close()
         self.main_window.horizontal_windows()
         super().close()
+
+
+class WaterfallGraphWidget(NormalGraphWidget):
+    '''
+    Водопад data_vi: по горизонтали время, по вертикали номер отсчета
+    кадра, цвет - максимум значений кадров, попавших в точку изображения.
+    Изображение пересчитывается под видимый диапазон из пирамиды
+    контроллера. Щелчок левой кнопкой выбирает кадр.
+    '''
+
+    def plot_compared(self) -> None:
+        pass
+
+    def plot_columns(self) -> None:
+        self.image = pg.ImageItem()
+        self.image.setLookupTable(pg.colormap.get('viridis').getLookupTable())
+        self.addItem(self.image)
+        time = self.data['time']
+        if len(time):
+            self.setXRange(time.iloc[0], time.iloc[-1])
+        self.setYRange(0, self.ctrl.get_waterfall().samples, padding=0)
+        self.getPlotItem().vb.disableAutoRange()
+        self.getPlotItem().vb.sigXRangeChanged.connect(self.schedule_update)
+        self.update_visible_curves()
+
+    @profiled('waterfall.update')
+    def update_visible_curves(self) -> None:
+        self.range_timer.stop()
+        waterfall = self.ctrl.get_waterfall()
+        x_range = self.viewRange()[0]
+        max_rows = max(int(self.getPlotItem().vb.width()), 500)
+        image, t_start, t_stop = waterfall.query(x_range[0], x_range[1], max_rows)
+        self.image.setImage(image, autoLevels=False, levels=(0, 255))
+        self.image.setRect(QRectF(t_start, 0, t_stop - t_start, waterfall.samples))
+
+    def mouse_click_event(self, event) -> None:
+        if (
+            event.button() == Qt.MouseButton.LeftButton
+            and not event.double()
+            and event.modifiers() == Qt.KeyboardModifier.NoModifier
+        ):
+            pos_x = self.getPlotItem().vb.mapSceneToView(event.scenePos()).x()
+            self.add_vertical_line(pos_x)
+            self.main_window.update_all_vertical_line()
+            self.main_window.create_vid_graph()
+            event.accept()
+            return
+        super().mouse_click_event(event)
@@ -18,13 +18,33 @@ def get_actions_list() -> list:
     )
     list_action = [
         Action('clear_all_action', 'Очистить окно', None,
-               'Очистить все данные в программе.', None, False, 'clear_main_window'),
+               'Очистить все данные в программе.', None, False, 'clear_all'),
         Action('open_cap_file_action', 'Открыть *.cap', QStyle.SP_FileIcon,
                'Открыть cap файл с данными.', None, False, 'open_cap_file'),
         Action('open_dir_action', 'Открыть папку', QStyle.SP_DirIcon,
                'Открыть директорию с данными.', None, False, 'open_dir'),
+        Action('open_compare_action', 'Открыть запись для сравнения', QStyle.SP_FileDialogContentsView,
+               'Открыть еще один файл и наложить его каналы на графики основной записи',
+               None, False, 'open_compared'),
+        Action('compare_offset_action', 'Сдвиг записи', None,
+               'Задать сдвиг времени записи для сравнения относительно основной',
+               None, False, 'set_compared_offset'),
+        Action('compare_align_action', 'Выровнять по меткам времени', None,
+               'Сдвинуть записи для сравнения так, чтобы совпали метки времени захвата пакетов',
+               None, False, 'align_compared'),
+        Action('close_compare_action', 'Закрыть записи для сравнения', None,
+               'Убрать с графиков все записи для сравнения', None, False, 'close_compared'),
+        Action('follow_file_action', 'Следить за файлом', QStyle.SP_BrowserReload,
+               'Дочитывать данные, дописываемые в открытый файл', None, True, 'follow_file'),
+        Action('export_action', 'Экспорт', QStyle.SP_DialogSaveButton,
+               'Записать отмеченные каналы видимого диапазона в Parquet/HDF5/CSV',
+               'Ctrl+S', False, 'export_data'),
+        Action('export_vi_action', 'Экспортировать кадры data_vi', None,
+               'Добавлять кадры data_vi при экспорте', None, True, None),
         Action('create_graph_action', 'Создать графики', QStyle.SP_DialogYesButton,  # QStyle.SP_ArrowRight
                'Построить графики по отмеченным данным', None, False, 'create_normal_graph'),
+        Action('create_waterfall_action', 'Водопад', QStyle.SP_FileDialogDetailedView,
+               'Построить водопад кадров data_vi по времени', None, False, 'create_waterfall'),
         Action('play_graph_action', 'Включить движение', QStyle.SP_MediaPlay,
                'Включить/Выключить движение данных на графиках', Qt.Key_Space, True, 'play_graph'),
         Action('go_to_next_time_action', 'Следующий кадр', QStyle.SP_MediaSeekForward,
@@ -35,10 +55,25 @@ def get_actions_list() -> list:
                'Переключиться на кадр следующей секунды', 'Right', False, ('go_to_next_time', False, 500)),
         Action('go_to_back_time_500_action', 'Предыдущая секунда', QStyle.SP_MediaSkipBackward,
                'Переключиться на кадр предыдущей секунды', 'Left', False, ('go_to_next_time', True, 500)),
+        Action('go_to_next_transition_action', 'Следующее изменение признака', QStyle.SP_ArrowRight,
+               'Переключиться на следующее изменение отмеченных (или всех) признаков',
+               'Ctrl+Right', False, ('go_to_transition', False)),
+        Action('go_to_back_transition_action', 'Предыдущее изменение признака', QStyle.SP_ArrowLeft,
+               'Переключиться на предыдущее изменение отмеченных (или всех) признаков',
+               'Ctrl+Left', False, ('go_to_transition', True)),
+        Action('go_to_next_hit_action', 'Следующее выполнение условия', QStyle.SP_ArrowDown,
+               'Переключиться на начало следующего интервала, где выполняется условие поиска',
+               'F3', False, ('go_to_hit', False)),
+        Action('go_to_back_hit_action', 'Предыдущее выполнение условия', QStyle.SP_ArrowUp,
+               'Переключиться на начало предыдущего интервала, где выполняется условие поиска',
+               'Shift+F3', False, ('go_to_hit', True)),
         Action('hide_left_menu_action', 'Скрыть левое меню', QStyle.SP_DialogResetButton,
                'Скрыть/показать левое меню', None, True, 'hide_left_menu'),
         Action('exit_action', 'Закрыть приложение', QStyle.SP_LineEditClearButton,
                'Закрыть приложение навсегда', 'Ctrl+Q', False, 'close'),
+        Action('diagnostics_action', 'Диагностика', None,
+               'Длительности чтения, декодирования, построения графиков и кадров воспроизведения',
+               None, False, 'show_diagnostics'),
         Action('about_action', 'О программе', None,
                'О программе', None, False, 'add_cat')
     ]
@@ -58,18 +93,33 @@ def get_menu_dict() -> dict:
             'clear_all_action',
             'open_cap_file_action',
             'open_dir_action',
+            'follow_file_action',
+            'export_action',
+            'export_vi_action',
             'hide_left_menu_action',
             'exit_action'
         ],
         Submenu('Графики', None): [
             'create_graph_action',
+            'create_waterfall_action',
             'play_graph_action',
             'go_to_next_time_action',
             'go_to_back_time_action',
             'go_to_next_time_500_action',
             'go_to_back_time_500_action',
+            'go_to_next_transition_action',
+            'go_to_back_transition_action',
+            'go_to_next_hit_action',
+            'go_to_back_hit_action',
+        ],
+        Submenu('Сравнение', None): [
+            'open_compare_action',
+            'compare_offset_action',
+            'compare_align_action',
+            'close_compare_action',
         ],
         Submenu('Настройки', None): [
+            'diagnostics_action',
             'about_action'
         ]
     }
@@ -86,9 +136,11 @@ def get_toolbar_list() -> list:
     list_toolbar = [
         'open_cap_file_action',
         'open_dir_action',
+        'follow_file_action',
         'create_graph_action',
+        'create_waterfall_action',
         'play_graph_action',
-        'slider',
+        'speed_cmbbox',
         'go_to_next_time_action',
         'go_to_back_time_action',
         'go_to_next_time_500_action',
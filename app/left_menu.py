@@ -3,6 +3,33 @@ from PyQt5.QtGui import QColor, QFont
 from PyQt5.QtWidgets import (QApplication, QMenu, QTreeWidget, QTreeWidgetItem,
                              QTreeWidgetItemIterator)
 
+from .profiling import span
+
+# Столбцы статистики каналов в дереве: заголовок и поле результата
+STATS_COLUMNS = [
+    ('Количество', 'count'), ('Мин', 'min'), ('Макс', 'max'), ('Среднее', 'mean'),
+    ('СКО', 'std'), ('NaN', 'nan'), ('Различных', 'distinct'),
+]
+# Номер первого столбца статистики и столбца количества значений без NaN
+_FIRST_STATS_COLUMN = 1
+_COUNT_COLUMN = _FIRST_STATS_COLUMN
+
+
+class ChannelItem(QTreeWidgetItem):
+    '''
+    Элемент дерева каналов. Столбцы с числами сортируются по значению,
+    элементы без значения - в конце.
+    '''
+
+    def __lt__(self, other: QTreeWidgetItem) -> bool:
+        column = self.treeWidget().sortColumn()
+        if column == 0:
+            return self.text(0) < other.text(0)
+        value, other_value = self.data(column, Qt.UserRole), other.data(column, Qt.UserRole)
+        if value is None or other_value is None:
+            return value is not None
+        return value < other_value
+
 
 class Left_Menu_Tree(QTreeWidget):
     '''Виджет для отображения списка данных в виде дерева'''
@@ -15,8 +42,10 @@ class Left_Menu_Tree(QTreeWidget):
         '''
         super().__init__()
         self.parent = parent
-        self.setColumnCount(2)
-        self.setHeaderLabels(['Название', 'Количество'])
+        self.setColumnCount(_FIRST_STATS_COLUMN + len(STATS_COLUMNS))
+        self.setHeaderLabels(['Название'] + [title for title, _ in STATS_COLUMNS])
+        self.setSortingEnabled(True)
+        self.sortByColumn(0, Qt.AscendingOrder)
         self.setContextMenuPolicy(Qt.CustomContextMenu)
         self.customContextMenuRequested.connect(self.show_context_menu)
         self.itemDoubleClicked.connect(self.handle_item_click)
@@ -32,28 +61,77 @@ class Left_Menu_Tree(QTreeWidget):
         if headers is None:
             self.hide()
             return
-        self.hide()
-        self.clear()
-        headers.sort(key=lambda x: x[0])
-        for name, count in headers:
-            tree_item = QTreeWidgetItem(self)
-            tree_item.setText(0, name)
-            tree_item.setText(1, str(count))
-            tree_item.setFont(1, QFont('Arial', 8, 1, True))
-            if count:
-                tree_item.setForeground(1, QColor('gray'))
-            else:
-                tree_item.setForeground(1, QColor('red'))
-            tree_item.setFlags(tree_item.flags() | Qt.ItemIsUserCheckable)
-            tree_item.setCheckState(0, Qt.Unchecked)
+        with span('tree.build'):
+            self.hide()
+            self.setSortingEnabled(False)
+            self.clear()
+            for name, _ in headers:
+                tree_item = ChannelItem(self)
+                tree_item.setText(0, name)
+                tree_item.setFont(_COUNT_COLUMN, QFont('Arial', 8, 1, True))
+                tree_item.setFlags(tree_item.flags() | Qt.ItemIsUserCheckable)
+                tree_item.setCheckState(0, Qt.Unchecked)
+            self.update_stats()
+
+            self.show()
+            self.resize_columns_to_contents()
+            self.parent.splitter.setSizes([90, 500])
 
-        self.show()
+    def update_counts(self) -> None:
+        """
+        Перестраивает дерево, если изменился набор каналов. Количества
+        значений обновляются вместе со статистикой (см. update_stats).
+        """
+        headers = dict(self.parent.ctrl.get_headers_for_left_menu() or [])
+        names = {self.topLevelItem(i).text(0) for i in range(self.topLevelItemCount())}
+        if names != set(headers):
+            self.update_check_box()
+
+    def update_stats(self, stats: dict[str, dict] | None = None, title: str | None = None) -> None:
+        """
+        Вывод статистики каналов: по умолчанию всех данных из контроллера,
+        либо переданной (например, для видимого диапазона) с пояснением
+        title в заголовке. Каналы с постоянным значением выделяются.
+        """
+        # stats загружает NumPy, поэтому импортируется после открытия данных
+        from .stats import is_flat
+        if stats is None:
+            stats = self.parent.ctrl.get_stats() or {}
+        header = self.headerItem()
+        header.setText(0, 'Название' if title is None else f'Название ({title})')
+        # иначе элементы пересортировываются во время обхода
+        self.setSortingEnabled(False)
+        for i in range(self.topLevelItemCount()):
+            item = self.topLevelItem(i)
+            result = stats.get(item.text(0))
+            for column, (_, field) in enumerate(STATS_COLUMNS, _FIRST_STATS_COLUMN):
+                value = None if result is None else result[field]
+                item.setData(column, Qt.UserRole, value)
+                item.setText(column, self.format_stat(field, value, result))
+            empty = result is not None and not result['count']
+            item.setForeground(_COUNT_COLUMN, QColor('red') if empty else QColor('gray'))
+            flat = result is not None and is_flat(result)
+            item.setData(0, Qt.ForegroundRole, QColor('gray') if flat else None)
+            item.setToolTip(0, 'Значение не меняется' if flat else '')
+        self.setSortingEnabled(True)
         self.resize_columns_to_contents()
-        self.parent.splitter.setSizes([90, 500])
+
+    @staticmethod
+    def format_stat(field: str, value, result: dict | None) -> str:
+        if result is None:
+            return ''
+        if field == 'distinct' and value is None:
+            from .stats import DISTINCT_LIMIT
+            return f'>{DISTINCT_LIMIT}'
+        if value is None:
+            return '-'
+        if field in ('count', 'nan', 'distinct'):
+            return str(value)
+        return f'{value:.6g}'
 
     def resize_columns_to_contents(self) -> None:
-        self.resizeColumnToContents(0)
-        self.resizeColumnToContents(1)
+        for column in range(self.columnCount()):
+            self.resizeColumnToContents(column)
 
     @staticmethod
     def get_info_item(item: QTreeWidgetItem) -> list:
@@ -91,6 +169,12 @@ class Left_Menu_Tree(QTreeWidget):
         menu = QMenu(self)
         uncheck_all_action = menu.addAction('Снять все отметки')
         uncheck_all_action.triggered.connect(self.update_check_box)
+        menu.addSeparator()
+        window_stats_action = menu.addAction('Статистика видимого диапазона')
+        window_stats_action.setEnabled(self.parent.get_visible_range() is not None)
+        window_stats_action.triggered.connect(self.parent.show_window_stats)
+        file_stats_action = menu.addAction('Статистика всех данных')
+        file_stats_action.triggered.connect(lambda: self.update_stats())
 
         menu.exec_(self.viewport().mapToGlobal(position))
 
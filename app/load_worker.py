@@ -0,0 +1,43 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+class LoadCancelled(Exception):
+    '''Чтение данных прервано пользователем.'''
+
+
+class LoadWorker(QObject):
+    '''
+    Выполнение чтения данных в отдельном потоке.
+
+    Функция чтения вызывается как load(progress), где progress(done, total)
+    сообщает о прочитанных байтах. Отмена выполняется исключением
+    LoadCancelled из progress при следующем вызове.
+    '''
+
+    progress = pyqtSignal(object, object)
+    finished = pyqtSignal()
+    cancelled = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, load) -> None:
+        super().__init__()
+        self.load = load
+        self._cancel_requested = False
+
+    def run(self) -> None:
+        try:
+            self.load(self.report)
+        except LoadCancelled:
+            self.cancelled.emit()
+        except Exception as error:
+            self.failed.emit(str(error) or type(error).__name__)
+        else:
+            self.finished.emit()
+
+    def report(self, done: int, total: int) -> None:
+        if self._cancel_requested:
+            raise LoadCancelled
+        self.progress.emit(done, total)
+
+    def cancel(self) -> None:
+        self._cancel_requested = True
@@ -0,0 +1,265 @@
+from collections import OrderedDict
+from functools import partial
+
+import numpy as np
+
+from .out_of_core import release_pages
+
+# Размер блока первого сохраняемого уровня и шаг между уровнями.
+# Более мелкое прореживание быстрее посчитать из исходных данных на лету.
+BASE_BUCKET = 16
+LEVEL_FACTOR = 4
+# Количество исходных значений, обрабатываемых за один раз при построении
+_CHUNK_ROWS = 1 << 20
+# Количество точек (пар точек при прореживании) в плитке и плиток в кэше
+TILE_POINTS = 512
+TILE_CACHE_SIZE = 512
+
+
+def _reduce(mins: np.ndarray, maxs: np.ndarray, factor: int) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Минимумы и максимумы по группам из factor подряд идущих элементов.
+    Последняя группа может быть неполной. NaN пропускаются.
+    '''
+    full = len(mins) // factor * factor
+    out_mins = np.fmin.reduce(mins[:full].reshape(-1, factor), axis=1)
+    out_maxs = np.fmax.reduce(maxs[:full].reshape(-1, factor), axis=1)
+    if full < len(mins):
+        out_mins = np.append(out_mins, np.fmin.reduce(mins[full:]))
+        out_maxs = np.append(out_maxs, np.fmax.reduce(maxs[full:]))
+    return out_mins, out_maxs
+
+
+def _reduce_values(values: np.ndarray, factor: int) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    То же, что _reduce(values, values, factor), частями: исходные значения
+    могут быть столбцом на диске, страницы которого возвращаются системе.
+    '''
+    rows = _CHUNK_ROWS // factor * factor
+    parts = []
+    for pos in range(0, len(values), rows):
+        parts.append(_reduce(values[pos:pos + rows], values[pos:pos + rows], factor))
+        release_pages(values)
+    if len(parts) == 1:
+        return parts[0]
+    return np.concatenate([mins for mins, _ in parts]), np.concatenate([maxs for _, maxs in parts])
+
+
+class LodPyramid:
+    '''
+    Пирамида минимумов и максимумов одного канала для быстрой отрисовки.
+
+    Уровень k хранит минимум и максимум по блокам из
+    BASE_BUCKET * LEVEL_FACTOR**k отсчетов. Для видимого
+    диапазона выбирается самый грубый уровень, не превышающий нужный
+    размер блока, и блоки доагрегируются до ширины графика в пикселях
+    плитками по TILE_POINTS точек.
+    '''
+
+    def __init__(self, time: np.ndarray, values: np.ndarray) -> None:
+        '''__init__
+
+        Args:
+            time (np.ndarray): отсортированный столбец времени
+            values (np.ndarray): значения канала той же длины
+        '''
+        self.time = time[:0]
+        self.values = values[:0]
+        self.levels: list[tuple[int, np.ndarray, np.ndarray]] = []
+        self.extend(time, values)
+
+    def extend(self, time: np.ndarray, values: np.ndarray) -> None:
+        '''
+        Переход к дописанным данным, начало которых совпадает с прежними.
+        На каждом уровне пересчитываются только блоки, затронутые
+        новыми отсчетами.
+        '''
+        start = len(self.time)
+        self.time = time
+        self.values = values
+        # целые и логические значения хранятся без изменений, остальные во float32
+        if values.dtype.kind in 'biu' and values.dtype.itemsize <= 4:
+            dtype = values.dtype
+        else:
+            dtype = np.dtype(np.float32)
+        old_levels = self.levels
+        if old_levels and old_levels[0][1].dtype != dtype:
+            old_levels = []
+        self.levels = []
+        if len(values) <= BASE_BUCKET:
+            return
+        bucket, factor = BASE_BUCKET, BASE_BUCKET
+        mins, maxs = values, values
+        while True:
+            old = old_levels[len(self.levels)] if len(self.levels) < len(old_levels) else None
+            first = start // bucket if old is not None else 0
+            if mins is values:
+                new_mins, new_maxs = _reduce_values(values[first * factor:], factor)
+            else:
+                new_mins, new_maxs = _reduce(mins[first * factor:], maxs[first * factor:], factor)
+            mins, maxs = new_mins.astype(dtype, copy=False), new_maxs.astype(dtype, copy=False)
+            if old is not None:
+                mins = np.concatenate((old[1][:first], mins))
+                maxs = np.concatenate((old[2][:first], maxs))
+            self.levels.append((bucket, mins, maxs))
+            if len(mins) <= LEVEL_FACTOR:
+                break
+            bucket *= LEVEL_FACTOR
+            factor = LEVEL_FACTOR
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(mins.nbytes + maxs.nbytes for _, mins, maxs in self.levels)
+
+    def resolution(self, count: int, max_points: int) -> int:
+        '''
+        Шаг прореживания: количество отсчетов на пару точек (минимум,
+        максимум) для count отсчетов на max_points точек; 1 - без прореживания.
+        Шаг - степень двойки, чтобы при небольшом изменении диапазона
+        он не менялся и посчитанные плитки использовались повторно.
+        '''
+        if count <= max_points:
+            return 1
+        target = -(-int(count) // max(max_points // 2, 1))
+        return 1 << (target - 1).bit_length()
+
+    def tile(self, step: int, index: int) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        Точки плитки index: отсчеты index * TILE_POINTS * step и далее,
+        TILE_POINTS точек (пар точек при прореживании).
+        '''
+        start = index * TILE_POINTS * step
+        end = min(start + TILE_POINTS * step, len(self.time))
+        if step == 1:
+            return self.time[start:end], self.values[start:end].astype(np.float64)
+        bucket, mins, maxs = 1, self.values, self.values
+        for level in self.levels:
+            if level[0] > step:
+                break
+            bucket, mins, maxs = level
+        factor = step // bucket
+        out_mins, out_maxs = _reduce(
+            mins[start // bucket:-(-end // bucket)], maxs[start // bucket:-(-end // bucket)], factor
+        )
+        x = self.time[np.arange(start, end, step)]
+        return np.repeat(x, 2), np.column_stack((out_mins, out_maxs)).ravel().astype(np.float64)
+
+    def query(self,
+              t_start: float,
+              t_end: float,
+              max_points: int,
+              tiles: 'TileCache | None' = None) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        Точки для отрисовки диапазона времени [t_start, t_end].
+
+        Точки собираются из плиток, привязанных к общей сетке, поэтому
+        при сдвиге графика они не меняют положение; с кэшем tiles
+        уже посчитанные плитки не пересчитываются.
+
+        Args:
+            t_start (float): начало диапазона
+            t_end (float): конец диапазона
+            max_points (int): максимальное количество точек, обычно
+                удвоенная ширина графика в пикселях
+            tiles (TileCache | None): кэш плиток
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: время и значения; при прореживании
+            для каждого блока выдаются две точки: минимум и максимум
+        '''
+        size = len(self.time)
+        if not size:
+            return np.empty(0), np.empty(0)
+        # по одному отсчету за краями, чтобы линия доходила до границ графика
+        start = max(int(np.searchsorted(self.time, t_start, 'left')) - 1, 0)
+        end = min(int(np.searchsorted(self.time, t_end, 'right')) + 1, size)
+        step = self.resolution(end - start, max_points)
+        span = TILE_POINTS * step
+        parts = []
+        for index in range(start // span, -(-end // span)):
+            # последняя неполная плитка может измениться после дописывания данных
+            if tiles is None or (index + 1) * span > size:
+                parts.append(self.tile(step, index))
+            else:
+                parts.append(tiles.get((self, step, index), partial(self.tile, step, index)))
+        offset = start // span * span
+        x = np.concatenate([part[0] for part in parts])
+        y = np.concatenate([part[1] for part in parts])
+        # плитки обрезаются до видимых точек
+        points = 1 if step == 1 else 2
+        first = (start - offset) // step * points
+        last = -(-(end - offset) // step) * points
+        x, y = x[first:last], y[first:last]
+        if step > 1:
+            self._clip_edges(x, y, start, end, step)
+        return x, y
+
+    def _clip_edges(self, x: np.ndarray, y: np.ndarray, start: int, end: int, step: int) -> None:
+        '''
+        Крайние блоки привязаны к сетке и выходят за строки [start, end):
+        их минимум и максимум пересчитываются по исходным отсчетам внутри
+        диапазона, иначе на краю графика виден выброс из невидимых данных.
+        Не больше 2 * step отсчетов; x и y изменяются на месте.
+        '''
+        blocks = len(y) // 2
+        if not blocks:
+            return
+        edges = {0: (start, min(start // step * step + step, end))}
+        edges[blocks - 1] = (max((end - 1) // step * step, start), end)
+        for block, (low, high) in edges.items():
+            part = self.values[low:high]
+            y[2 * block] = np.fmin.reduce(part)
+            y[2 * block + 1] = np.fmax.reduce(part)
+            x[2 * block:2 * block + 2] = self.time[low]
+
+
+class TileCache:
+    '''
+    Кэш плиток точек графиков с вытеснением давно не использованных.
+    '''
+
+    def __init__(self, max_tiles: int = TILE_CACHE_SIZE) -> None:
+        self.max_tiles = max_tiles
+        self._tiles: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._tiles)
+
+    def get(self, key, compute):
+        value = self._tiles.get(key)
+        if value is None:
+            value = compute()
+            self._tiles[key] = value
+            if len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+        else:
+            self._tiles.move_to_end(key)
+        return value
+
+    def clear(self) -> None:
+        self._tiles.clear()
+
+
+def insert_breaks(x: np.ndarray, y: np.ndarray, gaps: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Разрывы линии на месте пропусков данных: перед первой точкой после
+    каждого пропуска вставляется точка со значением NaN. Линия, построенная
+    с connect='finite', не соединяет точки по разные стороны пропуска.
+
+    Args:
+        x (np.ndarray): отсортированное время точек
+        y (np.ndarray): значения точек
+        gaps (np.ndarray): пропуски (K, 2): время начала и конца, по возрастанию
+    '''
+    if len(x) < 2 or not len(gaps):
+        return x, y
+    # только пропуски, заканчивающиеся внутри диапазона точек
+    ends = gaps[:, 1]
+    ends = ends[np.searchsorted(ends, x[0], 'right'):np.searchsorted(ends, x[-1], 'right')]
+    index = np.unique(np.searchsorted(x, ends, 'left'))
+    if not len(index):
+        return x, y
+    return np.insert(x, index, x[index - 1]), np.insert(y, index, np.nan)
@@ -1,171 +1,277 @@
-import dpkt
+import hashlib
+import json
+from functools import cached_property, lru_cache
+from typing import Iterator
+
 import numpy as np
 import pandas as pd
 
+from .column_buffer import ColumnBuffer
+from .formats import AUTO, LAYOUTS_PATH, PACKET_PERIOD
+from .pcap_reader import Packets, ReadState, iter_packets
+from .profiling import span
 
+# Увеличивается при любом изменении результата декодирования,
+# чтобы не использовать устаревший кэш
+DECODER_VERSION = 5
+# Промежуток между соседними пакетами больше GAP_FACTOR периодов
+# считается пропуском: потерянные пакеты или перерыв записи
+GAP_FACTOR = 1.5
 
-def get_data_from_file_2(filepath: str) -> pd.DataFrame:
-    try:
-        with open(filepath, 'rb') as f:
-            pcap = dpkt.pcapng.Reader(f)
-            bytes_list = [
-                pkt for _, pkt in pcap if len(pkt) == 1174
-            ]
-    except:
-        try:
-            with open(filepath, 'rb') as f:
-                pcap = dpkt.pcap.Reader(f)
-                bytes_list = [
-                    pkt for _, pkt in pcap if len(pkt) == 1174
-                ]
-        except:
-            raise ValueError
-
-    
-    
-    bytes_str = b''.join(bytes_list)
-
-    dt = np.dtype([
-        ('pack_header', np.uint8, 43),
-        ('data_vi', np.uint8, 1024),
-        ('null_bytes', np.uint8, 2),
-        ('data_main', np.uint16, 12),
-        ('null_bytes2', np.uint8, 81)
-    ])
-    dt = dt.newbyteorder('>')
-
-    data = np.frombuffer(bytes_str, dtype=dt, count=-1)
-
-    columns = [
-        'kom_p', 'at', 'sharu_mean', 'sharu_dev', 'pto1_mean',
-        'pto1_dev', 'zad_strob_prm', 'md_zad', 'E_H_out',
-        'E_A_out', 'E_B_out', 'E_G_out'
-    ]
-    df = pd.DataFrame(data['data_main'], columns=columns, dtype=np.uint16)
-    df['E_H_out'] = df['E_H_out'].astype(np.int16)
-    df['E_A_out'] = df['E_A_out'].astype(np.int16)
-    df['E_B_out'] = df['E_B_out'].astype(np.int16)
-    df['E_G_out'] = df['E_G_out'].astype(np.int16)
-    df['data_vi'] = list(data['data_vi'])
-    df['time'] = np.arange(0, len(df)*0.002, 0.002)
-
-    return df
-
-def unpack_bits(columns, data):
-    result = {}
-    for i, name in enumerate(columns):
-        result[name] = (data & (1 << i)) >> i
-    return result
-
-def get_data_from_file_1(filepath: str) -> pd.DataFrame:
-    try:
-        with open(filepath, 'rb') as f:
-            pcap = dpkt.pcapng.Reader(f)
-            bytes_list = [
-                pkt for _, pkt in pcap if len(pkt) == 1274
-            ]
-    except:
-        try:
-            with open(filepath, 'rb') as f:
-                pcap = dpkt.pcap.Reader(f)
-                bytes_list = [
-                    pkt for _, pkt in pcap if len(pkt) == 1274
-                ]
-        except:
-            raise ValueError
-
-    bytes_str = b''.join(bytes_list)
-
-    dt = np.dtype([
-        ('pack_header', np.uint8, 43),
-        ('data_vi', np.uint8, 1024),
-        ('null_bytes', np.uint8, 2),
-        ('arinc_data', np.uint16, 9),
-        ('bit_data', np.uint8, 9),
-        ('null_bytes2', np.uint8, (1, )),
-        ('data_main', np.int16, 41),
-        ('null_bytes3', np.uint8, 58),
-        ('time_src', np.uint32, (1, )), 
-        ('null_bytes4', np.uint8, 33)
+
+def unpack_bits(columns: list[list[str]], data: np.ndarray) -> pd.DataFrame:
+    '''
+    Распаковка битовых признаков за один проход.
+
+    Args:
+        columns (list[list[str]]): названия битов для каждого байта, от младшего к старшему
+        data (np.ndarray): матрица (N, количество байт) uint8
+
+    Returns:
+        pd.DataFrame: по одному bool столбцу на каждый бит
+    '''
+    bits = np.unpackbits(data, axis=1, bitorder='little').view(bool)
+    names = [name for group in columns for name in group]
+    return pd.DataFrame(bits, columns=names, copy=False)
+
+
+def scale_values(values: np.ndarray, coef: float) -> np.ndarray:
+    '''
+    Значения столбца, умноженные на коэффициент. Результат float32,
+    если исходный тип в него точно помещается (int16, uint8), иначе float64.
+    '''
+    dtype = np.float32 if np.can_cast(values.dtype, np.float32) else np.float64
+    return np.multiply(values, coef, dtype=dtype)
+
+
+class Layout:
+    '''
+    Формат пакета из реестра resource/layouts.json.
+
+    Описание полей (смещение, тип, порядок байт, названия столбцов,
+    коэффициенты, битовые признаки) компилируется один раз в структурный
+    dtype NumPy и план распаковки, по которому пакеты декодируются
+    без обращения к описанию. Столбцы декодируются без коэффициентов,
+    коэффициенты применяются при обращении к столбцу (см. scales).
+    '''
+
+    def __init__(self, name: str, description: dict) -> None:
+        '''__init__
+
+        Args:
+            name (str): название формата в реестре
+            description (dict): описание формата из реестра
+        '''
+        self.name = name
+        self.title = description.get('title', name)
+        self.length = int(description['length'])
+        byte_order = description.get('byte_order', '<')
+        names, formats, offsets = [], [], []
+        # план распаковки: (вид поля, название поля, параметры)
+        self._plan = []
+        # коэффициенты столбцов, отличные от 1
+        self.scales: dict[str, float] = {}
+        for field in description['fields']:
+            dtype = np.dtype(field['type']).newbyteorder(field.get('byte_order', byte_order))
+            if 'bits' in field:
+                if dtype != np.uint8:
+                    raise ValueError(f'{name}: битовое поле {field["name"]} должно быть uint8')
+                width = len(field['bits'])
+                self._plan.append(('bits', field['name'], field['bits']))
+            elif 'columns' in field:
+                width = len(field['columns'])
+                scale = field.get('scale', [1] * width)
+                if len(scale) != width:
+                    raise ValueError(
+                        f'{name}: количество коэффициентов поля {field["name"]} '
+                        f'не совпадает с количеством столбцов'
+                    )
+                self._plan.append(('columns', field['name'], field['columns']))
+                self.scales.update(
+                    (column, float(coef)) for column, coef in zip(field['columns'], scale)
+                    if coef != 1
+                )
+            else:
+                width = int(field.get('count', 1))
+                self._plan.append(('matrix', field['name'], None))
+            names.append(field['name'])
+            formats.append((dtype, (width,)))
+            offsets.append(int(field['offset']))
+        self.dtype = np.dtype({
+            'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': self.length
+        })
+
+    def decode(self, packets: Packets) -> dict[str, np.ndarray]:
+        '''
+        Декодирование пакетов этого формата.
+
+        Returns:
+            dict[str, np.ndarray]: столбцы в исходных типах без коэффициентов,
+            битовые признаки и матрицы (N, count) для полей без названий столбцов
+        '''
+        data = packets.data.view(self.dtype).reshape(-1)
+        columns = {}
+        for kind, name, params in self._plan:
+            values = data[name]
+            native = values.dtype.newbyteorder('=')
+            if kind == 'bits':
+                bits = unpack_bits(params, values)
+                columns.update((column, bits[column].to_numpy()) for column in bits.columns)
+            elif kind == 'columns':
+                for i, column in enumerate(params):
+                    columns[column] = values[:, i].astype(native)
+            else:
+                columns[name] = np.ascontiguousarray(values, dtype=native)
+        return columns
+
+    @cached_property
+    def schema(self) -> dict[str, tuple[np.dtype, tuple]]:
+        '''
+        Типы и формы строк столбцов, которые возвращает decode().
+        '''
+        empty = Packets(
+            np.empty((0, self.length), dtype=np.uint8), np.empty(0, dtype=np.int64)
+        )
+        return {
+            name: (values.dtype, values.shape[1:])
+            for name, values in self.decode(empty).items()
+        }
+
+
+@lru_cache(maxsize=None)
+def get_layouts(path: str = LAYOUTS_PATH) -> dict[str, Layout]:
+    '''
+    Реестр форматов пакетов, загружается и компилируется один раз.
+    '''
+    with open(path, encoding='utf-8') as f:
+        return {name: Layout(name, description) for name, description in json.load(f).items()}
+
+
+@lru_cache(maxsize=None)
+def decoder_version(path: str = LAYOUTS_PATH) -> str:
+    '''
+    Версия декодера вместе с хэшем реестра форматов:
+    после изменения реестра кэш декодирования не используется.
+    '''
+    with open(path, 'rb') as f:
+        digest = hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+    return f'{DECODER_VERSION}.{digest}'
+
+
+def select_layouts(num_func: str = AUTO) -> dict[int, Layout]:
+    '''
+    Форматы, пакеты которых нужно декодировать, по длине пакета.
+
+    Args:
+        num_func (str): название формата из реестра или AUTO для всех форматов
+    '''
+    layouts = get_layouts()
+    if num_func != AUTO:
+        if num_func not in layouts:
+            raise ValueError(f'Неизвестный формат пакетов: {num_func}')
+        return {layouts[num_func].length: layouts[num_func]}
+    selected = {}
+    for layout in layouts.values():
+        if layout.length in selected:
+            raise ValueError(
+                f'Форматы {selected[layout.length].name} и {layout.name} имеют '
+                f'одинаковую длину пакета, выберите формат вручную'
+            )
+        selected[layout.length] = layout
+    return selected
+
+
+def column_scales(num_func: str = AUTO) -> dict[str, float]:
+    '''
+    Коэффициенты столбцов выбранных форматов, отличные от 1.
+    Один и тот же столбец в разных форматах должен иметь один коэффициент.
+    '''
+    scales = {}
+    for layout in select_layouts(num_func).values():
+        for column, coef in layout.scales.items():
+            if scales.setdefault(column, coef) != coef:
+                raise ValueError(f'Столбец {column} имеет разные коэффициенты в разных форматах')
+    return scales
+
+
+def packet_times(timestamps: np.ndarray, origin: int, previous: float = 0.0) -> np.ndarray:
+    '''
+    Время пакетов от начала записи, с.
+
+    Разность с началом считается в целых наносекундах, во float
+    переводится только результат. Время не убывает: пакет с меткой
+    меньше предыдущей (перестановка при захвате, пересекающиеся файлы
+    папки) получает время предыдущего, чтобы по времени работал
+    двоичный поиск.
+
+    Args:
+        timestamps (np.ndarray): метки времени пакетов, нс
+        origin (int): метка времени начала записи, нс
+        previous (float): время предыдущего пакета, с
+    '''
+    time = (timestamps - origin) * 1e-9
+    if len(time):
+        time[0] = max(time[0], previous)
+        np.maximum.accumulate(time, out=time)
+    return time
+
+
+def find_gaps(time: np.ndarray, period: float = PACKET_PERIOD) -> np.ndarray:
+    '''
+    Пропуски данных.
+
+    Returns:
+        np.ndarray: матрица (K, 2) с временем пакета перед пропуском
+        и пакета после него, с
+    '''
+    if len(time) < 2:
+        return np.empty((0, 2))
+    # частями, чтобы не держать разности всего столбца
+    rows = 1 << 20
+    index = np.concatenate([
+        np.flatnonzero(np.diff(time[pos:pos + rows + 1]) > GAP_FACTOR * period) + pos
+        for pos in range(0, len(time) - 1, rows)
     ])
-    dt = dt.newbyteorder('>')
-
-    data = np.frombuffer(bytes_str, dtype=dt, count=-1)
-
-    columns_main = [
-        'MD', 'curr_27V', 'u_36V_C', 'u_36V_A', 'u_36V_B', 
-        'u15V_p_AP', 'u15V_m_AP', 'u27V_del', 'alfa', 
-        'u_5V', 'EA', 'EH', 'current', 'signal_D', 
-        'Unn', 'Una', 'D_analog', 'gamma', 'epsilon', 
-        'psi', 'ARU', 'E_H_ap', 'E_g', 'E_v', 'E_A_ap', 
-        'u_12V', 'u_12V_gnd', 'u_12V_m_018A', 'u_12V_m_018A_gnd', 
-        'u_48V', 'u_48V_gnd', 'u_8V', 'u_8V_gnd', 'u_6V_m_0075A', 
-        'u_6V_m_gnd', 'u_12V_0075A', 'u_12V_0075A_gnd', 'u_6V', 
-        'u_6V_gnd', 'u_6V_m_028A', 'u_6V_m_028A_gnd'
-    ]
-    coef_main = [ 
-        0.01, 1, 1, 1, 1, 
-        1, 1, 1, 1, 1, 
-        0.00244, 0.00244, 1, 0.00488, 1, 
-        1, 0.00488, 0.00244, 0.00244, 0.00244, 
-        1, 0.1, 1, 1, 0.1, 
-        1, 1, 1, 1, 1, 
-        1, 1, 1, 1, 1, 
-        1, 1, 1, 1, 1, 
-        1, 
-    ]
-
-    columns_arinc = [
-        'ARINC_081', 'ARINC_082', 'ARINC_083', 'ARINC_084', 
-        'ARINC_085', 'ARINC_086', 'ARINC_087', 'ARINC_088', 
-        'ARINC_089'	
-    ]
-    columns_bits = [
-        [
-            'z_send_ARINC', 'z_u27_p', 'z_u27_ground', 'z_u27_A', 'z_u27_A1', 'z_u36B_m', 'z_u36A_m', 'z_u15_m'
-        ], 
-        [
-            'z_u15v_p', 'z_u36C_m', 'z_u15V_bk', 'z_off_vob', 'z_off_V', 'z_off_ASU', 'z_block_VP', 'z_off_CU'
-        ], 
-        [
-            'z_vkl_rrch', 'z_PR_27v', 'z_block_AB', 'z_bridge27V', 'z_VPG_27V', 'z_komm_ASD', 'z_block_DP', 'z_sinhro'
-        ], 
-        [
-            'z_RIP', 'z_D5', 'z_DVA1', 'z_DVA2', 'z_DVA3', 'z_DVA4', 'z_kom_vn', 'z_kontr_toka_rzp'
-        ], 
-        [
-            'z_kontr_zahv_apch', 'z_kontr_vn', 'z_EhV', 'z_AV', 'z_PR_U505', 'z_Zg_27V', 'z_Kom_No', 'z_VK'
-        ], 
-        [
-            'z_komm_PP', 'z_kom_mem_ASD', 'z_ASP', 'z_Tg_RAZI', 'z_MD_k', 'z_Tg_ZHO', 'z_ZH_ZH', 'z_Si_k'
-        ],
-        [
-            'z_PPH', 'z_Sh_P2', 'z_izp_k', 'z_izr_k', 'z_strob_RZ', 'z_zona_1', 'z_zona_2', 'z_rpo'
-        ], 
-        [
-            'z_AR', 'z_kom_rg_rv', 'z_sz', 'z_kom_ASD_k', 'z_Tg_ZH_Zh', 'z_kom_vp', 'z_null_1', 'z_null_2'
-        ],
-        [
-            'z_kontrol_27V_m_pit', 'z_kontrol_27V_m', 'z_kontrol_27V_p_pit', 'z_kontrol_27V_p', 'z_kontrol_27V_p_A0', 'z_kontrol_27V_p_A1', 'z_kontrol_27V_p_A2', 'kontrol_27V_p_A3'
-        ]
-    ]
-
-    df = pd.DataFrame(data['data_main'], columns=columns_main, dtype=np.int16)
-    for names, coef in zip(columns_main, coef_main):
-        df[names] = df[names] * coef
-    df['data_vi'] = list(data['data_vi'])
-    df['time_src'] = data['time_src'] / 50_000
-    for i, col in enumerate(columns_arinc):
-        df[col] = data['arinc_data'][:,i].astype(np.uint16)
-    
-    for i, names in enumerate(columns_bits):
-        res = unpack_bits(names, data['bit_data'][:, i])
-        bits_df = pd.DataFrame(data=res)
-        df = df.join(bits_df)
-        # for key, value in res.items():
-        #     df['z_' + key] = value
-
-    df['time'] = np.arange(0, len(df)*0.002, 0.002)
-
-    return df
+    return np.column_stack((time[index], time[index + 1]))
+
+
+def iter_decode(filepath: str,
+                num_func: str,
+                buffer: ColumnBuffer,
+                chunk_size: int = 65536,
+                state: ReadState | None = None) -> Iterator[tuple[int, int]]:
+    '''
+    Декодирование файла частями с дописыванием столбцов в buffer.
+    Каждый пакет декодируется форматом, соответствующим его длине.
+    С state декодируются только записи после сохраненного положения
+    (см. iter_packets). Кроме столбцов формата дописываются метки
+    времени пакетов timestamp (нс) и время от первого пакета time (с).
+
+    Yields:
+        tuple[int, int]: количество пройденных байт и размер файла
+    '''
+    layouts = select_layouts(num_func)
+    for segments, done, total in iter_packets(filepath, layouts, chunk_size, state):
+        for packet_len, packets in segments:
+            if len(buffer):
+                stored = buffer.columns()
+                origin, previous = stored['timestamp'][0], stored['time'][-1]
+            else:
+                origin, previous = packets.timestamps[0], 0.0
+            with span('decode'):
+                columns = layouts[packet_len].decode(packets)
+                columns['timestamp'] = packets.timestamps
+                columns['time'] = packet_times(packets.timestamps, origin, previous)
+                buffer.append(columns)
+        if done == total and not len(buffer):
+            raise ValueError('В файле нет пакетов известных форматов')
+        yield done, total
+
 
+def get_data_from_file(filepath: str, num_func: str = AUTO) -> tuple[pd.DataFrame, np.ndarray]:
+    buffer = ColumnBuffer()
+    for _ in iter_decode(filepath, num_func, buffer):
+        pass
+    columns = buffer.columns()
+    data_vi = columns.pop('data_vi')
+    return pd.DataFrame(columns, copy=False), data_vi
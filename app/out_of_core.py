@@ -0,0 +1,158 @@
+import hashlib
+import json
+import mmap
+import os
+import shutil
+
+import numpy as np
+
+from .decode_cache import DIRS_DIR, default_cache_dir
+from .model import scale_values
+
+# Бюджет резидентной памяти при чтении папок, не помещающихся в память, байт
+MEMORY_BUDGET = int(os.environ.get('VIDGRAPHICS_MEMORY_BUDGET', 2**30))
+_META = 'meta.json'
+
+
+def release_pages(array: np.ndarray) -> None:
+    '''
+    Возврат системе страниц файла, отображенного в память, на котором
+    построен массив. Данные остаются в файле и при следующем обращении
+    читаются заново. Для массивов в памяти ничего не делает.
+    '''
+    base = array
+    while base is not None and not isinstance(base, mmap.mmap):
+        base = getattr(base, '_mmap', None) or getattr(base, 'base', None)
+    if base is not None and hasattr(base, 'madvise') and not base.closed:
+        base.madvise(mmap.MADV_DONTNEED)
+
+
+def chunk_rows(row_bytes: int, memory_budget: int = MEMORY_BUDGET) -> int:
+    '''
+    Количество строк, обрабатываемых за один раз при проходе по столбцам
+    на диске: часть занимает не больше восьмой части бюджета памяти.
+    '''
+    return max(memory_budget // 8 // max(row_bytes, 1), 1024)
+
+
+class SegmentStore:
+    '''
+    Столбцы папки с данными на диске.
+
+    Каждый столбец - один .npy файл, отображаемый в память; файлы папки
+    (сегменты) записываются в него подряд в порядке времени, поэтому
+    вся папка выглядит как одна временная шкала, а обращение к диапазону
+    времени или кадру data_vi читает с диска только нужные страницы.
+    Хранилище переиспользуется, пока не изменились файлы папки.
+    Столбцы с коэффициентами тоже пересчитываются в файлы хранилища.
+
+    Хранилища лежат в папке кэша декодирования: размер файлов записывается
+    в описание (nbytes), а время изменения описания обновляется при каждом
+    открытии, поэтому DecodeCache удаляет их вместе со своими записями.
+    '''
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.meta: dict | None = None
+
+    @classmethod
+    def for_dir(cls, dirpath: str, cache_dir: str | None = None) -> 'SegmentStore':
+        name = hashlib.blake2b(os.path.abspath(dirpath).encode(), digest_size=16).hexdigest()
+        return cls(os.path.join(cache_dir or default_cache_dir(), DIRS_DIR, name))
+
+    def _column_path(self, i: int) -> str:
+        return os.path.join(self.path, f'{i}.npy')
+
+    def load(self, key: dict) -> dict[str, np.ndarray] | None:
+        '''
+        Столбцы, отображенные в память, если хранилище записано для key.
+        '''
+        meta_path = os.path.join(self.path, _META)
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta['key'] != key:
+                return None
+            columns = {
+                name: np.load(self._column_path(i), mmap_mode='r')[:meta['count']]
+                for i, name in enumerate(meta['columns'])
+            }
+            self.meta = meta
+            if 'nbytes' not in meta:
+                # хранилище, записанное до учета его размера в кэше
+                meta['nbytes'] = self._nbytes()
+                self._write_meta()
+            # время последнего обращения для вытеснения из кэша
+            os.utime(meta_path)
+        except (OSError, ValueError, KeyError):
+            return None
+        return columns
+
+    def create(self, schema: dict[str, tuple[np.dtype, tuple]], count: int) -> dict[str, str]:
+        '''
+        Создание пустых столбцов.
+
+        Returns:
+            dict[str, str]: пути к .npy файлам столбцов
+        '''
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.makedirs(self.path)
+        paths = {}
+        for i, (name, (dtype, row_shape)) in enumerate(schema.items()):
+            paths[name] = self._column_path(i)
+            np.lib.format.open_memmap(paths[name], 'w+', dtype, (count,) + row_shape)
+        return paths
+
+    def commit(self, key: dict, columns: list[str], count: int, segments: list, errors: list) -> None:
+        '''
+        Запись описания после заполнения столбцов: до этого хранилище
+        считается незавершенным и не используется.
+        '''
+        self.meta = {
+            'key': key, 'columns': columns, 'count': count,
+            'segments': segments, 'errors': errors, 'nbytes': self._nbytes(),
+        }
+        self._write_meta()
+
+    def _nbytes(self) -> int:
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(self.path) for name in names
+        )
+
+    def _write_meta(self) -> None:
+        path = os.path.join(self.path, _META)
+        with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        os.replace(f'{path}.tmp', path)
+
+    def scaled(self, name: str, values: np.ndarray, coef: float,
+               memory_budget: int = MEMORY_BUDGET) -> np.ndarray:
+        '''
+        Столбец с примененным коэффициентом в файле хранилища.
+        Считается частями при первом обращении.
+        '''
+        path = os.path.join(self.path, 'scaled', f'{name}.npy')
+        try:
+            scaled = np.load(path, mmap_mode='r')
+            if len(scaled) == len(values):
+                return scaled
+        except (OSError, ValueError):
+            pass
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.tmp'
+        dtype = scale_values(values[:0], coef).dtype
+        target = np.lib.format.open_memmap(tmp, 'w+', dtype, (len(values),))
+        rows = chunk_rows(dtype.itemsize + values.dtype.itemsize, memory_budget)
+        for pos in range(0, len(values), rows):
+            target[pos:pos + rows] = scale_values(values[pos:pos + rows], coef)
+            release_pages(target)
+            release_pages(values)
+        target.flush()
+        del target
+        os.replace(tmp, path)
+        if self.meta is not None and os.path.exists(os.path.join(self.path, _META)):
+            # файл столбца входит в размер хранилища при вытеснении
+            self.meta['nbytes'] = self._nbytes()
+            self._write_meta()
+        return np.load(path, mmap_mode='r')
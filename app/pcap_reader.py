@@ -0,0 +1,381 @@
+import math
+import mmap
+from collections import namedtuple
+from itertools import groupby
+from typing import Collection, Iterator
+
+import numpy as np
+
+from .profiling import profiled
+
+Packets = namedtuple('Packets', ['data', 'timestamps'])
+
+PCAP_MAGIC_US = 0xA1B2C3D4
+PCAP_MAGIC_NS = 0xA1B23C4D
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_IDB = 0x00000001
+PCAPNG_EPB = 0x00000006
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+
+# Начальный и максимальный размер пачки заголовков, проверяемой за один раз
+_MIN_CHUNK = 256
+_MAX_CHUNK = 1 << 20
+
+# Отрезок подряд идущих записей одинаковой длины:
+# смещение данных первой записи, шаг между записями, количество,
+# длина данных, метки времени в наносекундах и смещение конца отрезка
+_Run = namedtuple(
+    '_Run', ['offset', 'stride', 'count', 'caplen', 'timestamps', 'end']
+)
+
+
+class ReadState:
+    '''
+    Положение разбора файла, которое позволяет продолжить чтение
+    дописываемого файла с места остановки.
+
+    pos - смещение первой неразобранной записи, все записи до него
+    прочитаны полностью; для pcapng также хранятся порядок байт
+    и разрешение меток времени интерфейсов из уже разобранных блоков.
+    '''
+
+    def __init__(self) -> None:
+        self.pos: int | None = None
+        self.order = '<'
+        self.interfaces: list[tuple[int, int]] = []
+
+
+def _strided(mm, dtype, offset: int, stride: int, count: int) -> np.ndarray:
+    '''
+    Представление значений, лежащих в буфере с постоянным шагом, без копирования.
+    '''
+    return np.ndarray(
+        shape=(count,), dtype=dtype, buffer=mm, offset=offset, strides=(stride,)
+    )
+
+
+def _run_length(values: list[np.ndarray], expected: list[int]) -> int:
+    '''
+    Количество первых элементов, у которых все значения совпадают с ожидаемыми.
+    '''
+    ok = np.ones(len(values[0]), dtype=bool)
+    for value, exp in zip(values, expected):
+        ok &= value == exp
+    bad = np.flatnonzero(~ok)
+    return int(bad[0]) if len(bad) else len(ok)
+
+
+def _iter_runs_pcap(mm, state: ReadState) -> Iterator[_Run]:
+    '''
+    Обход заголовков записей pcap файла пачками средствами NumPy.
+
+    Предполагается, что записи идут подряд с одинаковой длиной:
+    заголовки читаются с постоянным шагом, и принимается префикс
+    до первой записи с другой длиной.
+    '''
+    size = len(mm)
+    magic = int.from_bytes(mm[:4], 'little')
+    if magic in (PCAP_MAGIC_US, PCAP_MAGIC_NS):
+        order = '<'
+    else:
+        order = '>'
+        magic = int.from_bytes(mm[:4], 'big')
+    ts_mult = 1 if magic == PCAP_MAGIC_NS else 1000
+    u4 = np.dtype(order + 'u4')
+
+    pos = state.pos or 24
+    chunk = _MIN_CHUNK
+    while pos + 16 <= size:
+        state.pos = pos
+        caplen = int(np.frombuffer(mm, u4, 1, pos + 8)[0])
+        stride = 16 + caplen
+        if pos + stride > size:
+            break
+        count = min((size - pos) // stride, chunk)
+        lens = _strided(mm, u4, pos + 8, stride, count)
+        count = max(_run_length([lens], [caplen]), 1)
+        chunk = min(chunk * 2, _MAX_CHUNK) if count == len(lens) else _MIN_CHUNK
+        ts_sec = _strided(mm, u4, pos, stride, count).astype(np.int64)
+        ts_frac = _strided(mm, u4, pos + 4, stride, count).astype(np.int64)
+        timestamps = ts_sec * 1_000_000_000 + ts_frac * ts_mult
+        end = pos + stride * count
+        yield _Run(pos + 16, stride, count, caplen, timestamps, end)
+        pos = end
+    state.pos = pos
+
+
+def _idb_resolution(mm, order: str, pos: int, length: int) -> tuple[int, int]:
+    '''
+    Разрешение меток времени интерфейса (опция if_tsresol) в виде
+    несократимой дроби (числитель, знаменатель) перевода единиц
+    в наносекунды.
+    '''
+    end = pos + length - 4
+    opt = pos + 16
+    while opt + 4 <= end:
+        code = int.from_bytes(mm[opt:opt + 2], 'little' if order == '<' else 'big')
+        opt_len = int.from_bytes(mm[opt + 2:opt + 4], 'little' if order == '<' else 'big')
+        if code == 0:
+            break
+        if code == 9 and opt_len >= 1:
+            value = mm[opt + 4]
+            exp = value & 0x7F
+            if value & 0x80:
+                divisor = math.gcd(1_000_000_000, 2 ** exp)
+                return 1_000_000_000 // divisor, 2 ** exp // divisor
+            if exp <= 9:
+                return 10 ** (9 - exp), 1
+            return 1, 10 ** (exp - 9)
+        opt += 4 + (opt_len + 3) // 4 * 4
+    return 1000, 1
+
+
+def _units_to_ns(units: np.ndarray, num: int, den: int) -> np.ndarray:
+    '''
+    Перевод меток времени из единиц интерфейса в целые наносекунды
+    (units * num // den) без промежуточного float64, который при метках
+    от начала эпохи теряет доли микросекунды: целая часть делится
+    отдельно от остатка, поэтому произведения помещаются в int64.
+    '''
+    if den == 1:
+        return units * num
+    whole, rest = np.divmod(units, den)
+    if num * den < 2**63:
+        return whole * num + rest * num // den
+    # разрешение мельче 2**-50 с: точный расчет целыми Python
+    return np.array([int(value) * num // den for value in units], dtype=np.int64)
+
+
+def _iter_runs_pcapng(mm, state: ReadState) -> Iterator[_Run]:
+    '''
+    Обход блоков pcapng файла. Подряд идущие Enhanced Packet Block
+    одинаковой длины проверяются пачками так же, как в _iter_runs_pcap.
+    '''
+    size = len(mm)
+    pos = state.pos or 0
+    order = state.order
+    interfaces = state.interfaces
+    chunk = _MIN_CHUNK
+    while pos + 12 <= size:
+        state.pos, state.order = pos, order
+        u4 = np.dtype(order + 'u4')
+        block_type, block_len = np.frombuffer(mm, u4, 2, pos)
+        block_type, block_len = int(block_type), int(block_len)
+        if block_type == PCAPNG_SHB:
+            bom = int.from_bytes(mm[pos + 8:pos + 12], 'little')
+            order = '<' if bom == PCAPNG_BYTE_ORDER_MAGIC else '>'
+            block_len = int(np.frombuffer(mm, order + 'u4', 1, pos + 4)[0])
+            interfaces = state.interfaces = []
+        if block_len < 12 or block_len % 4 or pos + block_len > size:
+            break
+        if block_type == PCAPNG_IDB:
+            interfaces.append(_idb_resolution(mm, order, pos, block_len))
+        elif block_type == PCAPNG_EPB:
+            iface, = np.frombuffer(mm, u4, 1, pos + 8)
+            caplen, = np.frombuffer(mm, u4, 1, pos + 20)
+            count = min((size - pos) // block_len, chunk)
+            values = [
+                _strided(mm, u4, pos + shift, block_len, count)
+                for shift in (0, 4, 8, 20)
+            ]
+            count = max(_run_length(
+                values, [PCAPNG_EPB, block_len, int(iface), int(caplen)]
+            ), 1)
+            chunk = min(chunk * 2, _MAX_CHUNK) if count == len(values[0]) else _MIN_CHUNK
+            ts_high = _strided(mm, u4, pos + 12, block_len, count).astype(np.int64)
+            ts_low = _strided(mm, u4, pos + 16, block_len, count).astype(np.int64)
+            units = (ts_high << 32) | ts_low
+            num, den = interfaces[iface] if iface < len(interfaces) else (1000, 1)
+            timestamps = _units_to_ns(units, num, den)
+            end = pos + block_len * count
+            yield _Run(pos + 28, block_len, count, int(caplen), timestamps, end)
+            pos = end
+            continue
+        pos += block_len
+    state.pos, state.order = pos, order
+
+
+def _iter_runs(mm, state: ReadState | None = None) -> Iterator[_Run]:
+    '''
+    Обход записей с начала файла или с положения state.
+    После полного обхода state указывает на первую неполную запись.
+    '''
+    if len(mm) < 24:
+        raise ValueError('Файл слишком мал для pcap/pcapng')
+    if state is None:
+        state = ReadState()
+    elif state.pos is not None and state.pos > len(mm):
+        raise ValueError('Файл стал короче прочитанной части')
+    magic = int.from_bytes(mm[:4], 'little')
+    if magic == PCAPNG_SHB:
+        return _iter_runs_pcapng(mm, state)
+    if magic in (PCAP_MAGIC_US, PCAP_MAGIC_NS) or \
+            int.from_bytes(mm[:4], 'big') in (PCAP_MAGIC_US, PCAP_MAGIC_NS):
+        return _iter_runs_pcap(mm, state)
+    raise ValueError('Неизвестный формат файла')
+
+
+def _scan(mm) -> list[_Run]:
+    return list(_iter_runs(mm))
+
+
+def _gather(mm, runs: list[_Run], packet_len: int) -> Packets:
+    '''
+    Копирование данных записей нужной длины в заранее выделенный массив.
+    '''
+    runs = [run for run in runs if run.caplen == packet_len]
+    total = sum(run.count for run in runs)
+    data = np.empty((total, packet_len), dtype=np.uint8)
+    timestamps = np.empty(total, dtype=np.int64)
+    start = 0
+    for run in runs:
+        end = start + run.count
+        data[start:end] = np.ndarray(
+            shape=(run.count, packet_len), dtype=np.uint8, buffer=mm,
+            offset=run.offset, strides=(run.stride, 1)
+        )
+        timestamps[start:end] = run.timestamps
+        start = end
+    return Packets(data, timestamps)
+
+
+def _open(filepath: str) -> mmap.mmap:
+    with open(filepath, 'rb') as f:
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # пустой файл невозможно отобразить в память
+            raise ValueError('Пустой файл')
+
+
+def read_packets(filepath: str, packet_len: int) -> Packets:
+    '''
+    Чтение пакетов заданной длины из pcap/pcapng файла через mmap.
+
+    Args:
+        filepath (str): путь к файлу
+        packet_len (int): длина пакета, остальные пакеты пропускаются
+
+    Returns:
+        Packets: матрица (N, packet_len) uint8 и метки времени в наносекундах
+    '''
+    mm = _open(filepath)
+    try:
+        return _gather(mm, _scan(mm), packet_len)
+    finally:
+        mm.close()
+
+
+def scan_packets(filepath: str, packet_lens: Collection[int]) -> tuple[dict[int, int], int | None]:
+    '''
+    Количество пакетов каждой из заданных длин и метка времени первого
+    из них без копирования данных пакетов.
+    '''
+    mm = _open(filepath)
+    try:
+        runs = [run for run in _scan(mm) if run.caplen in packet_lens]
+    finally:
+        mm.close()
+    counts = {}
+    for run in runs:
+        counts[run.caplen] = counts.get(run.caplen, 0) + run.count
+    return counts, int(runs[0].timestamps[0]) if runs else None
+
+
+def _split_run(run: _Run, size: int) -> Iterator[_Run]:
+    for start in range(0, run.count, size):
+        count = min(size, run.count - start)
+        yield _Run(
+            run.offset + start * run.stride, run.stride, count, run.caplen,
+            run.timestamps[start:start + count],
+            run.end - run.stride * (run.count - start - count)
+        )
+
+
+@profiled('pcap.read')
+def _gather_segments(mm, runs: list[_Run]) -> list[tuple[int, Packets]]:
+    '''
+    Копирование данных записей с объединением подряд идущих записей
+    одинаковой длины в один сегмент.
+    '''
+    return [
+        (caplen, _gather(mm, list(group), caplen))
+        for caplen, group in groupby(runs, key=lambda run: run.caplen)
+    ]
+
+
+def _drop_pages(mm: mmap.mmap) -> None:
+    '''
+    Возврат системе прочитанных страниц файла: пакеты уже скопированы,
+    а без этого резидентная память процесса растет до размера файла.
+    '''
+    if hasattr(mm, 'madvise'):
+        mm.madvise(mmap.MADV_DONTNEED)
+
+
+def iter_packets(filepath: str,
+                 packet_lens: Collection[int],
+                 chunk_size: int = 65536,
+                 state: ReadState | None = None) -> Iterator[tuple[list[tuple[int, Packets]], int, int]]:
+    '''
+    Чтение пакетов заданных длин частями примерно по chunk_size пакетов
+    (не более 2 * chunk_size) за один проход по файлу.
+
+    Часть состоит из сегментов подряд идущих пакетов одной длины
+    в порядке следования в файле. Последней всегда выдается часть,
+    прочитанная до конца файла, даже если она пустая.
+
+    Если передан state, чтение начинается с сохраненного в нем положения,
+    а к последней части state указывает на первую неполную запись,
+    с которой продолжится следующее чтение дописываемого файла.
+
+    Yields:
+        tuple[list[tuple[int, Packets]], int, int]: сегменты (длина пакета, пакеты),
+        количество пройденных байт и размер файла
+    '''
+    mm = _open(filepath)
+    try:
+        size = len(mm)
+        pending = []
+        count = 0
+        for run in _iter_runs(mm, state):
+            if run.caplen not in packet_lens:
+                continue
+            for part in _split_run(run, chunk_size):
+                pending.append(part)
+                count += part.count
+                if count >= chunk_size:
+                    segments = _gather_segments(mm, pending)
+                    _drop_pages(mm)
+                    yield segments, part.end, size
+                    pending = []
+                    count = 0
+        yield _gather_segments(mm, pending), size, size
+    finally:
+        mm.close()
+
+
+def read_packets_dpkt(filepath: str, packet_len: int) -> Packets:
+    '''
+    Прежний способ чтения через dpkt, оставлен для сравнения.
+    '''
+    import dpkt
+
+    def read(reader):
+        with open(filepath, 'rb') as f:
+            pcap = reader(f)
+            return [(ts, pkt) for ts, pkt in pcap if len(pkt) == packet_len]
+
+    try:
+        packets = read(dpkt.pcapng.Reader)
+    except:
+        try:
+            packets = read(dpkt.pcap.Reader)
+        except:
+            raise ValueError
+    bytes_str = b''.join(pkt for _, pkt in packets)
+    data = np.frombuffer(bytes_str, dtype=np.uint8).reshape(-1, packet_len)
+    timestamps = np.array(
+        [round(ts * 1_000_000_000) for ts, _ in packets], dtype=np.int64
+    )
+    return Packets(data, timestamps)
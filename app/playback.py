@@ -0,0 +1,104 @@
+import time
+
+from PyQt5.QtCore import QObject, Qt, QTimer, pyqtSignal
+
+from .formats import PACKET_PERIOD
+
+# Множители скорости воспроизведения
+SPEEDS = [0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100]
+# Частота кадров, если частоту обновления экрана узнать не удалось
+DEFAULT_FPS = 60
+
+
+class PlaybackClock:
+    '''
+    Соответствие между временем на часах и временем данных:
+    за секунду на часах данные проходят speed секунд.
+    '''
+
+    def __init__(self, data_time: float, speed: float = 1, now: float | None = None) -> None:
+        self.speed = speed
+        self._data_time = data_time
+        self._wall_time = time.monotonic() if now is None else now
+
+    def position(self, now: float | None = None) -> float:
+        now = time.monotonic() if now is None else now
+        return self._data_time + (now - self._wall_time) * self.speed
+
+    def set_speed(self, speed: float, now: float | None = None) -> None:
+        '''
+        Смена скорости без скачка текущего положения.
+        '''
+        now = time.monotonic() if now is None else now
+        self._data_time = self.position(now)
+        self._wall_time = now
+        self.speed = speed
+
+
+class PlaybackEngine(QObject):
+    '''
+    Воспроизведение данных в темпе реального времени с множителем скорости.
+
+    Таймер срабатывает раз в кадр экрана, положение в данных вычисляется
+    по прошедшему времени на часах, поэтому при медленной отрисовке
+    промежуточные кадры пропускаются, а не накапливаются. Отрисовка
+    выполняется функцией render(время данных), которая возвращает True,
+    если кадр изменился и был перерисован. Раз в секунду сигнал stats
+    сообщает достигнутую и целевую частоту кадров; целевая частота
+    не больше частоты следования пакетов с учетом скорости.
+    '''
+
+    finished = pyqtSignal()
+    stats = pyqtSignal(float, float)
+
+    def __init__(self, render, get_end, fps: float = DEFAULT_FPS, parent=None) -> None:
+        '''__init__
+
+        Args:
+            render (callable): отрисовка кадра для времени данных
+            get_end (callable): время последнего отсчета данных
+            fps (float): целевая частота кадров
+        '''
+        super().__init__(parent)
+        self.render = render
+        self.get_end = get_end
+        self.fps = fps
+        self.clock: PlaybackClock | None = None
+        self._timer = QTimer(self)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.timeout.connect(self._tick)
+        self._frames = 0
+        self._stats_time = 0.0
+
+    def is_running(self) -> bool:
+        return self._timer.isActive()
+
+    def start(self, data_time: float, speed: float) -> None:
+        self.clock = PlaybackClock(data_time, speed)
+        self._frames = 0
+        self._stats_time = time.monotonic()
+        self._timer.start(max(int(1000 / self.fps), 1))
+
+    def stop(self) -> None:
+        self._timer.stop()
+
+    def set_speed(self, speed: float) -> None:
+        if self.clock is not None:
+            self.clock.set_speed(speed)
+
+    def _tick(self) -> None:
+        data_time = self.clock.position()
+        end = self.get_end()
+        if data_time >= end:
+            self.stop()
+            self.render(end)
+            self.finished.emit()
+            return
+        if self.render(data_time):
+            self._frames += 1
+        now = time.monotonic()
+        if now - self._stats_time >= 1:
+            target = min(self.fps, self.clock.speed / PACKET_PERIOD)
+            self.stats.emit(self._frames / (now - self._stats_time), target)
+            self._frames = 0
+            self._stats_time = now
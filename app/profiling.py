@@ -0,0 +1,178 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Количество последних интервалов, которые сохраняются для Chrome trace
+MAX_EVENTS = 100000
+# Количество корзин гистограммы: корзина k - длительности [2**(k-1), 2**k) мкс
+HISTOGRAM_BINS = 32
+
+
+class _Span:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler: 'Profiler', name: str) -> None:
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self) -> '_Span':
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.profiler.record(self.name, self.start, time.perf_counter_ns() - self.start)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Profiler:
+    '''
+    Сбор длительностей именованных интервалов (чтение, декодирование,
+    кэш, построение дерева и графиков, кадры воспроизведения, движение
+    мыши) в гистограммы по степеням двойки микросекунд и в журнал
+    последних MAX_EVENTS интервалов для Chrome trace.
+
+    Пока сбор выключен, span() возвращает общий пустой контекст,
+    и интервал обходится в одну проверку флага.
+    '''
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter_ns()
+        self.reset()
+
+    def enable(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+
+    def reset(self) -> None:
+        with self._lock:
+            # имя -> [количество, сумма нс, максимум нс, гистограмма]
+            self._spans: dict[str, list] = {}
+            self._events: deque = deque(maxlen=MAX_EVENTS)
+
+    def span(self, name: str):
+        '''
+        Контекст, длительность которого записывается под именем name.
+        '''
+        return _Span(self, name) if self.enabled else _NULL_SPAN
+
+    def record(self, name: str, start: int, duration: int) -> None:
+        '''
+        Запись интервала.
+
+        Args:
+            name (str): имя интервала
+            start (int): начало по time.perf_counter_ns()
+            duration (int): длительность, нс
+        '''
+        bin_index = min((duration // 1000).bit_length(), HISTOGRAM_BINS - 1)
+        with self._lock:
+            entry = self._spans.get(name)
+            if entry is None:
+                entry = self._spans[name] = [0, 0, 0, [0] * HISTOGRAM_BINS]
+            entry[0] += 1
+            entry[1] += duration
+            entry[2] = max(entry[2], duration)
+            entry[3][bin_index] += 1
+            self._events.append((name, threading.get_ident(), start, duration))
+
+    def summary(self) -> dict[str, dict]:
+        '''
+        Статистика интервалов в миллисекундах. Процентили оцениваются
+        по гистограмме: верхняя граница корзины, не больше максимума.
+
+        Returns:
+            dict[str, dict]: для каждого имени count, total, mean, p50, p95, max
+            и histogram (количество интервалов по корзинам)
+        '''
+        with self._lock:
+            spans = {name: (*entry[:3], list(entry[3])) for name, entry in self._spans.items()}
+        result = {}
+        for name, (count, total, longest, histogram) in sorted(spans.items()):
+            result[name] = {
+                'count': count,
+                'total': total / 1e6,
+                'mean': total / count / 1e6,
+                'p50': _percentile(histogram, count, 0.5, longest),
+                'p95': _percentile(histogram, count, 0.95, longest),
+                'max': longest / 1e6,
+                'histogram': histogram,
+            }
+        return result
+
+    def dump_json(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(
+                {'pid': os.getpid(), 'spans': self.summary()},
+                f, ensure_ascii=False, indent=1
+            )
+
+    def dump_chrome_trace(self, path: str) -> None:
+        '''
+        Журнал интервалов в формате Chrome trace (chrome://tracing, Perfetto).
+        '''
+        with self._lock:
+            events = list(self._events)
+        pid = os.getpid()
+        trace = [
+            {
+                'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+                'ts': (start - self._origin) / 1000, 'dur': duration / 1000,
+            }
+            for name, tid, start, duration in events
+        ]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+
+def _percentile(histogram: list[int], count: int, share: float, longest: int) -> float:
+    needed = share * count
+    seen = 0
+    for index, number in enumerate(histogram):
+        seen += number
+        if seen >= needed:
+            return min(float(1 << index) / 1000, longest / 1e6)
+    return longest / 1e6
+
+
+# Общий сборщик приложения; VIDGRAPHICS_PROFILE=1 включает сбор с запуска
+PROFILER = Profiler(os.environ.get('VIDGRAPHICS_PROFILE') == '1')
+
+
+def span(name: str):
+    '''
+    Интервал общего сборщика: with span('decode'): ...
+    '''
+    return _Span(PROFILER, name) if PROFILER.enabled else _NULL_SPAN
+
+
+def profiled(name: str):
+    '''
+    Декоратор: каждый вызов функции записывается как интервал name.
+    Функция, подключенная к сигналу Qt, должна принимать все его
+    аргументы: обертка передает их все, лишние не отбрасываются.
+    '''
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return func(*args, **kwargs)
+            with _Span(PROFILER, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
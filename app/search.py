@@ -0,0 +1,165 @@
+import ast
+import operator
+
+import numpy as np
+
+# Количество строк, для которых условие вычисляется за один раз
+SEARCH_CHUNK_ROWS = 1 << 20
+
+_COMPARE = {
+    ast.Eq: operator.eq, ast.NotEq: operator.ne,
+    ast.Lt: operator.lt, ast.LtE: operator.le,
+    ast.Gt: operator.gt, ast.GtE: operator.ge,
+}
+_BINARY = {
+    ast.Add: operator.add, ast.Sub: operator.sub,
+    ast.Mult: operator.mul, ast.Div: operator.truediv, ast.Mod: operator.mod,
+    ast.BitAnd: np.logical_and, ast.BitOr: np.logical_or,
+}
+_UNARY = {
+    ast.Not: np.logical_not, ast.Invert: np.logical_not,
+    ast.USub: operator.neg, ast.UAdd: operator.pos,
+}
+_FUNCTIONS = {'abs': np.abs}
+
+
+class Condition:
+    '''
+    Условие над каналами, например "EH > 3 and z_RIP == 1".
+
+    Допустимы названия каналов, числа, арифметика (+ - * / %),
+    сравнения (в том числе цепочки a < EH < b), and, or, not, & | ~
+    и abs(). Условие разбирается один раз и вычисляется над частями
+    строк целиком средствами NumPy, без цикла по строкам.
+    '''
+
+    def __init__(self, expression: str, channels) -> None:
+        '''__init__
+
+        Args:
+            expression (str): текст условия
+            channels: допустимые названия каналов
+
+        Raises:
+            ValueError: синтаксическая ошибка, неизвестный канал
+                или недопустимая конструкция
+        '''
+        try:
+            self.tree = ast.parse(expression.strip(), mode='eval').body
+        except SyntaxError as error:
+            raise ValueError(f'Ошибка в условии: {error.msg}') from None
+        self.names: list[str] = []
+        self._check(self.tree, set(channels))
+        # нормализованная запись: одинаковые условия с разными пробелами совпадают
+        self.key = ast.dump(self.tree)
+
+    def _check(self, node: ast.AST, channels: set[str]) -> None:
+        if isinstance(node, ast.Name):
+            if node.id not in channels:
+                raise ValueError(f'Нет канала {node.id}')
+            if node.id not in self.names:
+                self.names.append(node.id)
+            return
+        if isinstance(node, ast.Constant):
+            if not isinstance(node.value, (int, float)):
+                raise ValueError(f'Недопустимое значение в условии: {node.value!r}')
+            return
+        if isinstance(node, ast.BoolOp):
+            children = node.values
+        elif isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY:
+            children = [node.operand]
+        elif isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+            children = [node.left, node.right]
+        elif isinstance(node, ast.Compare) and all(type(op) in _COMPARE for op in node.ops):
+            children = [node.left] + node.comparators
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) \
+                and node.func.id in _FUNCTIONS and len(node.args) == 1 and not node.keywords:
+            children = node.args
+        else:
+            raise ValueError(f'Недопустимая конструкция в условии: {ast.unparse(node)}')
+        for child in children:
+            self._check(child, channels)
+
+    def evaluate(self, values: dict[str, np.ndarray], count: int) -> np.ndarray:
+        '''
+        Значение условия для части строк.
+
+        Args:
+            values (dict[str, np.ndarray]): значения каналов условия в этих строках
+            count (int): количество строк
+
+        Returns:
+            np.ndarray: bool массив длины count
+        '''
+        try:
+            with np.errstate(all='ignore'):
+                mask = np.asarray(self._evaluate(self.tree, values))
+        except TypeError as error:
+            raise ValueError(f'Ошибка вычисления условия: {error}') from None
+        if mask.dtype != bool:
+            mask = mask != 0
+        return np.broadcast_to(mask, (count,))
+
+    def _evaluate(self, node: ast.AST, values: dict[str, np.ndarray]):
+        if isinstance(node, ast.Name):
+            return values[node.id]
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, ast.BoolOp):
+            func = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            result = self._evaluate(node.values[0], values)
+            for child in node.values[1:]:
+                result = func(result, self._evaluate(child, values))
+            return result
+        if isinstance(node, ast.UnaryOp):
+            return _UNARY[type(node.op)](self._evaluate(node.operand, values))
+        if isinstance(node, ast.BinOp):
+            return _BINARY[type(node.op)](
+                self._evaluate(node.left, values), self._evaluate(node.right, values)
+            )
+        if isinstance(node, ast.Compare):
+            left = self._evaluate(node.left, values)
+            result = True
+            for op, comparator in zip(node.ops, node.comparators):
+                right = self._evaluate(comparator, values)
+                result = np.logical_and(result, _COMPARE[type(op)](left, right))
+                left = right
+            return result
+        return _FUNCTIONS[node.func.id](self._evaluate(node.args[0], values))
+
+
+def find_intervals(condition: Condition,
+                   get_values,
+                   size: int,
+                   chunk_rows: int = SEARCH_CHUNK_ROWS) -> np.ndarray:
+    '''
+    Интервалы строк, в которых выполняется условие. Условие вычисляется
+    частями по chunk_rows строк, поэтому расход памяти не зависит
+    от количества строк, а столбцы на диске читаются по частям.
+
+    Args:
+        condition (Condition): условие
+        get_values (callable): get_values(канал, первая строка, строка после последней)
+            возвращает значения канала в этих строках
+        size (int): количество строк
+        chunk_rows (int): количество строк в части
+
+    Returns:
+        np.ndarray: матрица (K, 2) int64: первая строка интервала
+        и строка после последней, по возрастанию
+    '''
+    starts, stops = [], []
+    previous = False
+    for pos in range(0, size, chunk_rows):
+        end = min(pos + chunk_rows, size)
+        values = {name: get_values(name, pos, end) for name in condition.names}
+        mask = condition.evaluate(values, end - pos)
+        edges = np.diff(mask.view(np.int8), prepend=np.int8(previous))
+        starts.append(np.flatnonzero(edges == 1) + pos)
+        stops.append(np.flatnonzero(edges == -1) + pos)
+        previous = bool(mask[-1])
+    if previous:
+        stops.append(np.array([size]))
+    if not starts:
+        return np.zeros((0, 2), dtype=np.int64)
+    return np.column_stack((np.concatenate(starts), np.concatenate(stops))).astype(np.int64)
@@ -0,0 +1,206 @@
+import copy
+import json
+import os
+
+import numpy as np
+
+from .decode_cache import STATS_DIR, key_name
+from .out_of_core import release_pages
+from .transitions import Transitions
+
+# Количество строк, обрабатываемых за один раз
+STATS_CHUNK_ROWS = 1 << 18
+# Количество различных значений, до которого они считаются точно;
+# у каналов с большим количеством выводится >DISTINCT_LIMIT
+DISTINCT_LIMIT = 1000
+# Количество первых значений части, по которым проверяется,
+# не превышен ли DISTINCT_LIMIT, до сортировки всей части
+_DISTINCT_PROBE = 4096
+# Версия расчета: записи кэша других версий не используются
+STATS_VERSION = 1
+
+
+class ChannelStats:
+    '''
+    Статистика канала, накапливаемая по частям: минимум, максимум,
+    среднее, СКО, количество NaN и количество различных значений.
+
+    Части объединяются без повторного прохода по данным (среднее
+    и сумма квадратов отклонений - по формулам Чана), поэтому
+    статистику дописанных строк можно добавить к уже посчитанной.
+    Считается по исходным значениям, коэффициент канала применяется
+    в result().
+    '''
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.nan = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.mean = 0.0
+        self.m2 = 0.0
+        # различные значения или None, если их больше DISTINCT_LIMIT
+        self.distinct: np.ndarray | None = np.zeros(0)
+
+    def _merge(self, count: int, low, high, mean: float, m2: float) -> None:
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, float(low))
+        self.max = max(self.max, float(high))
+
+    def _merge_distinct(self, values: np.ndarray) -> None:
+        if self.distinct is None:
+            return
+        if len(np.unique(values[:_DISTINCT_PROBE])) > DISTINCT_LIMIT:
+            self.distinct = None
+            return
+        distinct = np.union1d(self.distinct, values)
+        self.distinct = distinct if len(distinct) <= DISTINCT_LIMIT else None
+
+    def update(self, values: np.ndarray) -> None:
+        '''
+        Добавление части значений канала.
+        '''
+        if values.dtype.kind == 'f':
+            finite = ~np.isnan(values)
+            self.nan += len(values) - int(np.count_nonzero(finite))
+            if not finite.all():
+                values = values[finite]
+        if not len(values):
+            return
+        mean = float(values.mean(dtype=np.float64))
+        m2 = float(values.var(dtype=np.float64)) * len(values)
+        self._merge(len(values), values.min(), values.max(), mean, m2)
+        self._merge_distinct(values)
+
+    def update_runs(self, values: np.ndarray, lengths: np.ndarray) -> None:
+        '''
+        Добавление части признака, хранящегося переходами:
+        значения участков и их длины в строках.
+        '''
+        count = int(lengths.sum())
+        if not count:
+            return
+        mean = float(np.dot(values, lengths)) / count
+        m2 = float(np.dot((values - mean) ** 2, lengths))
+        self._merge(count, values.min(), values.max(), mean, m2)
+        self._merge_distinct(values)
+
+    def result(self, coef: float = 1.0) -> dict:
+        '''
+        Статистика с учетом коэффициента канала.
+
+        Returns:
+            dict: count, min, max, mean, std, nan, distinct (None, если
+            различных значений больше DISTINCT_LIMIT); без значений
+            min, max, mean и std равны None
+        '''
+        result = {
+            'count': self.count, 'nan': self.nan,
+            'distinct': None if self.distinct is None else len(self.distinct),
+            'min': None, 'max': None, 'mean': None, 'std': None,
+        }
+        if self.count:
+            low, high = sorted((self.min * coef, self.max * coef))
+            result.update(
+                min=low, max=high, mean=self.mean * coef,
+                std=float(np.sqrt(self.m2 / self.count)) * abs(coef),
+            )
+        return result
+
+
+def is_flat(result: dict) -> bool:
+    '''
+    Канал не меняет значение (или в нем нет значений, кроме NaN).
+    '''
+    return result['distinct'] is not None and result['distinct'] <= 1
+
+
+def update_stats(columns: dict[str, np.ndarray | Transitions],
+                 start: int,
+                 stop: int,
+                 stats: dict[str, ChannelStats] | None = None,
+                 chunk_rows: int = STATS_CHUNK_ROWS,
+                 progress=None) -> dict[str, ChannelStats]:
+    '''
+    Статистика строк [start, stop) всех каналов за один проход частями
+    по chunk_rows строк: каждая часть всех столбцов обрабатывается
+    один раз, страницы файлов, отображенных в память, затем освобождаются.
+
+    Args:
+        columns (dict[str, np.ndarray | Transitions]): столбцы каналов
+            и признаки, хранящиеся переходами
+        start (int): первая строка
+        stop (int): строка после последней
+        stats (dict[str, ChannelStats] | None): статистика предыдущих строк,
+            к которой добавляются новые; сама она не изменяется
+        chunk_rows (int): количество строк в части
+        progress (callable | None): вызывается как progress(обработано строк, всего строк),
+            исключение из него прерывает расчет
+
+    Returns:
+        dict[str, ChannelStats]: статистика каждого канала
+    '''
+    stats = {
+        name: copy.copy(stats[name]) if stats and name in stats else ChannelStats()
+        for name in columns
+    }
+    total = max(stop - start, 0)
+    for pos in range(start, stop, chunk_rows):
+        end = min(pos + chunk_rows, stop)
+        for name, values in columns.items():
+            if isinstance(values, Transitions):
+                stats[name].update_runs(*values.runs(pos, end))
+            else:
+                stats[name].update(values[pos:end])
+                release_pages(values)
+        if progress is not None:
+            progress(end - start, total)
+    return stats
+
+
+class StatsCache:
+    '''
+    Кэш статистики каналов на диске: JSON файл на каждый источник
+    данных (файл или папку), определяемый ключом источника. Файлы
+    лежат в папке кэша декодирования и удаляются вместе с его записями
+    (см. DecodeCache.evict и DecodeCache.invalidate).
+    '''
+
+    def __init__(self, cache_dir: str) -> None:
+        self.path = os.path.join(cache_dir, STATS_DIR)
+
+    def _file(self, key: dict) -> str:
+        return os.path.join(self.path, f'{key_name(key)}.json')
+
+    def load(self, key: dict) -> dict[str, dict] | None:
+        path = self._file(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+            if entry['key'] != key or entry['version'] != STATS_VERSION:
+                return None
+            # время последнего обращения для вытеснения из кэша
+            os.utime(path)
+            return entry['stats']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def store(self, key: dict, stats: dict[str, dict]) -> None:
+        '''
+        Сохранение статистики. Ошибки записи не прерывают работу.
+        '''
+        path = self._file(key)
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+                json.dump(
+                    {'key': key, 'version': STATS_VERSION, 'stats': stats},
+                    f, ensure_ascii=False
+                )
+            os.replace(f'{path}.tmp', path)
+        except OSError:
+            pass
@@ -0,0 +1,194 @@
+import numpy as np
+
+from .out_of_core import release_pages
+
+# Количество исходных значений, обрабатываемых за один раз
+_CHUNK_ROWS = 1 << 20
+# Канал хранится переходами, пока они занимают не больше этой доли
+# от исходного bool столбца; часто меняющиеся признаки остаются столбцами
+MAX_RUN_SHARE = 0.5
+
+
+def find_change(values: np.ndarray, index: int, backward: bool = False) -> int | None:
+    '''
+    Ближайшая к index строка столбца, на которой значение отличается
+    от значения предыдущей строки: после index или, при backward, до него.
+    Столбец просматривается частями, размер которых растет вдвое,
+    поэтому близкое изменение находится без чтения всего столбца.
+
+    Returns:
+        int | None: индекс строки или None, если значение не меняется
+    '''
+    size = 1024
+    if backward:
+        stop = min(index, len(values))
+        while stop > 1:
+            start = max(stop - size, 1)
+            part = values[start - 1:stop]
+            change = np.flatnonzero(part[1:] != part[:-1])
+            if len(change):
+                return start + int(change[-1])
+            stop, size = start, min(size * 2, _CHUNK_ROWS)
+    else:
+        start = index + 1
+        while start < len(values):
+            part = values[start - 1:start + size]
+            change = np.flatnonzero(part[1:] != part[:-1])
+            if len(change):
+                return start + int(change[0])
+            start, size = start + size, min(size * 2, _CHUNK_ROWS)
+    return None
+
+
+class Transitions:
+    '''
+    Дискретный канал (битовый признак z_*) в виде переходов: индексы
+    строк, с которых значение меняется, и значения с этих строк.
+    Первый переход всегда на строке 0.
+
+    Признаки меняются редко, поэтому переходы занимают в сотни раз
+    меньше памяти, чем bool столбец, а ступенчатая линия видимого
+    диапазона строится по переходам, а не по каждому отсчету.
+    '''
+
+    def __init__(self, dtype=bool) -> None:
+        self.starts = np.zeros(0, dtype=np.int64)
+        self.values = np.zeros(0, dtype=dtype)
+        self.size = 0
+
+    @classmethod
+    def from_runs(cls, starts: np.ndarray, values: np.ndarray, size: int) -> 'Transitions':
+        '''
+        Переходы из сохраненных индексов и значений (например, из кэша
+        декодирования) без просмотра исходного столбца.
+        '''
+        flag = cls(values.dtype)
+        flag.starts, flag.values, flag.size = starts, values, size
+        return flag
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def nbytes(self) -> int:
+        return self.starts.nbytes + self.values.nbytes
+
+    def is_compact(self) -> bool:
+        '''
+        Переходы занимают не больше MAX_RUN_SHARE от исходного столбца.
+        '''
+        return self.nbytes <= self.size * self.values.itemsize * MAX_RUN_SHARE
+
+    def extend(self, values: np.ndarray) -> None:
+        '''
+        Переход к дописанному столбцу, начало которого совпадает с прежним.
+        Просматриваются только новые строки.
+        '''
+        starts, runs = [self.starts], [self.values]
+        last = self.values[-1] if len(self.values) else None
+        for pos in range(self.size, len(values), _CHUNK_ROWS):
+            part = values[pos:pos + _CHUNK_ROWS]
+            change = np.flatnonzero(part[1:] != part[:-1]) + 1
+            if last is None or part[0] != last:
+                change = np.concatenate(([0], change))
+            starts.append(change + pos)
+            runs.append(part[change])
+            last = part[-1]
+            release_pages(values)
+        if len(starts) > 1:
+            self.starts = np.concatenate(starts)
+            self.values = np.concatenate(runs)
+        self.size = len(values)
+
+    def runs(self, start: int = 0, stop: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        Участки постоянного значения в строках [start, stop).
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: значения участков и их длины в строках
+        '''
+        stop = self.size if stop is None else min(stop, self.size)
+        if stop <= start:
+            return self.values[:0], np.zeros(0, dtype=np.int64)
+        first = int(np.searchsorted(self.starts, start, 'right')) - 1
+        last = int(np.searchsorted(self.starts, stop, 'left'))
+        bounds = np.maximum(self.starts[first:last], start)
+        return self.values[first:last], np.diff(bounds, append=stop)
+
+    def expand(self, start: int = 0, stop: int | None = None) -> np.ndarray:
+        '''
+        Значения строк [start, stop) в виде обычного столбца.
+        '''
+        return np.repeat(*self.runs(start, stop))
+
+    def next_transition(self, index: int, backward: bool = False) -> int | None:
+        '''
+        Ближайший переход после строки index или, при backward, до нее.
+        Двоичный поиск по индексам переходов.
+
+        Returns:
+            int | None: индекс строки перехода или None, если его нет
+        '''
+        if backward:
+            i = int(np.searchsorted(self.starts, index, 'left')) - 1
+            return int(self.starts[i]) if i >= 1 else None
+        i = int(np.searchsorted(self.starts, index, 'right'))
+        return int(self.starts[i]) if i < len(self.starts) else None
+
+    def query(self,
+              time: np.ndarray,
+              t_start: float,
+              t_end: float,
+              max_points: int) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        Ступенчатая линия для диапазона времени [t_start, t_end].
+
+        Каждый участок постоянного значения - две точки: начало участка
+        и время следующего перехода. Если участков больше, чем помещается
+        в max_points, строки группируются блоками одинаковой длины (степень
+        двойки, границы на общей сетке), и для блока выводятся минимум
+        и максимум, как в LodPyramid.query: у bool признака соседние
+        участки имеют разные значения, поэтому блок с переходом внутри
+        дает пару (False, True).
+
+        Args:
+            time (np.ndarray): отсортированный столбец времени
+            t_start (float): начало диапазона
+            t_end (float): конец диапазона
+            max_points (int): максимальное количество точек
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: время и значения точек
+        '''
+        size = min(self.size, len(time))
+        if not size:
+            return np.zeros(0), np.zeros(0)
+        # по одному отсчету за краями, чтобы линия доходила до границ графика
+        start = max(int(np.searchsorted(time[:size], t_start, 'left')) - 1, 0)
+        end = min(int(np.searchsorted(time[:size], t_end, 'right')) + 1, size)
+        first = int(np.searchsorted(self.starts, start, 'right')) - 1
+        last = int(np.searchsorted(self.starts, end, 'left'))
+        if 2 * (last - first) <= max_points:
+            bounds = np.maximum(self.starts[first:last], start)
+            ends = np.append(bounds[1:], end - 1)
+            x = np.column_stack((time[bounds], time[ends])).ravel()
+            return x, np.repeat(self.values[first:last], 2).astype(np.float64)
+
+        target = -(-(end - start) // max(max_points // 2, 1))
+        step = 1 << (target - 1).bit_length()
+        edges = np.arange(start // step * step, end, step)
+        # крайние блоки сетки обрезаются до строк [start, end), чтобы
+        # переходы за краями графика не давали ложный размах
+        lows = np.maximum(edges, start)
+        highs = np.minimum(edges + step, end)
+        active = np.searchsorted(self.starts, lows, 'right') - 1
+        # последний участок, начавшийся до конца блока
+        closing = np.searchsorted(self.starts, highs, 'left') - 1
+        values = self.values[active]
+        mixed = closing > active
+        mins = np.where(mixed, False, values)
+        maxs = np.where(mixed, True, values)
+        return (
+            np.repeat(time[lows], 2),
+            np.column_stack((mins, maxs)).ravel().astype(np.float64),
+        )
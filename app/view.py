@@ -1,35 +1,100 @@
+import os
+import threading
 from functools import partial
+from importlib import import_module
+from typing import TYPE_CHECKING
 
-import pyqtgraph as pg
-from notificator import notificator
-from notificator.alingments import BottomRight
-from PyQt5.QtCore import QCoreApplication, Qt, QTimer
-from PyQt5.QtWidgets import (QAction, QApplication, QFileDialog, QLabel,
+from PyQt5.QtCore import QCoreApplication, Qt, QThread, QTimer
+from PyQt5.QtWidgets import (QAction, QApplication, QFileDialog, QInputDialog,
+                             QLabel, QLineEdit,
                              QMainWindow, QMdiArea, QMdiSubWindow, QMenu,
-                             QSlider, QSplitter, QStyle, QToolBar, QComboBox)
+                             QProgressBar, QPushButton, QSplitter,
+                             QStyle, QToolBar, QComboBox)
 from PyQt5.QtGui import QIcon
 from PyQt5.sip import delete
 
-from .controller import DataController
-from .graph_window import NormalGraphWidget, VidGraphWidget
+from .diagnostics import DiagnosticsWindow
+from .formats import AUTO, layout_titles
 from .helpers_function import get_actions_list, get_menu_dict, get_toolbar_list
 from .left_menu import Left_Menu_Tree
+from .load_worker import LoadWorker
+from .playback import DEFAULT_FPS, SPEEDS, PlaybackEngine
+from .profiling import profiled, span
+
+if TYPE_CHECKING:
+    from .comparison import ComparedCapture
+    from .controller import DataController
+
+# Модули с pandas и NumPy не импортируются до появления окна: они
+# загружаются в фоновом потоке сразу после него, а pyqtgraph (его можно
+# импортировать только в главном потоке) - при построении первого графика.
+# Проверяется замером benchmarks/startup.py
+PRELOAD_MODULES = ['.controller', '.comparison']
+
+# Период опроса файла в режиме слежения, мс
+FOLLOW_INTERVAL = 500
+# Фильтры диалога экспорта и соответствующие им расширения
+EXPORT_FILTERS = {
+    'Parquet (*.parquet)': '.parquet',
+    'HDF5 (*.h5)': '.h5',
+    'CSV (*.csv)': '.csv',
+}
 
 
 class MainWindow(QMainWindow):
     def __init__(self, app: QApplication) -> None:
         super().__init__()
         self.app = app
-        self.ctrl = DataController()
-        self.notify: notificator = notificator()
+        self._ctrl: 'DataController | None' = None
+        self.notify = None
         self.vid_graph_window = None
+        self.load_thread: QThread | None = None
+        self.load_worker: LoadWorker | None = None
+        self.load_id = 0
+        self.export_thread: QThread | None = None
+        self.export_worker: LoadWorker | None = None
+        self.stats_thread: QThread | None = None
+        self.stats_worker: LoadWorker | None = None
+        # записи для сравнения по подписям; сохраняются при открытии другой основной записи
+        self.compared: dict[str, 'ComparedCapture'] = {}
+        self.diagnostics_window: DiagnosticsWindow | None = None
         self.initUI()
-        self.timer = QTimer(self)
-        self.timer_is_running = False
-        self.timer.timeout.connect(self.update_graph_on_timer)
+        screen = self.app.primaryScreen()
+        self.playback = PlaybackEngine(
+            self.show_playback_frame, self.get_playback_end,
+            (screen.refreshRate() if screen else 0) or DEFAULT_FPS, self
+        )
+        self.playback.finished.connect(self.stop_play_graph)
+        self.playback.stats.connect(self.show_playback_stats)
+        self.follow_timer = QTimer(self)
+        self.follow_timer.timeout.connect(self.read_followed_file)
+        QTimer.singleShot(0, self.preload_modules)
 
         # self.open_cap_file('2.pcap')
 
+    @property
+    def ctrl(self) -> 'DataController':
+        '''
+        Контроллер данных основной записи. Создается при первом обращении,
+        обычно при открытии файла.
+        '''
+        if self._ctrl is None:
+            from .controller import DataController
+            self._ctrl = DataController()
+        return self._ctrl
+
+    def preload_modules(self) -> None:
+        '''
+        Импорт PRELOAD_MODULES в фоновом потоке, пока пользователь
+        выбирает файл. Если файл открыт раньше, главный поток дождется
+        окончания импорта (импорт модуля защищен блокировкой).
+        '''
+        def preload() -> None:
+            for name in PRELOAD_MODULES:
+                import_module(name, __package__)
+
+        threading.Thread(target=preload, daemon=True).start()
+
     def initUI(self) -> None:
         self.setWindowTitle('ViGraphics v2024.02.06')
         self.setWindowIcon(QIcon('icon.ico'))
@@ -40,6 +105,7 @@ class MainWindow(QMainWindow):
         self.generate_actions(actions)
         self.generate_menu(self.menuBar(), menu_dict)
         self.generate_tool_bar(toolbar_list)
+        self.create_search_bar()
         self.create_status_bar()
 
         self.tree_widget = Left_Menu_Tree(self)
@@ -100,20 +166,34 @@ class MainWindow(QMainWindow):
         )
         self.last_file_label = QLabel()
         self.statusbar.addPermanentWidget(self.last_file_label)
+        self.playback_label = QLabel()
+        self.statusbar.addPermanentWidget(self.playback_label)
+        self.export_label = QLabel()
+        self.statusbar.addPermanentWidget(self.export_label)
+        self.load_progress_bar = QProgressBar()
+        self.load_progress_bar.setRange(0, 1000)
+        self.load_progress_bar.setMaximumWidth(200)
+        self.load_progress_bar.hide()
+        self.statusbar.addPermanentWidget(self.load_progress_bar)
+        self.cancel_load_button = QPushButton('Отмена')
+        self.cancel_load_button.clicked.connect(self.cancel_loading)
+        self.cancel_load_button.hide()
+        self.statusbar.addPermanentWidget(self.cancel_load_button)
 
     def generate_tool_bar(self, toolbar_list: list) -> None:
-        self.slider = QSlider()
-        self.slider.setFixedSize(40, 100)
-        self.slider.setMaximum(2000)
-        self.slider.setMinimum(50)
-        self.slider.setTickInterval(10)
-        self.slider.setValue(300)
-        self.slider.valueChanged.connect(self.slider_handler)
+        self.speed_cmbbox = QComboBox()
+        self.speed_cmbbox.setToolTip('Скорость воспроизведения')
+        for speed in SPEEDS:
+            self.speed_cmbbox.addItem(f'{speed:g}x', speed)
+        self.speed_cmbbox.setCurrentIndex(SPEEDS.index(1))
+        self.speed_cmbbox.currentIndexChanged.connect(self.speed_handler)
 
         position = Qt.LeftToolBarArea
         tb = QToolBar('main')
         self.choose_unpack_func_cmbbox = QComboBox()
-        self.choose_unpack_func_cmbbox.addItems(['1', '2'])
+        self.choose_unpack_func_cmbbox.addItem('Авто', AUTO)
+        for name, title in layout_titles().items():
+            self.choose_unpack_func_cmbbox.addItem(title, name)
         tb.addWidget(self.choose_unpack_func_cmbbox)
         for elem in toolbar_list:
             if elem is None:
@@ -127,11 +207,32 @@ class MainWindow(QMainWindow):
         tb.setMovable(False)
         self.addToolBar(position, tb)
 
+    def create_search_bar(self) -> None:
+        '''
+        Панель поиска по условию над каналами.
+        '''
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText('Условие, например EH > 3 and z_RIP == 1')
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.returnPressed.connect(self.search_condition)
+        self.search_label = QLabel()
+        tb = QToolBar('search')
+        tb.addWidget(self.search_edit)
+        tb.addAction(self.go_to_back_hit_action)
+        tb.addAction(self.go_to_next_hit_action)
+        tb.addWidget(self.search_label)
+        tb.setMovable(False)
+        self.addToolBar(Qt.TopToolBarArea, tb)
+
     def clear_main_window(self) -> None:
         self.stop_play_graph()
-        self.ctrl = DataController()
+        self.follow_timer.stop()
+        self.cancel_loading(wait=True)
+        self.stop_stats(cancel=True)
+        self._ctrl = None
+        # без контроллера каналов нет: дерево очищается без создания контроллера
         self.tree_widget.hide()
-        self.tree_widget.update_check_box()
+        self.tree_widget.clear()
         for window in self.mdi.subWindowList():
             window.close()
         if self.vid_graph_window:
@@ -139,10 +240,12 @@ class MainWindow(QMainWindow):
         self.vid_graph_window = None
         self.last_file_label.setText('')
 
-    def slider_handler(self) -> None:
-        if self.timer_is_running:
-            self.timer.stop()
-            self.play_graph()
+    def clear_all(self) -> None:
+        self.clear_main_window()
+        self.close_compared()
+
+    def speed_handler(self) -> None:
+        self.playback.set_speed(self.speed_cmbbox.currentData())
 
     def open_cap_file(self, filepath: bool | str = False) -> None:
         self.clear_main_window()
@@ -151,41 +254,375 @@ class MainWindow(QMainWindow):
                 self, "Открыть файл", "", "All Files (*);;")
         if not filepath:
             return
-        try:
-            self.ctrl.read_data_from_file(filepath, self.choose_unpack_func_cmbbox.currentText())
-        except:
-            self.send_notify('ошибка', 'Невозможно открыть файл')
-            return
-        self.last_file_label.setText(f'Текущий файл: {self.ctrl.filepath}')
-        self.tree_widget.update_check_box()
+        ctrl = self.ctrl
+        num_func = self.choose_unpack_func_cmbbox.currentData()
+        follow = self.follow_file_action.isChecked()
+        self.last_file_label.setText(f'Текущий файл: {filepath}')
+        self.start_loading(
+            lambda progress: ctrl.read_data_from_file(filepath, num_func, progress, follow),
+            'Невозможно открыть файл'
+        )
 
     def open_dir(self):
         self.clear_main_window()
         folder_path = QFileDialog.getExistingDirectory(
             self, 'Выберите папку', '/')
-        if folder_path:
-            try:
-                self.ctrl.read_data_from_dir(folder_path)
-            except:
-                self.send_notify(
-                    'ошибка', 'Невозможно открыть папку или в папке нет файлов')
-                return
-        self.last_file_label.setText(f'Текущая папка: {self.ctrl.filepath}')
+        if not folder_path:
+            return
+        ctrl = self.ctrl
+        num_func = self.choose_unpack_func_cmbbox.currentData()
+        self.last_file_label.setText(f'Текущая папка: {folder_path}')
+        self.start_loading(
+            lambda progress: ctrl.read_data_from_dir(folder_path, num_func, progress),
+            'Невозможно открыть папку или в папке нет файлов'
+        )
+
+    def start_loading(self, load, error_text: str, finished=None) -> None:
+        '''
+        Запуск чтения данных в отдельном потоке.
+        Дерево каналов появляется после первой прочитанной части.
+        Если задан finished, после чтения вызывается он, а не обновление
+        основной записи (так читаются записи для сравнения).
+        '''
+        self.load_id += 1
+        self.load_thread = QThread(self)
+        self.load_worker = LoadWorker(load)
+        self.load_worker.moveToThread(self.load_thread)
+        self.load_thread.started.connect(self.load_worker.run)
+        self.load_thread.finished.connect(self.load_worker.deleteLater)
+        self.load_thread.finished.connect(self.load_thread.deleteLater)
+        # сигналы от прерванного чтения могут прийти уже после начала нового
+        self.load_worker.progress.connect(
+            partial(self.show_load_progress, self.load_id))
+        self.load_worker.finished.connect(
+            partial(self.loading_finished, self.load_id, finished))
+        self.load_worker.cancelled.connect(
+            partial(self.loading_cancelled, self.load_id))
+        self.load_worker.failed.connect(
+            partial(self.loading_failed, self.load_id, error_text, finished))
+        self.load_progress_bar.setValue(0)
+        self.load_progress_bar.show()
+        self.cancel_load_button.show()
+        self.load_thread.start()
+
+    def cancel_loading(self, wait: bool = False) -> None:
+        if self.load_worker is None:
+            return
+        self.load_worker.cancel()
+        if wait:
+            self.stop_loading()
+
+    def stop_loading(self) -> None:
+        if self.load_thread is not None:
+            self.load_thread.quit()
+            self.load_thread.wait()
+        self.load_id += 1
+        self.load_worker = None
+        self.load_thread = None
+        self.load_progress_bar.hide()
+        self.cancel_load_button.hide()
+
+    def show_load_progress(self, load_id: int, done: int, total: int) -> None:
+        if load_id != self.load_id:
+            return
+        self.load_progress_bar.setValue(int(1000 * done / total) if total else 0)
+        if not self.tree_widget.isVisible():
+            self.tree_widget.update_check_box()
+
+    def loading_finished(self, load_id: int, finished=None) -> None:
+        if load_id != self.load_id:
+            return
+        self.stop_loading()
+        if finished is not None:
+            finished()
+            return
         self.tree_widget.update_check_box()
+        self.refresh_all_graphs()
+        self.start_stats()
+        if self.ctrl.is_following():
+            self.follow_timer.start(FOLLOW_INTERVAL)
+        if self.ctrl.load_errors:
+            self.send_notify(
+                'предупреждение',
+                f'Не удалось прочитать файлов: {len(self.ctrl.load_errors)}'
+            )
+
+    def loading_cancelled(self, load_id: int) -> None:
+        if load_id != self.load_id:
+            return
+        self.stop_loading()
+        self.refresh_all_graphs()
+        self.send_notify('предупреждение', 'Чтение данных прервано')
+
+    def loading_failed(self, load_id: int, error_text: str, finished, _) -> None:
+        if load_id != self.load_id:
+            return
+        self.stop_loading()
+        if finished is None:
+            self.last_file_label.setText('')
+        self.send_notify('ошибка', error_text)
+
+    def open_compared(self, filepath: bool | str = False) -> None:
+        '''
+        Открытие записи для сравнения: ее каналы накладываются пунктиром
+        на графики основной записи с теми же каналами.
+        '''
+        if not filepath:
+            filepath, _ = QFileDialog.getOpenFileName(
+                self, "Открыть файл для сравнения", "", "All Files (*);;")
+        if not filepath:
+            return
+        if self.load_worker is not None:
+            self.send_notify('предупреждение', 'Дождитесь окончания чтения данных')
+            return
+        from .comparison import ComparedCapture, unique_label
+        from .controller import DataController
+        ctrl = DataController()
+        num_func = self.choose_unpack_func_cmbbox.currentData()
+        label = unique_label(filepath, self.compared)
+        self.start_loading(
+            lambda progress: ctrl.read_data_from_file(filepath, num_func, progress),
+            'Невозможно открыть файл для сравнения',
+            partial(self.add_compared, ComparedCapture(label, ctrl))
+        )
+
+    def add_compared(self, capture: 'ComparedCapture') -> None:
+        self.compared[capture.label] = capture
+        self.refresh_compared()
+        self.send_notify('успех', f'Открыта запись для сравнения {capture.label}')
+
+    def refresh_compared(self) -> None:
+        for child in self.mdi.subWindowList():
+            child.widget().plot_compared()
+
+    def choose_compared(self, title: str) -> 'ComparedCapture | None':
+        if not self.compared:
+            self.send_notify('предупреждение', 'Нет записей для сравнения')
+            return None
+        if len(self.compared) == 1:
+            return next(iter(self.compared.values()))
+        label, ok = QInputDialog.getItem(self, title, 'Запись:', list(self.compared), 0, False)
+        return self.compared[label] if ok else None
+
+    def set_compared_offset(self) -> None:
+        capture = self.choose_compared('Сдвиг записи')
+        if capture is None:
+            return
+        offset, ok = QInputDialog.getDouble(
+            self, 'Сдвиг записи', f'Сдвиг {capture.label} относительно основной записи, с:',
+            capture.offset, -1e9, 1e9, 3
+        )
+        if ok:
+            capture.offset = offset
+            self.refresh_compared()
+
+    def align_compared(self) -> None:
+        '''
+        Сдвиг всех записей для сравнения по меткам времени захвата пакетов.
+        '''
+        if self.ctrl.get_data_main() is None or not self.compared:
+            self.send_notify('предупреждение', 'Нет записей для выравнивания')
+            return
+        try:
+            for capture in self.compared.values():
+                capture.offset = capture.timestamp_offset(self.ctrl)
+        except ValueError as error:
+            self.send_notify('предупреждение', str(error))
+        self.refresh_compared()
+
+    def close_compared(self) -> None:
+        self.compared = {}
+        self.refresh_compared()
+
+    def follow_file(self) -> None:
+        '''
+        Включение/выключение слежения за дописываемым файлом.
+        Уже открытый без слежения файл открывается заново.
+        '''
+        if not self.follow_file_action.isChecked():
+            self.follow_timer.stop()
+            return
+        filepath = self.ctrl.filepath
+        if filepath and os.path.isfile(filepath) and not self.ctrl.is_following() \
+                and self.load_worker is None:
+            self.open_cap_file(filepath)
+
+    def read_followed_file(self) -> None:
+        '''
+        Дочитывание новых записей файла и продление графиков
+        без их перестроения.
+        '''
+        try:
+            count = self.ctrl.read_new_data()
+        except (OSError, ValueError) as error:
+            self.follow_timer.stop()
+            self.follow_file_action.setChecked(False)
+            self.send_notify('ошибка', f'Слежение за файлом остановлено: {error}')
+            return
+        if not count:
+            return
+        self.tree_widget.update_counts()
+        self.start_stats()
+        for child in self.mdi.subWindowList():
+            child.widget().extend_data()
+        self.update_all_vertical_line()
+        if self.vid_graph_window is not None:
+            self.vid_graph_window.set_new_data()
+
+    def start_stats(self) -> None:
+        '''
+        Расчет статистики каналов в отдельном потоке. Если расчет уже
+        идет, новые строки учитываются при следующем запуске.
+        '''
+        if self.stats_worker is not None:
+            return
+        task = self.ctrl.stats_task()
+        if task is None:
+            self.tree_widget.update_stats()
+            return
+        self.stats_thread = QThread(self)
+        self.stats_worker = LoadWorker(task)
+        self.stats_worker.moveToThread(self.stats_thread)
+        self.stats_thread.started.connect(self.stats_worker.run)
+        self.stats_thread.finished.connect(self.stats_worker.deleteLater)
+        self.stats_thread.finished.connect(self.stats_thread.deleteLater)
+        self.stats_worker.finished.connect(self.stats_finished)
+        self.stats_worker.cancelled.connect(self.stop_stats)
+        self.stats_worker.failed.connect(lambda _: self.stop_stats())
+        self.stats_thread.start()
+
+    def stats_finished(self) -> None:
+        self.stop_stats()
+        self.tree_widget.update_stats()
+
+    def stop_stats(self, cancel: bool = False) -> None:
+        if self.stats_worker is None:
+            return
+        if cancel:
+            self.stats_worker.cancel()
+        self.stats_thread.quit()
+        self.stats_thread.wait()
+        self.stats_worker = None
+        self.stats_thread = None
+
+    def show_window_stats(self) -> None:
+        '''
+        Статистика отмеченных каналов (если не отмечены - всех)
+        для видимого диапазона графиков в дереве каналов.
+        '''
+        x_range = self.get_visible_range()
+        if x_range is None or self.ctrl.get_data_main() is None:
+            return
+        channels = self.tree_widget.get_selected_elements() or [
+            name for name, _ in self.ctrl.get_headers_for_left_menu()
+        ]
+        stats = self.ctrl.window_stats(channels, *x_range)
+        self.tree_widget.update_stats(stats, f'{x_range[0]:.3f}–{x_range[1]:.3f} с')
+
+    def get_visible_range(self) -> tuple[float, float] | None:
+        '''
+        Общий диапазон времени связанных графиков, если они есть.
+        '''
+        for child in self.mdi.subWindowList():
+            widget = child.widget()
+            if widget is not None:
+                return tuple(widget.viewRange()[0])
+        return None
+
+    def export_data(self) -> None:
+        '''
+        Экспорт отмеченных каналов в диапазоне времени графиков
+        (без графиков - всех данных). Запись выполняется в отдельном потоке.
+        '''
+        if self.export_worker is not None:
+            self.send_notify('предупреждение', 'Экспорт уже выполняется')
+            return
+        if self.ctrl.get_data_main() is None or self.load_worker is not None:
+            self.send_notify('предупреждение', 'Нет данных для экспорта')
+            return
+        columns = self.tree_widget.get_selected_elements()
+        if not columns:
+            self.send_notify('предупреждение', 'Отметьте каналы для экспорта')
+            return
+        filepath, selected_filter = QFileDialog.getSaveFileName(
+            self, 'Экспорт', '', ';;'.join(EXPORT_FILTERS))
+        if not filepath:
+            return
+        if not os.path.splitext(filepath)[1]:
+            filepath += EXPORT_FILTERS.get(selected_filter, '.parquet')
+        ctrl = self.ctrl
+        t_range = self.get_visible_range()
+        with_vi = self.export_vi_action.isChecked()
+        self.export_thread = QThread(self)
+        self.export_worker = LoadWorker(
+            lambda progress: ctrl.export(filepath, columns, t_range, with_vi, progress)
+        )
+        self.export_worker.moveToThread(self.export_thread)
+        self.export_thread.started.connect(self.export_worker.run)
+        self.export_thread.finished.connect(self.export_worker.deleteLater)
+        self.export_thread.finished.connect(self.export_thread.deleteLater)
+        self.export_worker.progress.connect(self.show_export_progress)
+        self.export_worker.finished.connect(
+            lambda: self.export_stopped('успех', f'Экспорт завершен: {filepath}'))
+        self.export_worker.cancelled.connect(
+            lambda: self.export_stopped('предупреждение', 'Экспорт прерван'))
+        self.export_worker.failed.connect(
+            lambda error: self.export_stopped('ошибка', f'Ошибка экспорта: {error}'))
+        self.export_label.setText('Экспорт: 0%')
+        self.export_thread.start()
+
+    def show_export_progress(self, done: int, total: int) -> None:
+        self.export_label.setText(f'Экспорт: {100 * done // total if total else 100}%')
+
+    def export_stopped(self, notify_type: str, text: str) -> None:
+        if self.export_thread is None:
+            return
+        self.stop_export()
+        self.send_notify(notify_type, text)
+
+    def stop_export(self) -> None:
+        self.export_thread.quit()
+        self.export_thread.wait()
+        self.export_thread = None
+        self.export_worker = None
+        self.export_label.setText('')
+
+    def closeEvent(self, event) -> None:
+        # незавершенный файл экспорта удаляется при прерывании
+        if self.export_worker is not None:
+            self.export_worker.cancel()
+            self.stop_export()
+        self.cancel_loading(wait=True)
+        self.stop_stats(cancel=True)
+        super().closeEvent(event)
 
     def add_cat(self) -> None:
         pass
 
+    def show_diagnostics(self) -> None:
+        if self.diagnostics_window is None:
+            self.diagnostics_window = DiagnosticsWindow(self)
+        self.diagnostics_window.show()
+        self.diagnostics_window.raise_()
+
     def create_normal_graph(self, tree_selected=False):
+        from .graph_window import NormalGraphWidget
         if not tree_selected:
             tree_selected = self.tree_widget.get_selected_elements()
+        self.add_graph_window(NormalGraphWidget, tree_selected)
+
+    def create_waterfall(self) -> None:
+        from .graph_window import WaterfallGraphWidget
+        self.add_graph_window(WaterfallGraphWidget, ['data_vi'])
 
+    @profiled('graph.create')
+    def add_graph_window(self, widget_class, columns: list) -> None:
         sub_window = QMdiSubWindow(self.mdi)
         sub_window.setAttribute(Qt.WA_DeleteOnClose, True)
         sub_window.setWindowFlags(Qt.FramelessWindowHint)
         try:
-            graph_window = NormalGraphWidget(
-                self.ctrl, tree_selected, self, sub_window)
+            graph_window = widget_class(
+                self.ctrl, columns, self, sub_window)
             graph_window.add_vertical_line()
         except KeyError:
             self.send_notify(
@@ -206,6 +643,7 @@ class MainWindow(QMainWindow):
             return
         if self.mdi_splitter.widget(1):
             delete(self.mdi_splitter.widget(1))
+        from .graph_window import VidGraphWidget
         try:
             self.vid_graph_window = VidGraphWidget(
                 self.ctrl, ['data_vi'], self, self.mdi_splitter)
@@ -220,33 +658,39 @@ class MainWindow(QMainWindow):
         self.horizontal_windows()
 
     def track_graph(self) -> None:
-        link = self.mdi.findChild(pg.PlotWidget)
         childs = self.mdi.subWindowList()
+        link = childs[0].widget() if childs else None
 
         for i, child in enumerate(childs, 1):
-            widget = child.findChild(NormalGraphWidget)
+            widget = child.widget()
             widget.setXLink(link)
             widget.getAxis('bottom').setStyle(showValues=False)
             if i == len(childs):
                 widget.getAxis('bottom').setStyle(showValues=True)
 
+    def refresh_all_graphs(self) -> None:
+        childs = self.mdi.subWindowList()
+        for child in childs:
+            widget = child.widget()
+            widget.refresh_data()
+
     def update_all_vertical_line(self) -> None:
         childs = self.mdi.subWindowList()
         for child in childs:
-            widget = child.findChild(NormalGraphWidget)
+            widget = child.widget()
             widget.add_vertical_line()
 
     def move_all_graphics_to_vertical_line(self) -> None:
         childs = self.mdi.subWindowList()
         for child in childs:
-            widget = child.findChild(NormalGraphWidget)
+            widget = child.widget()
             widget.add_vertical_line()
             widget.move_to_vertical_line()
 
     def remove_all_vertical_line(self):
         childs = self.mdi.subWindowList()
         for child in childs:
-            widget = child.findChild(NormalGraphWidget)
+            widget = child.widget()
             widget.remove_vertical_line()
 
     def horizontal_windows(self) -> None:
@@ -255,20 +699,25 @@ class MainWindow(QMainWindow):
         '''
         if not self.mdi.subWindowList():
             return
-        QCoreApplication.processEvents()
-        window_count = len(self.mdi.subWindowList())
-        window_width = self.mdi.width()
-        window_height = self.mdi.height() // window_count
-        x, y = 0, 0
+        with span('graph.layout'):
+            QCoreApplication.processEvents()
+            window_count = len(self.mdi.subWindowList())
+            window_width = self.mdi.width()
+            window_height = self.mdi.height() // window_count
+            x, y = 0, 0
 
-        for window in self.mdi.subWindowList():
-            window.setGeometry(x, y, window_width, window_height)
-            y += window_height
+            for window in self.mdi.subWindowList():
+                window.setGeometry(x, y, window_width, window_height)
+                y += window_height
 
     def send_notify(self, type: str, txt: str) -> None:
         '''
         Метод отправки уведомления
         '''
+        from notificator.alingments import BottomRight
+        if self.notify is None:
+            from notificator import notificator
+            self.notify = notificator()
         notify = self.notify.info
         duration = 5
         match type:
@@ -296,32 +745,44 @@ class MainWindow(QMainWindow):
             self.stop_play_graph()
 
     def start_play_graph(self):
+        if self.ctrl.get_value_on_pos_x() is None:
+            self.stop_play_graph()
+            return
         self.play_graph_action.setChecked(True)
         self.play_graph_action.setIcon(
             self.style().standardIcon(QStyle.SP_MediaStop))
-        self.timer.start(self.slider.value())
-        self.timer_is_running = True
+        self.playback.start(self.ctrl.get_value_on_pos_x(), self.speed_cmbbox.currentData())
 
     def stop_play_graph(self):
         self.play_graph_action.setChecked(False)
         self.play_graph_action.setIcon(
             self.style().standardIcon(QStyle.SP_MediaPlay))
-        self.timer.stop()
-        self.timer_is_running = False
+        self.playback.stop()
+        self.playback_label.setText('')
 
-    def update_graph_on_timer(self) -> None:
-        try:
-            self.ctrl.set_next_time_index()
-        except StopIteration:
-            self.timer.stop()
-            self.play_graph_action.setChecked(False)
-            self.play_graph_action.setIcon(
-                self.style().standardIcon(QStyle.SP_MediaPlay))
-            return
+    def get_playback_end(self) -> float:
+        return self.ctrl.get_data_main()['time'].iloc[-1]
+
+    @profiled('playback.tick')
+    def show_playback_frame(self, data_time: float) -> bool:
+        '''
+        Кадр воспроизведения для времени данных. Кадры между предыдущим
+        и текущим не отрисовываются.
 
+        Returns:
+            bool: False, если кадр не изменился
+        '''
+        index = self.ctrl.get_time_index()
+        self.ctrl.get_value_on_pos_x(data_time)
+        if self.ctrl.get_time_index() == index:
+            return False
         self.move_all_graphics_to_vertical_line()
         if self.vid_graph_window is not None:
             self.vid_graph_window.set_new_data()
+        return True
+
+    def show_playback_stats(self, fps: float, target: float) -> None:
+        self.playback_label.setText(f'{fps:.0f}/{target:.0f} кадр/с')
 
     def go_to_next_time(self, backward=False, count=1):
         if not self.vid_graph_window:
@@ -337,6 +798,67 @@ class MainWindow(QMainWindow):
         self.move_all_graphics_to_vertical_line()
         self.vid_graph_window.set_new_data()
 
+    def go_to_transition(self, backward=False):
+        '''
+        Переход к ближайшему изменению отмеченных в левом меню признаков,
+        если признаки не отмечены - любого признака.
+        '''
+        if self.ctrl.get_data_main() is None:
+            return
+        if not self.vid_graph_window:
+            self.create_vid_graph()
+        flags = set(self.ctrl.get_flags())
+        channels = [name for name in self.tree_widget.get_selected_elements() if name in flags]
+        try:
+            self.ctrl.go_to_transition(channels or None, backward)
+        except StopIteration:
+            self.send_notify('Предупреждение', 'Изменений признаков больше нет')
+            return
+
+        self.move_all_graphics_to_vertical_line()
+        self.vid_graph_window.set_new_data()
+
+    def search_condition(self) -> None:
+        '''
+        Поиск интервалов, где выполняется условие, и переход
+        к первому из них после текущего кадра.
+        '''
+        expression = self.search_edit.text().strip()
+        if not expression or self.ctrl.get_data_main() is None:
+            self.search_label.setText('')
+            return
+        try:
+            intervals = self.ctrl.search(expression)
+        except ValueError as error:
+            self.search_label.setText('')
+            self.send_notify('ошибка', str(error))
+            return
+        self.search_label.setText(f' Найдено интервалов: {len(intervals)}')
+        if len(intervals):
+            self.go_to_hit()
+
+    def go_to_hit(self, backward=False):
+        '''
+        Переход к следующему (или предыдущему) интервалу, где выполняется
+        условие из панели поиска.
+        '''
+        expression = self.search_edit.text().strip()
+        if not expression or self.ctrl.get_data_main() is None:
+            return
+        if not self.vid_graph_window:
+            self.create_vid_graph()
+        try:
+            self.ctrl.go_to_hit(expression, backward)
+        except ValueError as error:
+            self.send_notify('ошибка', str(error))
+            return
+        except StopIteration:
+            self.send_notify('Предупреждение', 'Условие больше не выполняется')
+            return
+
+        self.move_all_graphics_to_vertical_line()
+        self.vid_graph_window.set_new_data()
+
     def hide_left_menu(self):
         if self.tree_widget.isVisible():
             self.tree_widget.hide()
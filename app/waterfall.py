@@ -0,0 +1,187 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from .model import PACKET_PERIOD
+from .out_of_core import release_pages
+
+# Количество кадров в строке первого сохраняемого уровня и шаг между уровнями.
+# Более мелкие шаги считаются из исходных кадров для видимого диапазона.
+BASE_STEP = 16
+LEVEL_FACTOR = 4
+# Во сколько раз уменьшается количество отсчетов кадра на сохраняемых уровнях
+SAMPLE_FACTOR = 8
+# Количество строк изображения в одной плитке
+TILE_ROWS = 256
+# Количество плиток, посчитанных из исходных кадров, которые держатся в памяти
+CACHED_TILES = 64
+# Количество исходных кадров, обрабатываемых за один раз при построении
+_CHUNK_ROWS = 65536
+
+
+def _max_over(values: np.ndarray, axis: int) -> np.ndarray:
+    '''
+    Максимум вдоль оси axis попарными np.maximum по срезам. Для uint8
+    это в несколько раз быстрее values.max(axis), который при
+    непоследней оси обходит массив поэлементно.
+    '''
+    values = np.moveaxis(values, axis, 0)
+    out = values[0].copy()
+    for part in values[1:]:
+        np.maximum(out, part, out=out)
+    return out
+
+
+def _reduce_frames(frames: np.ndarray, factor: int, sample_factor: int) -> np.ndarray:
+    '''
+    Максимумы по блокам из factor подряд идущих кадров и sample_factor
+    соседних отсчетов. Последний блок кадров может быть неполным.
+    '''
+    rows, samples = frames.shape
+    full = rows // factor * factor
+    out = _max_over(frames[:full].reshape(-1, factor, samples), 1)
+    if full < rows:
+        out = np.vstack((out, _max_over(frames[full:], 0)[np.newaxis]))
+    if sample_factor > 1:
+        out = _max_over(out.reshape(len(out), -1, sample_factor), 2)
+    return out
+
+
+class WaterfallPyramid:
+    '''
+    Пирамида изображений матрицы кадров data_vi (N, 1024) для водопада.
+
+    Строка изображения с шагом step - максимум по step подряд идущим
+    кадрам. Уровни с шагом BASE_STEP * LEVEL_FACTOR**k хранятся
+    с уменьшенным в SAMPLE_FACTOR раз количеством отсчетов, шаги 1 и 4
+    считаются из исходных кадров только для видимых плиток. Изображение
+    видимого диапазона собирается из плиток по TILE_ROWS строк,
+    привязанных к общей сетке, поэтому при сдвиге графика посчитанные
+    плитки используются повторно, а изображение в полном разрешении
+    никогда не строится целиком.
+    '''
+
+    def __init__(self, time: np.ndarray, frames: np.ndarray) -> None:
+        '''__init__
+
+        Args:
+            time (np.ndarray): отсортированный столбец времени
+            frames (np.ndarray): матрица кадров (N, количество отсчетов) uint8
+        '''
+        samples = frames.shape[1]
+        self.sample_factor = SAMPLE_FACTOR if samples % SAMPLE_FACTOR == 0 else 1
+        self.time = time[:0]
+        self.frames = frames[:0]
+        self.levels: dict[int, np.ndarray] = {}
+        self._tiles: OrderedDict[tuple[int, int], np.ndarray] = OrderedDict()
+        self.extend(time, frames)
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    @property
+    def samples(self) -> int:
+        return self.frames.shape[1]
+
+    def extend(self, time: np.ndarray, frames: np.ndarray) -> None:
+        '''
+        Переход к дописанным кадрам, начало которых совпадает с прежними.
+        Пересчитываются только строки уровней, затронутые новыми кадрами.
+        '''
+        start = len(self.time)
+        self.time = time
+        self.frames = frames
+        for key in [key for key in self._tiles if (key[1] + 1) * TILE_ROWS * key[0] > start]:
+            del self._tiles[key]
+        levels = {}
+        step, src, factor = BASE_STEP, frames, BASE_STEP
+        sample_factor = self.sample_factor
+        while len(src) > 1:
+            first = start // step if step in self.levels else 0
+            parts = [self.levels[step][:first]] if first else []
+            chunk = _CHUNK_ROWS // factor * factor
+            for pos in range(first * factor, len(src), chunk):
+                parts.append(_reduce_frames(src[pos:pos + chunk], factor, sample_factor))
+                release_pages(src)
+            level = np.concatenate(parts) if len(parts) > 1 else parts[0]
+            levels[step] = level
+            src = level
+            step *= LEVEL_FACTOR
+            factor, sample_factor = LEVEL_FACTOR, 1
+        self.levels = levels
+
+    def _tile(self, step: int, index: int) -> np.ndarray:
+        rows = slice(index * TILE_ROWS, (index + 1) * TILE_ROWS)
+        if step in self.levels:
+            return self.levels[step][rows]
+        key = (step, index)
+        tile = self._tiles.get(key)
+        if tile is None:
+            frames = self.frames[rows.start * step:rows.stop * step]
+            tile = frames if step == 1 else _reduce_frames(frames, step, 1)
+            tile = np.ascontiguousarray(tile)
+            self._tiles[key] = tile
+            if len(self._tiles) > CACHED_TILES:
+                self._tiles.popitem(last=False)
+        else:
+            self._tiles.move_to_end(key)
+        return tile
+
+    def query(self, t_start: float, t_end: float, max_rows: int) -> tuple[np.ndarray, float, float]:
+        '''
+        Изображение диапазона времени [t_start, t_end].
+
+        Строки пирамиды раскладываются по равномерной сетке времени
+        из max_rows строк: строки, попавшие в одну строку сетки,
+        объединяются максимумом, строки сетки внутри пропусков данных
+        остаются нулевыми.
+
+        Args:
+            t_start (float): начало диапазона
+            t_end (float): конец диапазона
+            max_rows (int): количество строк, обычно ширина графика в пикселях
+
+        Returns:
+            tuple[np.ndarray, float, float]: изображение (строки, отсчеты),
+            время начала первой строки и время конца последней
+        '''
+        size = len(self.time)
+        if not size:
+            return np.zeros((0, self.samples), dtype=self.frames.dtype), 0.0, 0.0
+        start = max(int(np.searchsorted(self.time, t_start, 'left')) - 1, 0)
+        end = min(int(np.searchsorted(self.time, t_end, 'right')) + 1, size)
+        target = (end - start) / max(max_rows, 1)
+        steps = [1, BASE_STEP // LEVEL_FACTOR] + sorted(self.levels)
+        step = next((step for step in steps if step >= target), steps[-1])
+        first, last = start // step, -(-end // step)
+        tiles = [
+            self._tile(step, index)
+            for index in range(first // TILE_ROWS, -(-last // TILE_ROWS))
+        ]
+        offset = first // TILE_ROWS * TILE_ROWS
+        image = np.concatenate(tiles)[first - offset:last - offset]
+
+        # время начала каждой строки и ее конца; строка, в которую попал
+        # пропуск, занимает не больше step периодов, остаток пропуска пустой
+        frames = np.arange(first, last) * step
+        row_start = self.time[frames]
+        row_end = np.minimum(
+            self.time[np.minimum(frames + step, size) - 1], row_start + (step - 1) * PACKET_PERIOD
+        ) + PACKET_PERIOD
+        t_first, t_stop = row_start[0], row_end[-1]
+        count = max(max_rows, 1)
+        pixel = ((row_start - t_first) * (count / (t_stop - t_first))).astype(np.intp)
+        np.minimum(pixel, count - 1, out=pixel)
+        starts = np.flatnonzero(np.diff(pixel, prepend=-1))
+        merged = np.maximum.reduceat(image, starts, axis=0)
+        # строка сетки берет ближайшую предыдущую строку пирамиды,
+        # если та еще не закончилась к началу строки сетки
+        owner = np.full(count, -1)
+        owner[pixel[starts]] = np.arange(len(starts))
+        np.maximum.accumulate(owner, out=owner)
+        pixel_start = t_first + (t_stop - t_first) * np.arange(count) / count
+        group_end = row_end[np.append(starts[1:], len(pixel)) - 1]
+        covered = pixel_start < group_end[owner]
+        result = np.zeros((count, image.shape[1]), dtype=image.dtype)
+        result[covered] = merged[owner[covered]]
+        return result, float(t_first), float(t_stop)
@@ -0,0 +1,69 @@
+'''
+Сравнение распаковки 72 битовых признаков: прежний способ
+(сдвиги по каждому биту и join на каждый байт) и np.unpackbits.
+
+Запуск: python -m benchmarks.bench_bits --packets 1000000
+'''
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.model import unpack_bits
+
+from .synthetic import PACKET_LENGTHS
+
+# Положение блока bit_data и основного блока в пакете формата '1'
+BIT_DATA = slice(1087, 1096)
+DATA_MAIN = slice(1097, 1179)
+
+
+def legacy_unpack(df: pd.DataFrame, columns: list[list[str]], bit_data: np.ndarray) -> pd.DataFrame:
+    for i, names in enumerate(columns):
+        res = {}
+        for j, name in enumerate(names):
+            res[name] = (bit_data[:, i] & (1 << j)) >> j
+        df = df.join(pd.DataFrame(data=res))
+    return df
+
+
+def vectorized_unpack(df: pd.DataFrame, columns: list[list[str]], bit_data: np.ndarray) -> pd.DataFrame:
+    return pd.concat([df, unpack_bits(columns, bit_data)], axis=1, copy=False)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--packets', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    packets = rng.integers(
+        0, 256, size=(args.packets, PACKET_LENGTHS['1']), dtype=np.uint8
+    )
+    bit_data = packets[:, BIT_DATA]
+    main_block = packets[:, DATA_MAIN].copy().view('>i2')
+    df = pd.DataFrame(main_block, columns=[f'main_{i}' for i in range(41)])
+    columns = [[f'z_{i}_{j}' for j in range(8)] for i in range(9)]
+
+    results = {}
+    for name, func in (('legacy', legacy_unpack), ('unpackbits', vectorized_unpack)):
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            results[name] = func(df, columns, bit_data)
+            best = min(best, time.perf_counter() - start)
+        nbytes = results[name].memory_usage(index=False).sum() - df.memory_usage(index=False).sum()
+        print(f'{name:>10}: {best:8.3f} с, признаки занимают {nbytes / 2**20:8.1f} МБ')
+
+    flags = [name for group in columns for name in group]
+    same = np.array_equal(
+        results['legacy'][flags].to_numpy(dtype=np.uint8),
+        results['unpackbits'][flags].to_numpy(dtype=np.uint8)
+    )
+    print('Результаты совпадают' if same else 'Результаты различаются')
+
+
+if __name__ == '__main__':
+    main()
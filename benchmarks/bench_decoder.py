@@ -0,0 +1,67 @@
+'''
+Сравнение чтения через mmap и через dpkt.
+
+Запуск: python -m benchmarks.bench_decoder --packets 100000
+'''
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from app.model import get_layouts
+from app.pcap_reader import read_packets, read_packets_dpkt
+
+from .synthetic import write_capture
+
+READERS = {'mmap': read_packets, 'dpkt': read_packets_dpkt}
+
+
+def measure(func, *args, **kwargs):
+    '''
+    Время выполнения и пиковый объем памяти, выделенной через tracemalloc.
+    '''
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def load(filepath: str, layout: str, reader) -> pd.DataFrame:
+    layout = get_layouts()[layout]
+    columns = layout.decode(reader(filepath, layout.length))
+    columns.pop('data_vi')
+    return pd.DataFrame(columns, copy=False)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--packets', type=int, default=100_000)
+    parser.add_argument('--layout', choices=list(get_layouts()), default='1')
+    parser.add_argument('--format', choices=['pcap', 'pcapng'], default='pcap')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_capture(
+            os.path.join(tmp, f'capture.{args.format}'),
+            args.packets, args.layout, args.format
+        )
+        size_mb = os.path.getsize(path) / 2**20
+        print(f'{args.packets} пакетов, формат {args.layout}, '
+              f'{args.format}, {size_mb:.1f} МБ')
+        results = {}
+        for name, reader in READERS.items():
+            df, elapsed, peak = measure(load, path, args.layout, reader)
+            results[name] = df
+            print(f'{name:>5}: {elapsed:8.3f} с, пик памяти {peak / 2**20:8.1f} МБ')
+        same = results['mmap'].equals(results['dpkt'])
+        print('Результаты совпадают' if same else 'Результаты различаются')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+'''
+Время поиска индекса по координате x в зависимости от длины записи:
+прежний поиск через (time - x).abs().idxmin() и двоичный поиск.
+
+Запуск: python -m benchmarks.bench_time_index --sizes 100000 1000000 10000000
+'''
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.controller import DataController
+
+
+def best_time(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--sizes', type=int, nargs='+',
+        default=[100_000, 1_000_000, 10_000_000, 30_000_000]
+    )
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--batch', type=int, default=1000)
+    parser.add_argument('--legacy-limit', type=int, default=10_000_000,
+                        help='прежний поиск не запускается на больших размерах')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f'{"пакетов":>12} {"idxmin, мс":>12} {"поиск, мкс":>12} '
+          f'{"пачка, мкс/шт":>14}')
+    for size in args.sizes:
+        ctrl = DataController()
+        ctrl._set_table({'time': np.arange(size) * 0.002, 'data_vi': None})
+        time_col = ctrl.get_data_main()['time']
+        pos_x = float(rng.uniform(0, size * 0.002))
+        positions = rng.uniform(0, size * 0.002, args.batch)
+
+        legacy = float('nan')
+        if size <= args.legacy_limit:
+            legacy = best_time(lambda: (time_col - pos_x).abs().idxmin(), args.repeat)
+        single = best_time(lambda: ctrl.get_value_on_pos_x(pos_x), args.repeat)
+        batch = best_time(lambda: ctrl.get_indexes_on_pos_x(positions), args.repeat)
+        print(f'{size:>12} {legacy * 1e3:>12.2f} {single * 1e6:>12.1f} '
+              f'{batch / args.batch * 1e6:>14.3f}')
+
+
+if __name__ == '__main__':
+    main()
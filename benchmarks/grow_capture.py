@@ -0,0 +1,59 @@
+'''
+Дописывание синтетических пакетов в файл для проверки режима
+слежения за файлом ("Файл" -> "Следить за файлом").
+
+Файл создается заново и пополняется раз в --period секунд. Последняя
+запись каждой порции записывается в два приема, как при сбросе буфера
+tcpdump посреди записи, поэтому в конце файла бывает неполная запись.
+
+Запуск: python -m benchmarks.grow_capture /tmp/live.pcap --rate 500
+'''
+import argparse
+import time
+
+import numpy as np
+
+from .synthetic import PACKET_LENGTHS, _pcap_header, _pcapng_header, _records, make_payload
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path')
+    parser.add_argument('--layout', choices=list(PACKET_LENGTHS), default='1')
+    parser.add_argument('--format', choices=['pcap', 'pcapng'], default='pcap')
+    parser.add_argument('--rate', type=int, default=500, help='пакетов в секунду')
+    parser.add_argument('--period', type=float, default=0.2, help='период дописывания, с')
+    parser.add_argument('--duration', type=float, default=60, help='длительность, с')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    interval_us = 1_000_000 // args.rate
+    ts_us = int(time.time() * 1_000_000)
+    tail = b''
+    previous = None
+    written = 0
+    with open(args.path, 'wb') as f:
+        f.write(_pcap_header() if args.format == 'pcap' else _pcapng_header())
+        f.flush()
+        stop = time.monotonic() + args.duration
+        while time.monotonic() < stop:
+            count = max(int(args.rate * args.period), 1)
+            stamps = ts_us + np.arange(count, dtype=np.int64) * interval_us
+            ts_us += count * interval_us
+            payload = make_payload(args.layout, count, rng, previous)
+            previous = payload[-1]
+            records = _records(args.format, payload, stamps)
+            # половина последней записи остается до следующей порции
+            data = tail + records
+            tail = records[len(records) - len(records) // count // 2:]
+            f.write(data[:len(data) - len(tail)])
+            f.flush()
+            written += count
+            print(f'\rзаписано пакетов: {written}', end='', flush=True)
+            time.sleep(args.period)
+        f.write(tail)
+    print()
+
+
+if __name__ == '__main__':
+    main()
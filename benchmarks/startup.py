@@ -0,0 +1,155 @@
+'''
+Замер холодного запуска: время импорта app.view по -X importtime
+и время до построения главного окна, каждый запуск в новом процессе.
+
+Окно должно появляться до загрузки pandas, NumPy и pyqtgraph
+(см. view.PRELOAD_MODULES). Если какой-либо из DEFERRED_MODULES
+импортируется вместе с app.view или конструктором окна, или время
+импорта превышает --max-ms,
+замер завершается с кодом 1, поэтому его можно запускать в CI.
+
+Запуск: python -m benchmarks.startup --output startup.json
+        python -m benchmarks.startup --compare old.json --max-ms 300
+'''
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULE = 'app.view'
+# Модули, которые не должны импортироваться до появления окна
+DEFERRED_MODULES = [
+    'numpy', 'pandas', 'pyqtgraph', 'dpkt', 'notificator', 'app.controller', 'app.model',
+]
+# Построение окна без показа на экране: выводятся модули, загруженные
+# конструктором окна (до фоновой загрузки), и момент, когда окно построено
+_WINDOW_CODE = '''
+import json, sys, time
+from PyQt5.QtWidgets import QApplication
+from app.view import MainWindow
+app = QApplication(sys.argv)
+window = MainWindow(app=app)
+loaded = [name for name in json.loads(sys.argv[1]) if name in sys.modules]
+app.processEvents()
+print(json.dumps({'time': time.time(), 'loaded': loaded}))
+'''
+
+
+def _env() -> dict:
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    return env
+
+
+def import_times(module: str = MODULE) -> dict[str, tuple[int, int]]:
+    '''
+    Импорт модуля в новом процессе с -X importtime.
+
+    Returns:
+        dict[str, tuple[int, int]]: для каждого импортированного модуля
+        собственное и суммарное (с вложенными импортами) время, мкс
+    '''
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, cwd=ROOT, env=_env(), check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        if own.strip().isdigit():
+            times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+
+def build_window() -> tuple[float, list[str]]:
+    '''
+    Построение главного окна в новом процессе.
+
+    Returns:
+        tuple[float, list[str]]: время от запуска процесса до построения окна, с,
+        и модули из DEFERRED_MODULES, загруженные конструктором окна
+    '''
+    # часы perf_counter у процессов разные, поэтому время отсчитывается по time.time()
+    start = time.time()
+    result = subprocess.run(
+        [sys.executable, '-c', _WINDOW_CODE, json.dumps(DEFERRED_MODULES)],
+        capture_output=True, text=True, cwd=ROOT, env=_env(), check=True
+    )
+    window = json.loads(result.stdout.splitlines()[-1])
+    return window['time'] - start, window['loaded']
+
+
+def measure(repeat: int) -> dict:
+    runs = [import_times() for _ in range(repeat)]
+    totals = [run[MODULE][1] / 1000 for run in runs]
+    last = runs[-1]
+    heaviest = sorted(last.items(), key=lambda item: item[1][1], reverse=True)
+    windows = [build_window() for _ in range(repeat)]
+    loaded = set(windows[-1][1]).union(last)
+    return {
+        'import_ms': statistics.median(totals),
+        'import_ms_runs': totals,
+        'window_s': statistics.median(seconds for seconds, _ in windows),
+        'deferred_imported': [name for name in DEFERRED_MODULES if name in loaded],
+        'heaviest': [
+            {'module': name, 'self_ms': own / 1000, 'cumulative_ms': cumulative / 1000}
+            for name, (own, cumulative) in heaviest[:15]
+        ],
+    }
+
+
+def compare(old: dict, new: dict) -> None:
+    print(f'{"":>12} {"было":>10} {"стало":>10} {"изменение":>10}')
+    for key, title in (('import_ms', 'импорт, мс'), ('window_s', 'окно, с')):
+        before, after = old['results'][key], new['results'][key]
+        print(f'{title:>12} {before:>10.3f} {after:>10.3f} {after / before - 1:>+10.1%}')
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-ms', type=float, help='допустимое время импорта app.view, мс')
+    parser.add_argument('--output', default='startup.json')
+    parser.add_argument('--compare', help='JSON с результатами для сравнения')
+    args = parser.parse_args()
+
+    results = {
+        'meta': {
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'results': measure(args.repeat),
+    }
+    measured = results['results']
+    print(f'импорт {MODULE}: {measured["import_ms"]:.1f} мс (медиана из {args.repeat})')
+    print(f'построение окна: {measured["window_s"]:.3f} с')
+    for entry in measured['heaviest']:
+        print(f'{entry["cumulative_ms"]:>10.1f} мс  {entry["module"]}')
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f'Результаты записаны в {args.output}')
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), results)
+
+    failed = False
+    if measured['deferred_imported']:
+        print(f'До появления окна импортируются: {", ".join(measured["deferred_imported"])}')
+        failed = True
+    if args.max_ms is not None and measured['import_ms'] > args.max_ms:
+        print(f'Импорт {MODULE} дольше {args.max_ms:g} мс')
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,296 @@
+'''
+Набор замеров без графического интерфейса на синтетических файлах
+обоих форматов пакетов: время и пиковый объем памяти (RSS) чтения файла,
+чтения папки в память и в хранилище на диске, поиска по координате x,
+получения кадра data_vi и имитации воспроизведения.
+
+Каждый замер выполняется в отдельном процессе, чтобы пиковый RSS
+относился только к нему. Результаты записываются в JSON, а --compare
+сравнивает их с результатами другого коммита.
+
+Запуск: python -m benchmarks.suite --packets 10000 1000000 --output results.json
+        python -m benchmarks.suite --compare old.json --output new.json
+'''
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:
+    # на Windows пиковый RSS не измеряется
+    resource = None
+
+from app.controller import DataController
+from app.model import get_data_from_file, get_layouts
+from app.out_of_core import SegmentStore
+
+from .synthetic import write_capture
+
+CASES = [
+    'decode', 'read_file', 'read_file_cached', 'read_dir', 'read_dir_store',
+    'value_on_pos_x', 'data_vi', 'playback',
+]
+# Количество обращений в замерах поиска и кадров
+_CALLS = 10_000
+# Количество кадров и каналов в имитации воспроизведения
+_PLAYBACK_FRAMES = 1000
+_PLAYBACK_CHANNELS = 3
+# Видимый диапазон графиков при воспроизведении, с
+_PLAYBACK_WINDOW = 10.0
+
+
+def _peak_rss_mb(children: bool = False) -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(
+        resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    ).ru_maxrss
+    # Linux сообщает килобайты, macOS байты
+    return peak / (2**20 if sys.platform == 'darwin' else 2**10)
+
+
+def _loaded_controller(path: str, layout: str) -> DataController:
+    ctrl = DataController()
+    ctrl.filepath = path
+    ctrl._reset_derived(layout)
+    df, data_vi = get_data_from_file(path, layout)
+    columns = {name: df[name].to_numpy() for name in df.columns}
+    columns['data_vi'] = data_vi
+    ctrl._set_table(columns)
+    return ctrl
+
+
+def _read_file(path: str, layout: str) -> DataController:
+    ctrl = DataController()
+    ctrl.read_data_from_file(path, layout)
+    return ctrl
+
+
+def _value_on_pos_x(ctrl: DataController, rng: np.random.Generator) -> None:
+    end = ctrl.get_data_main()['time'].iloc[-1]
+    for pos_x in rng.uniform(0, end, _CALLS):
+        ctrl.get_value_on_pos_x(pos_x)
+
+
+def _data_vi(ctrl: DataController, rng: np.random.Generator) -> None:
+    for index in rng.integers(0, len(ctrl.get_data_main()), _CALLS):
+        ctrl._time_index = int(index)
+        ctrl.get_data_vi().max()
+
+
+def _playback(ctrl: DataController, channels: list[str]) -> None:
+    '''
+    То же, что делает таймер воспроизведения: переход на следующий кадр,
+    перенос вертикальной линии, новый кадр data_vi и пересчет видимых
+    точек графиков под сдвинутый диапазон.
+    '''
+    for _ in range(_PLAYBACK_FRAMES):
+        try:
+            ctrl.set_next_time_index()
+        except StopIteration:
+            ctrl._time_index = 0
+        center = ctrl.get_value_on_pos_x()
+        ctrl.get_data_vi().max()
+        ctrl.query(channels, center - _PLAYBACK_WINDOW / 2, center + _PLAYBACK_WINDOW / 2, 2000)
+
+
+def run_case(case: str, path: str, layout: str) -> dict:
+    '''
+    Один замер. Выполняется в отдельном процессе.
+
+    Returns:
+        dict: время замера, RSS после подготовки и пиковый RSS процесса
+        и его рабочих процессов, МБ; для decode еще объем таблицы и data_vi,
+        для чтения файла объем таблицы и признаков, хранящихся переходами, МБ
+    '''
+    rng = np.random.default_rng(0)
+    prepare = None
+    if case == 'decode':
+        func = lambda: get_data_from_file(path, layout)
+    elif case in ('read_file', 'read_file_cached'):
+        if case == 'read_file':
+            prepare = lambda: DataController().cache.invalidate(all_versions=True)
+        else:
+            prepare = lambda: DataController().read_data_from_file(path, layout)
+        func = lambda: _read_file(path, layout)
+    elif case == 'read_dir':
+        func = lambda: DataController().read_data_from_dir(path, layout, out_of_core=False)
+    elif case == 'read_dir_store':
+        prepare = lambda: shutil.rmtree(SegmentStore.for_dir(path).path, ignore_errors=True)
+        func = lambda: DataController().read_data_from_dir(path, layout, out_of_core=True)
+    else:
+        ctrl = _loaded_controller(path, layout)
+        if case == 'value_on_pos_x':
+            func = lambda: _value_on_pos_x(ctrl, rng)
+        elif case == 'data_vi':
+            func = lambda: _data_vi(ctrl, rng)
+        else:
+            channels = [name for name, _ in ctrl.get_headers_for_left_menu()]
+            channels = channels[:_PLAYBACK_CHANNELS]
+            # пирамиды строятся при создании графиков, а не при воспроизведении
+            prepare = lambda: ctrl.query(channels, -np.inf, np.inf, 2000)
+            func = lambda: _playback(ctrl, channels)
+    if prepare is not None:
+        prepare()
+    setup_rss = _peak_rss_mb()
+    start = time.perf_counter()
+    value = func()
+    elapsed = time.perf_counter() - start
+    result = {
+        'seconds': elapsed,
+        'setup_rss_mb': setup_rss,
+        'peak_rss_mb': _peak_rss_mb(),
+        'workers_peak_rss_mb': _peak_rss_mb(children=True),
+    }
+    if case == 'decode':
+        df, data_vi = value
+        result['table_mb'] = df.memory_usage(index=False).sum() / 2**20
+        result['data_vi_mb'] = data_vi.nbytes / 2**20
+    elif case.startswith('read_file'):
+        result['table_mb'] = value.get_data_main().memory_usage(index=False).sum() / 2**20
+        result['flags_mb'] = sum(flag.nbytes for flag in value._table.flags.values()) / 2**20
+    return result
+
+
+def _measure(case: str, path: str, layout: str, repeat: int) -> dict:
+    '''
+    Лучший из repeat замеров, каждый в новом процессе.
+    '''
+    best = None
+    for _ in range(repeat):
+        with ProcessPoolExecutor(1, mp_context=get_context('spawn')) as pool:
+            result = pool.submit(run_case, case, path, layout).result()
+        if best is None or result['seconds'] < best['seconds']:
+            best = result
+    return best
+
+
+def _prepare_files(workdir: str, packets: int, layout: str, fmt: str, dir_files: int) -> tuple[str, str]:
+    '''
+    Синтетический файл и папка из dir_files файлов с тем же
+    общим количеством пакетов. Уже созданные файлы используются повторно.
+    '''
+    name = f'{layout}_{fmt}_{packets}'
+    path = os.path.join(workdir, f'{name}.{fmt}')
+    if not os.path.exists(path):
+        write_capture(path, packets, layout, fmt)
+    dirpath = os.path.join(workdir, f'{name}_dir')
+    if not os.path.isdir(dirpath):
+        os.makedirs(dirpath)
+        per_file = -(-packets // dir_files)
+        start_us = 1_700_000_000_000_000
+        for i, start in enumerate(range(0, packets, per_file)):
+            count = min(per_file, packets - start)
+            write_capture(
+                os.path.join(dirpath, f'{i:03}.{fmt}'), count, layout, fmt,
+                start_us=start_us + start * 2000, seed=i
+            )
+    return path, dirpath
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _key(result: dict) -> tuple:
+    return result['case'], result['layout'], result['format'], result['packets']
+
+
+def compare(baseline: dict, results: dict) -> None:
+    old = {_key(result): result for result in baseline['results']}
+    print(f'\nСравнение с {baseline["meta"].get("commit")}:')
+    print(f'{"замер":>18} {"формат":>6} {"файл":>6} {"пакетов":>10} '
+          f'{"было, с":>10} {"стало, с":>10} {"отношение":>10}')
+    for result in results['results']:
+        prev = old.get(_key(result))
+        if prev is None:
+            continue
+        ratio = result['seconds'] / prev['seconds'] if prev['seconds'] else float('nan')
+        print(f'{result["case"]:>18} {result["layout"]:>6} {result["format"]:>6} '
+              f'{result["packets"]:>10} {prev["seconds"]:>10.4f} '
+              f'{result["seconds"]:>10.4f} {ratio:>10.2f}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--packets', type=int, nargs='+', default=[10_000, 1_000_000])
+    parser.add_argument('--layouts', nargs='+', choices=list(get_layouts()),
+                        default=list(get_layouts()))
+    parser.add_argument('--formats', nargs='+', choices=['pcap', 'pcapng'],
+                        default=['pcap', 'pcapng'])
+    parser.add_argument('--cases', nargs='+', choices=CASES, default=CASES)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--dir-files', type=int, default=8,
+                        help='количество файлов в папке для read_dir')
+    parser.add_argument('--workdir', help='папка для синтетических файлов, '
+                        'по умолчанию временная')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='JSON с результатами для сравнения')
+    args = parser.parse_args()
+
+    results = {
+        'meta': {
+            'commit': _git_commit(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'results': [],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = args.workdir or tmp
+        os.makedirs(workdir, exist_ok=True)
+        # кэш декодирования замеров не должен смешиваться с рабочим
+        os.environ['VIDGRAPHICS_CACHE_DIR'] = os.path.join(tmp, 'cache')
+        print(f'{"замер":>18} {"формат":>6} {"файл":>6} {"пакетов":>10} '
+              f'{"время, с":>10} {"RSS, МБ":>10}')
+        for packets in args.packets:
+            for layout in args.layouts:
+                for fmt in args.formats:
+                    path, dirpath = _prepare_files(
+                        workdir, packets, layout, fmt, args.dir_files
+                    )
+                    for case in args.cases:
+                        result = _measure(
+                            case, dirpath if case.startswith('read_dir') else path,
+                            layout, args.repeat
+                        )
+                        result.update(case=case, layout=layout, format=fmt, packets=packets)
+                        results['results'].append(result)
+                        rss = result['peak_rss_mb']
+                        print(f'{case:>18} {layout:>6} {fmt:>6} {packets:>10} '
+                              f'{result["seconds"]:>10.4f} '
+                              f'{rss if rss is None else round(rss):>10}')
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f'Результаты записаны в {args.output}')
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+import numpy as np
+
+from app.model import get_layouts
+
+PACKET_LENGTHS = {name: layout.length for name, layout in get_layouts().items()}
+# Вероятность смены значения бита признака от пакета к пакету:
+# признаки в реальных записях меняются редко
+FLAG_FLIP_RATE = 1e-3
+
+# Количество пакетов, формируемых в памяти за один раз
+_CHUNK = 65536
+
+
+def _pcap_header() -> bytes:
+    return np.array(
+        [(0xA1B2C3D4, 2, 4, 0, 0, 65535, 1)],
+        dtype=[('magic', '<u4'), ('major', '<u2'), ('minor', '<u2'),
+               ('zone', '<i4'), ('sigfigs', '<u4'), ('snaplen', '<u4'),
+               ('linktype', '<u4')]
+    ).tobytes()
+
+
+def _pcapng_header() -> bytes:
+    shb = np.array(
+        [(0x0A0D0D0A, 28, 0x1A2B3C4D, 1, 0, -1, 28)],
+        dtype=[('type', '<u4'), ('len', '<u4'), ('bom', '<u4'),
+               ('major', '<u2'), ('minor', '<u2'), ('section', '<i8'),
+               ('len2', '<u4')]
+    ).tobytes()
+    idb = np.array(
+        [(1, 20, 1, 0, 65535, 20)],
+        dtype=[('type', '<u4'), ('len', '<u4'), ('linktype', '<u2'),
+               ('reserved', '<u2'), ('snaplen', '<u4'), ('len2', '<u4')]
+    ).tobytes()
+    return shb + idb
+
+
+def _records(fmt: str, payload: np.ndarray, ts_us: np.ndarray) -> bytes:
+    count, packet_len = payload.shape
+    if fmt == 'pcap':
+        dt = np.dtype([
+            ('ts_sec', '<u4'), ('ts_usec', '<u4'), ('incl', '<u4'),
+            ('orig', '<u4'), ('data', np.uint8, packet_len)
+        ])
+        rec = np.empty(count, dtype=dt)
+        rec['ts_sec'] = ts_us // 1_000_000
+        rec['ts_usec'] = ts_us % 1_000_000
+        rec['incl'] = packet_len
+        rec['orig'] = packet_len
+    else:
+        padded = (packet_len + 3) // 4 * 4
+        dt = np.dtype([
+            ('type', '<u4'), ('len', '<u4'), ('iface', '<u4'),
+            ('ts_high', '<u4'), ('ts_low', '<u4'), ('caplen', '<u4'),
+            ('orig', '<u4'), ('data', np.uint8, padded), ('len2', '<u4')
+        ])
+        rec = np.zeros(count, dtype=dt)
+        rec['type'] = 6
+        rec['len'] = dt.itemsize
+        rec['len2'] = dt.itemsize
+        rec['ts_high'] = ts_us >> 32
+        rec['ts_low'] = ts_us & 0xFFFFFFFF
+        rec['caplen'] = packet_len
+        rec['orig'] = packet_len
+    rec['data'][:, :packet_len] = payload
+    return rec.tobytes()
+
+
+def _flag_bytes(layout: str) -> np.ndarray:
+    '''
+    Номера байт пакета, занятых битовыми признаками.
+    '''
+    description = get_layouts()[layout]
+    flags = [
+        description.dtype.fields[name][1] + np.arange(len(params))
+        for kind, name, params in description._plan if kind == 'bits'
+    ]
+    return np.concatenate(flags) if flags else np.zeros(0, dtype=np.intp)
+
+
+def make_payload(layout: str,
+                 count: int,
+                 rng: np.random.Generator,
+                 previous: np.ndarray | None = None) -> np.ndarray:
+    '''
+    Случайное содержимое пакетов заданного формата. Биты признаков
+    меняются с вероятностью FLAG_FLIP_RATE, начиная со значений
+    в пакете previous (последнем пакете предыдущей порции).
+    '''
+    payload = rng.integers(
+        0, 256, size=(count, PACKET_LENGTHS[layout]), dtype=np.uint8
+    )
+    flags = _flag_bytes(layout)
+    if len(flags) and count:
+        flips = np.packbits(
+            rng.random((count, len(flags) * 8)) < FLAG_FLIP_RATE, axis=1, bitorder='little'
+        )
+        if previous is not None:
+            flips[0] ^= previous[flags]
+        payload[:, flags] = np.bitwise_xor.accumulate(flips, axis=0)
+    return payload
+
+
+def write_capture(filepath: str,
+                  count: int,
+                  layout: str = '1',
+                  fmt: str = 'pcap',
+                  start_us: int = 1_700_000_000_000_000,
+                  interval_us: int = 2000,
+                  seed: int = 0) -> str:
+    '''
+    Запись синтетического pcap/pcapng файла.
+
+    Args:
+        filepath (str): путь к создаваемому файлу
+        count (int): количество пакетов
+        layout (str): название формата пакета из реестра
+        fmt (str): 'pcap' или 'pcapng'
+        start_us (int): метка времени первого пакета в микросекундах
+        interval_us (int): период следования пакетов в микросекундах
+        seed (int): зерно генератора случайных чисел
+
+    Returns:
+        str: путь к файлу
+    '''
+    rng = np.random.default_rng(seed)
+    previous = None
+    with open(filepath, 'wb') as f:
+        f.write(_pcap_header() if fmt == 'pcap' else _pcapng_header())
+        for start in range(0, count, _CHUNK):
+            n = min(_CHUNK, count - start)
+            ts_us = start_us + (start + np.arange(n, dtype=np.int64)) * interval_us
+            payload = make_payload(layout, n, rng, previous)
+            previous = payload[-1]
+            f.write(_records(fmt, payload, ts_us))
+    return filepath
@@ -0,0 +1,24 @@
+import pytest
+
+from benchmarks.synthetic import write_capture
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    '''
+    Отдельная папка кэша декодирования для каждого теста.
+    '''
+    path = tmp_path / 'cache'
+    monkeypatch.setenv('VIDGRAPHICS_CACHE_DIR', str(path))
+    return str(path)
+
+
+@pytest.fixture
+def capture(tmp_path):
+    '''
+    Фабрика синтетических записей: capture(count, layout, fmt, ...) -> путь.
+    '''
+    def make(count: int, layout: str = '1', fmt: str = 'pcap', **kwargs) -> str:
+        name = f'{layout}_{fmt}_{count}_{len(list(tmp_path.iterdir()))}.{fmt}'
+        return write_capture(str(tmp_path / name), count, layout, fmt, **kwargs)
+    return make
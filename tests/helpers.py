@@ -0,0 +1,14 @@
+import numpy as np
+
+from app.controller import DataController
+
+
+def assert_same_data(actual: DataController, expected: DataController) -> None:
+    '''
+    Одинаковые каналы, значения с коэффициентами и кадры data_vi.
+    '''
+    assert actual._table.channels == expected._table.channels
+    for name in expected._table.channels:
+        np.testing.assert_array_equal(actual.get_column(name), expected.get_column(name), name)
+    np.testing.assert_array_equal(actual._table.data_vi, expected._table.data_vi)
+    np.testing.assert_array_equal(actual.get_gaps(), expected.get_gaps())
@@ -0,0 +1,59 @@
+import numpy as np
+
+from app.column_buffer import ColumnBuffer, merge_schemas
+from app.model import get_layouts
+from app.pcap_reader import Packets
+
+
+def test_merge_schemas():
+    layouts = get_layouts()
+    merged = merge_schemas([layouts['1'].schema, layouts['2'].schema])
+    # data_vi есть в обоих форматах: тип и форма строки не меняются
+    assert merged['data_vi'] == (np.dtype(np.uint8), (1024,))
+    # столбец только одного формата получает тип с NaN для пропусков
+    assert merged['MD'][0].kind == 'f'
+    assert merged['z_RIP'][0].kind == 'f'
+    same = merge_schemas([layouts['1'].schema])
+    assert same == layouts['1'].schema
+
+
+def test_merge_widens_common_columns():
+    merged = merge_schemas([
+        {'a': (np.dtype(np.int16), ()), 'm': (np.dtype(np.uint8), (3,))},
+        {'a': (np.dtype(np.uint16), ())},
+    ])
+    assert merged['a'] == (np.dtype(np.int32), ())
+    # в матрицах пропуски заполняются нулями без смены типа
+    assert merged['m'] == (np.dtype(np.uint8), (3,))
+
+
+def test_append_with_changing_columns():
+    buffer = ColumnBuffer(2)
+    buffer.append({'a': np.array([1, 2], np.int16), 'm': np.ones((2, 3), np.uint8)})
+    first = buffer.columns()
+    buffer.append({'a': np.array([3], np.uint16), 'b': np.array([True])})
+    buffer.append({'b': np.array([False, True])})
+    columns = buffer.columns()
+    assert len(buffer) == 5
+    np.testing.assert_array_equal(columns['a'], [1, 2, 3, np.nan, np.nan])
+    np.testing.assert_array_equal(columns['b'], [np.nan, np.nan, 1, 0, 1])
+    np.testing.assert_array_equal(columns['m'], [[1] * 3] * 2 + [[0] * 3] * 3)
+    assert columns['m'].dtype == np.uint8
+    # выданные раньше представления не меняются при дописывании
+    np.testing.assert_array_equal(first['a'], [1, 2])
+
+
+def test_matches_merge_schemas():
+    layouts = get_layouts()
+    buffer = ColumnBuffer()
+    for name in ('1', '2', '1'):
+        packets = Packets(
+            np.zeros((4, layouts[name].length), np.uint8), np.zeros(4, np.int64)
+        )
+        buffer.append(layouts[name].decode(packets))
+    merged = merge_schemas([layouts['1'].schema, layouts['2'].schema])
+    columns = buffer.columns()
+    assert set(columns) == set(merged)
+    for name, (dtype, row_shape) in merged.items():
+        assert columns[name].dtype == dtype, name
+        assert columns[name].shape[1:] == row_shape
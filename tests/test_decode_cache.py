@@ -0,0 +1,100 @@
+import os
+import time
+
+import numpy as np
+
+from app.decode_cache import DecodeCache, key_name
+from app.stats import StatsCache
+
+
+def columns(size: int = 1000) -> dict:
+    return {
+        'time': np.arange(size) * 0.002,
+        'data_vi': np.ones((size, 4), np.uint8),
+        'z_flag': (np.array([0, 10]), np.array([False, True])),
+    }
+
+
+def make_file(path, content: bytes = b'x' * 100) -> str:
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_round_trip(tmp_path, cache_dir):
+    cache = DecodeCache(1, cache_dir)
+    filepath = make_file(tmp_path / 'a.pcap')
+    description = cache.describe(filepath, '1')
+    assert cache.load(description) is None
+    cache.store(description, columns())
+    loaded = cache.load(cache.describe(filepath, '1'))
+    assert list(loaded) == ['time', 'data_vi', 'z_flag']
+    np.testing.assert_array_equal(loaded['time'], columns()['time'])
+    assert isinstance(loaded['data_vi'], np.memmap)
+    starts, values = loaded['z_flag']
+    np.testing.assert_array_equal(starts, [0, 10])
+    np.testing.assert_array_equal(values, [False, True])
+
+
+def test_key_invalidation(tmp_path, cache_dir):
+    cache = DecodeCache(1, cache_dir)
+    filepath = make_file(tmp_path / 'a.pcap')
+    cache.store(cache.describe(filepath, '1'), columns())
+    # другая функция распаковки - другой ключ
+    assert cache.load(cache.describe(filepath, '2')) is None
+    # запись другой версии декодера не используется и удаляется
+    newer = DecodeCache(2, cache_dir)
+    assert newer.load(newer.describe(filepath, '1')) is None
+    newer.invalidate()
+    assert cache.load(cache.describe(filepath, '1')) is None
+    # измененный файл с тем же размером
+    cache.store(cache.describe(filepath, '1'), columns())
+    make_file(tmp_path / 'a.pcap', b'y' * 100)
+    assert cache.load(cache.describe(filepath, '1')) is None
+
+
+def test_store_skips_changed_file(tmp_path, cache_dir):
+    cache = DecodeCache(1, cache_dir)
+    filepath = make_file(tmp_path / 'a.pcap')
+    description = cache.describe(filepath, '1')
+    # файл дописан во время декодирования
+    with open(filepath, 'ab') as f:
+        f.write(b'z')
+    cache.store(description, columns())
+    assert cache.load(description) is None
+    assert not os.path.exists(os.path.join(cache_dir, key_name(description)))
+
+
+def test_eviction(tmp_path, cache_dir):
+    size = 1000
+    entry = sum(
+        sum(part.nbytes for part in values) if isinstance(values, tuple) else values.nbytes
+        for values in columns(size).values()
+    )
+    cache = DecodeCache(1, cache_dir)
+    stats = StatsCache(cache_dir)
+    descriptions = []
+    for i in range(4):
+        filepath = make_file(tmp_path / f'{i}.pcap', bytes([i]) * 100)
+        descriptions.append(cache.describe(filepath, '1'))
+        cache.store(descriptions[-1], columns(size))
+        stats.store(descriptions[-1], {'time': {'count': size}})
+        # время последнего обращения по порядку записи
+        meta = os.path.join(cache_dir, key_name(descriptions[-1]), 'meta.json')
+        os.utime(meta, (time.time() - 100 + i,) * 2)
+    # первая запись использовалась последней и вытесняется позже остальных
+    assert cache.load(descriptions[0]) is not None
+    cache.max_bytes = int(entry * 2.5)
+    cache.evict()
+    kept = [cache.load(description) is not None for description in descriptions]
+    assert kept == [True, False, False, True]
+    # статистика вытесненных записей удаляется вместе с ними
+    for description, present in zip(descriptions, kept):
+        assert (stats.load(description) is not None) == present
+
+
+def test_newest_entry_is_never_evicted(tmp_path, cache_dir):
+    cache = DecodeCache(1, cache_dir, max_bytes=1)
+    filepath = make_file(tmp_path / 'a.pcap')
+    description = cache.describe(filepath, '1')
+    cache.store(description, columns())
+    assert cache.load(description) is not None
@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+
+from app.column_buffer import ColumnBuffer
+from app.model import get_data_from_file, get_layouts, iter_decode
+from app.pcap_reader import read_packets, read_packets_dpkt
+
+START_US = 1_700_000_000_123_457
+INTERVAL_US = 2000
+
+# Структуры пакетов прежних декодеров get_data_from_file_1 и get_data_from_file_2
+_LEGACY_DTYPES = {
+    '1': np.dtype([
+        ('pack_header', np.uint8, 43),
+        ('data_vi', np.uint8, 1024),
+        ('null_bytes', np.uint8, 2),
+        ('arinc_data', np.uint16, 9),
+        ('bit_data', np.uint8, 9),
+        ('null_bytes2', np.uint8, (1, )),
+        ('data_main', np.int16, 41),
+        ('null_bytes3', np.uint8, 58),
+        ('time_src', np.uint32, (1, )),
+        ('null_bytes4', np.uint8, 33)
+    ]).newbyteorder('>'),
+    '2': np.dtype([
+        ('pack_header', np.uint8, 43),
+        ('data_vi', np.uint8, 1024),
+        ('null_bytes', np.uint8, 2),
+        ('data_main', np.uint16, 12),
+        ('null_bytes2', np.uint8, 81)
+    ]).newbyteorder('>'),
+}
+
+
+def legacy_decode(filepath: str, layout: str) -> dict[str, np.ndarray]:
+    '''
+    Поля пакетов, прочитанных через dpkt и разобранных структурой
+    прежнего декодера, под названиями полей реестра форматов.
+    '''
+    packets = read_packets_dpkt(filepath, get_layouts()[layout].length)
+    data = np.frombuffer(packets.data.tobytes(), dtype=_LEGACY_DTYPES[layout])
+    if layout == '1':
+        return {name: data[name] for name in ('data_vi', 'data_main', 'time_src',
+                                              'arinc_data', 'bit_data')}
+    # прежний декодер приводил последние 4 столбца к int16
+    return {
+        'data_vi': data['data_vi'],
+        'data_main': data['data_main'][:, :8],
+        'data_main_signed': data['data_main'][:, 8:].astype(np.int16),
+    }
+
+
+def decode(filepath: str, num_func: str, chunk_size: int = 65536) -> dict[str, np.ndarray]:
+    buffer = ColumnBuffer()
+    for _ in iter_decode(filepath, num_func, buffer, chunk_size):
+        pass
+    return buffer.columns()
+
+
+@pytest.mark.parametrize('fmt', ['pcap', 'pcapng'])
+@pytest.mark.parametrize('layout', ['1', '2'])
+def test_matches_legacy_decoder(capture, layout, fmt):
+    filepath = capture(3000, layout, fmt, start_us=START_US, interval_us=INTERVAL_US)
+    columns = decode(filepath, layout, chunk_size=1000)
+    legacy = legacy_decode(filepath, layout)
+    assert len(columns['time']) == 3000
+    for kind, name, params in get_layouts()[layout]._plan:
+        expected = legacy[name]
+        if kind == 'columns':
+            for i, column in enumerate(params):
+                assert columns[column].dtype == expected.dtype.newbyteorder('=')
+                np.testing.assert_array_equal(columns[column], expected[:, i])
+        elif kind == 'bits':
+            for i, names in enumerate(params):
+                for bit, column in enumerate(names):
+                    np.testing.assert_array_equal(
+                        columns[column], (expected[:, i] >> bit) & 1 == 1
+                    )
+        else:
+            np.testing.assert_array_equal(columns[name], expected)
+
+
+@pytest.mark.parametrize('fmt', ['pcap', 'pcapng'])
+def test_timestamps_are_exact(capture, fmt):
+    filepath = capture(1000, '2', fmt, start_us=START_US, interval_us=INTERVAL_US)
+    columns = decode(filepath, '2')
+    expected = (START_US + np.arange(1000, dtype=np.int64) * INTERVAL_US) * 1000
+    np.testing.assert_array_equal(columns['timestamp'], expected)
+    np.testing.assert_allclose(columns['time'], np.arange(1000) * INTERVAL_US * 1e-6)
+    # dpkt переводит метки через float и ошибается не больше чем на микросекунду
+    dpkt_timestamps = read_packets_dpkt(filepath, get_layouts()['2'].length).timestamps
+    assert np.abs(dpkt_timestamps - expected).max() < 1000
+
+
+def test_binary_timestamp_resolution(capture, tmp_path):
+    '''
+    Интерфейс pcapng с if_tsresol = 2**-20 с: метки переводятся
+    в наносекунды целочисленно.
+    '''
+    source = capture(100, '2', 'pcapng', start_us=START_US, interval_us=INTERVAL_US)
+    with open(source, 'rb') as f:
+        content = f.read()
+    # опция if_tsresol (код 9, длина 1, дополнение до 4 байт) и opt_endofopt
+    options = (np.array([9, 1], '<u2').tobytes() + bytes([0x80 | 20, 0, 0, 0])
+               + bytes(4))
+    length = 20 + len(options)
+    idb = (np.array([1, length], '<u4').tobytes() + np.array([1, 0], '<u2').tobytes()
+           + np.array([65535], '<u4').tobytes() + options
+           + np.array([length], '<u4').tobytes())
+    filepath = str(tmp_path / 'tsresol.pcapng')
+    with open(filepath, 'wb') as f:
+        f.write(content[:28] + idb + content[48:])
+    units = START_US + np.arange(100) * INTERVAL_US
+    expected = [int(value) * 10**9 // 2**20 for value in units]
+    packets = read_packets(filepath, get_layouts()['2'].length)
+    assert packets.timestamps.tolist() == expected
+
+
+def test_get_data_from_file(capture):
+    filepath = capture(500, '1', 'pcapng')
+    data, data_vi = get_data_from_file(filepath)
+    legacy = legacy_decode(filepath, '1')
+    assert len(data) == 500
+    np.testing.assert_array_equal(data_vi, legacy['data_vi'])
+    np.testing.assert_array_equal(data['MD'], legacy['data_main'][:, 0])
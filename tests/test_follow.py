@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from app.controller import DataController
+
+from .helpers import assert_same_data
+
+
+@pytest.mark.parametrize('fmt', ['pcap', 'pcapng'])
+def test_incremental_decode(capture, tmp_path, fmt):
+    source = capture(2000, '1', fmt)
+    with open(source, 'rb') as f:
+        content = f.read()
+    filepath = str(tmp_path / f'growing.{fmt}')
+    # части обрываются посреди записи: неполная запись откладывается
+    cuts = [len(content) // 7, len(content) // 3 + 5, len(content) // 3 + 9, len(content)]
+    with open(filepath, 'wb') as f:
+        f.write(content[:cuts[0]])
+    ctrl = DataController(use_cache=False)
+    ctrl.read_data_from_file(filepath, '1', follow=True)
+    assert ctrl.is_following()
+    rows = len(ctrl._table.data)
+    for start, stop in zip(cuts, cuts[1:]):
+        with open(filepath, 'ab') as f:
+            f.write(content[start:stop])
+        new_rows = ctrl.read_new_data()
+        assert new_rows == len(ctrl._table.data) - rows
+        rows += new_rows
+    assert rows == 2000
+    assert ctrl.read_new_data() == 0
+
+    expected = DataController(use_cache=False)
+    expected.read_data_from_file(source, '1')
+    assert_same_data(ctrl, expected)
+    np.testing.assert_allclose(ctrl.get_column('time'), np.arange(2000) * 0.002)
+
+
+def test_last_frame_follows_new_data(capture, tmp_path):
+    source = capture(1000, '2', 'pcap')
+    with open(source, 'rb') as f:
+        content = f.read()
+    filepath = str(tmp_path / 'growing.pcap')
+    with open(filepath, 'wb') as f:
+        f.write(content[:len(content) // 2])
+    ctrl = DataController(use_cache=False)
+    ctrl.read_data_from_file(filepath, '2', follow=True)
+    rows = len(ctrl._table.data)
+    ctrl.set_next_time_index(num=rows - 1)
+    assert ctrl.get_time_index() == rows - 1
+    with open(filepath, 'ab') as f:
+        f.write(content[len(content) // 2:])
+    ctrl.read_new_data()
+    assert ctrl.get_time_index() == 999
@@ -0,0 +1,39 @@
+import numpy as np
+
+from app.lod import LodPyramid, TileCache
+
+
+def test_query_matches_raw():
+    size = 200_000
+    rng = np.random.default_rng(0)
+    time = np.arange(size) * 0.002
+    values = np.cumsum(rng.normal(size=size)).astype(np.float32)
+    # выбросы рядом с краями диапазонов не должны попадать в соседние окна
+    values[rng.integers(0, size, 50)] = 1e6
+    lod = LodPyramid(time, values)
+    tiles = TileCache()
+    for _ in range(50):
+        t0, t1 = np.sort(rng.uniform(0, time[-1], 2))
+        x, y = lod.query(t0, t1, 1000, tiles)
+        start = max(int(np.searchsorted(time, t0, 'left')) - 1, 0)
+        end = min(int(np.searchsorted(time, t1, 'right')) + 1, size)
+        visible = values[start:end]
+        # блоки на общей сетке: не больше одного лишнего блока с каждого края
+        assert len(y) <= 1000 + 4
+        assert x[0] == time[start]
+        assert y.min() == visible.min() and y.max() == visible.max()
+
+
+def test_extend_matches_rebuild():
+    size = 100_000
+    rng = np.random.default_rng(1)
+    time = np.arange(size) * 0.002
+    values = rng.integers(-1000, 1000, size).astype(np.int16)
+    lod = LodPyramid(time[:30_000], values[:30_000])
+    lod.extend(time, values)
+    full = LodPyramid(time, values)
+    assert len(lod.levels) == len(full.levels)
+    for (bucket, mins, maxs), (full_bucket, full_mins, full_maxs) in zip(lod.levels, full.levels):
+        assert bucket == full_bucket
+        np.testing.assert_array_equal(mins, full_mins)
+        np.testing.assert_array_equal(maxs, full_maxs)
@@ -0,0 +1,40 @@
+import pytest
+
+from app.controller import DataController
+from benchmarks.synthetic import write_capture
+
+from .helpers import assert_same_data
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    dirpath = tmp_path / 'records'
+    dirpath.mkdir()
+    start_us = 1_700_000_000_000_000
+    # файлы перечислены не в порядке времени, между ними пропуски
+    for i, (layout, fmt, count) in enumerate([
+        ('1', 'pcap', 3000), ('2', 'pcapng', 1500), ('1', 'pcapng', 2500)
+    ]):
+        write_capture(
+            str(dirpath / f'{2 - i}.{fmt}'), count, layout, fmt,
+            start_us=start_us + i * 20_000_000, seed=i
+        )
+    return str(dirpath)
+
+
+def test_matches_in_memory(data_dir, cache_dir):
+    in_memory = DataController(cache_dir)
+    in_memory.read_data_from_dir(data_dir, out_of_core=False)
+    assert in_memory._store is None
+    assert len(in_memory._table.data) == 7000
+    out_of_core = DataController(cache_dir)
+    out_of_core.read_data_from_dir(data_dir, out_of_core=True, memory_budget=1 << 20)
+    assert out_of_core._store is not None
+    assert not in_memory.load_errors and not out_of_core.load_errors
+    assert_same_data(out_of_core, in_memory)
+    assert len(in_memory.get_gaps()) == 2
+
+    # повторное открытие берет столбцы из хранилища
+    reopened = DataController(cache_dir)
+    reopened.read_data_from_dir(data_dir, out_of_core=True, memory_budget=1 << 20)
+    assert_same_data(reopened, in_memory)
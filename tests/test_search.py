@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from app.search import Condition, find_intervals
+
+CHANNELS = ['EH', 'EA', 'z_RIP']
+
+
+@pytest.mark.parametrize('expression', [
+    'EH.real > 0',
+    '__import__("os").system("true")',
+    'len(EH) > 0',
+    'abs(EH, 1) > 0',
+    'abs(x=EH) > 0',
+    'EH[0] > 0',
+    '(lambda: 1)()',
+    '[EH for EH in EA]',
+    'EH > "1"',
+    'EH ** 2 > 0',
+    'EH > 0 if EA else EA',
+    'unknown > 0',
+    'EH >',
+])
+def test_rejects(expression):
+    with pytest.raises(ValueError):
+        Condition(expression, CHANNELS)
+
+
+@pytest.mark.parametrize('expression', [
+    'EH > 3 and z_RIP == 1',
+    '-1 < EA <= 2 or not z_RIP',
+    '(EH > 0) & ~(abs(EA) % 2 == 0)',
+])
+def test_accepts(expression):
+    condition = Condition(expression, CHANNELS)
+    assert set(condition.names) <= set(CHANNELS)
+    # одинаковые условия с разными пробелами совпадают
+    assert Condition(' '.join(expression.split()) + '  ', CHANNELS).key == condition.key
+
+
+def test_find_intervals():
+    size = 10_000
+    rng = np.random.default_rng(0)
+    values = {
+        'EH': rng.normal(size=size).cumsum(),
+        'EA': rng.integers(-5, 5, size),
+        'z_RIP': rng.random(size) < 0.5,
+    }
+    condition = Condition('EH > 3 and (z_RIP or abs(EA) < 2)', CHANNELS)
+    intervals = find_intervals(
+        condition, lambda name, start, stop: values[name][start:stop], size, chunk_rows=777
+    )
+    expected = (values['EH'] > 3) & (values['z_RIP'] | (np.abs(values['EA']) < 2))
+    mask = np.zeros(size, bool)
+    for start, stop in intervals:
+        assert start < stop
+        mask[start:stop] = True
+    np.testing.assert_array_equal(mask, expected)
+    # интервалы не соприкасаются и на границах частей
+    assert np.all(intervals[1:, 0] > intervals[:-1, 1])
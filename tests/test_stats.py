@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from app.stats import DISTINCT_LIMIT, ChannelStats, update_stats
+from app.transitions import Transitions
+
+
+@pytest.mark.parametrize('dtype', [np.int16, np.float32, np.float64])
+def test_chunked_update_matches_numpy(dtype):
+    rng = np.random.default_rng(0)
+    values = (rng.normal(1000, 50, 100_000)).astype(dtype)
+    if values.dtype.kind == 'f':
+        values[rng.integers(0, len(values), 100)] = np.nan
+    stats = ChannelStats()
+    for pos in range(0, len(values), 7919):
+        stats.update(values[pos:pos + 7919])
+    result = stats.result(0.5)
+    finite = values[~np.isnan(values)] if values.dtype.kind == 'f' else values
+    reference = finite.astype(np.float64) * 0.5
+    assert result['count'] == len(finite)
+    assert result['nan'] == len(values) - len(finite)
+    assert result['min'] == reference.min() and result['max'] == reference.max()
+    assert result['mean'] == pytest.approx(reference.mean(), rel=1e-12)
+    assert result['std'] == pytest.approx(reference.std(), rel=1e-9)
+    assert result['distinct'] == (None if len(np.unique(finite)) > DISTINCT_LIMIT
+                                  else len(np.unique(finite)))
+
+
+def test_negative_coef():
+    stats = ChannelStats()
+    stats.update(np.array([1, 2, 3], np.int16))
+    result = stats.result(-2.0)
+    assert (result['min'], result['max']) == (-6.0, -2.0)
+    assert result['std'] == pytest.approx(np.std([2, 4, 6]))
+
+
+def test_runs_match_expanded():
+    rng = np.random.default_rng(1)
+    values = np.logical_xor.accumulate(rng.random(50_000) < 0.01)
+    flag = Transitions()
+    flag.extend(values)
+    by_runs = update_stats({'z': flag}, 0, len(values), chunk_rows=3001)['z'].result()
+    by_values = update_stats({'z': values}, 0, len(values), chunk_rows=3001)['z'].result()
+    assert by_runs['count'] == by_values['count'] == len(values)
+    assert by_runs['distinct'] == by_values['distinct'] == 2
+    for name in ('min', 'max', 'mean', 'std'):
+        assert by_runs[name] == pytest.approx(by_values[name], rel=1e-12)
+
+
+def test_incremental_update():
+    rng = np.random.default_rng(2)
+    values = rng.integers(0, 100, 20_000).astype(np.uint16)
+    first = update_stats({'a': values}, 0, 12_345)
+    total = update_stats({'a': values}, 12_345, len(values), first)
+    # накопители предыдущих строк не изменяются
+    assert first['a'].count == 12_345
+    result = total['a'].result()
+    assert result['count'] == len(values)
+    assert result['mean'] == pytest.approx(values.mean(), rel=1e-12)
+    assert result['std'] == pytest.approx(values.std(), rel=1e-9)
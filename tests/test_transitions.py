@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from app.transitions import Transitions
+
+
+def make_flag(size: int, seed: int = 0, rate: float = 0.01) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return np.logical_xor.accumulate(rng.random(size) < rate)
+
+
+def test_extend_and_expand():
+    values = make_flag(10_000)
+    flag = Transitions()
+    for stop in (0, 1, 2500, 2501, 10_000):
+        flag.extend(values[:stop])
+        assert len(flag) == stop
+        np.testing.assert_array_equal(flag.expand(), values[:stop])
+    assert flag.starts[0] == 0
+    np.testing.assert_array_equal(flag.values[1:] != flag.values[:-1], True)
+    for start, stop in ((0, 1), (17, 4000), (9999, 10_000), (5000, 5000)):
+        np.testing.assert_array_equal(flag.expand(start, stop), values[start:stop])
+
+
+def test_from_runs():
+    values = make_flag(5000, seed=1)
+    flag = Transitions()
+    flag.extend(values)
+    restored = Transitions.from_runs(flag.starts.copy(), flag.values.copy(), flag.size)
+    np.testing.assert_array_equal(restored.expand(), values)
+    values_runs, lengths = restored.runs(100, 3000)
+    assert lengths.sum() == 2900
+    np.testing.assert_array_equal(np.repeat(values_runs, lengths), values[100:3000])
+
+
+def test_next_transition():
+    values = make_flag(5000, seed=2)
+    flag = Transitions()
+    flag.extend(values)
+    changes = np.flatnonzero(values[1:] != values[:-1]) + 1
+    for index in (0, int(changes[0]), int(changes[3]) - 1, 4999):
+        after = changes[changes > index]
+        before = changes[changes < index]
+        assert flag.next_transition(index) == (int(after[0]) if len(after) else None)
+        assert flag.next_transition(index, backward=True) == (
+            int(before[-1]) if len(before) else None
+        )
+
+
+@pytest.mark.parametrize('max_points', [20, 200, 100_000])
+def test_query_matches_raw(max_points):
+    size = 50_000
+    values = make_flag(size, seed=3, rate=0.02)
+    time = np.arange(size) * 0.002
+    flag = Transitions()
+    flag.extend(values)
+    rng = np.random.default_rng(4)
+    for _ in range(50):
+        t0, t1 = np.sort(rng.uniform(0, time[-1], 2))
+        x, y = flag.query(time, t0, t1, max_points)
+        start = max(int(np.searchsorted(time, t0, 'left')) - 1, 0)
+        end = min(int(np.searchsorted(time, t1, 'right')) + 1, size)
+        visible = values[start:end]
+        # блоки на общей сетке: не больше одного лишнего блока с каждого края
+        assert len(y) <= max_points + 4
+        assert x[0] == time[start]
+        # ни одна точка не выходит за значения видимых строк
+        assert y.min() == visible.min() and y.max() == visible.max()
+        if max_points >= 2 * len(visible):
+            # без прореживания - точные ступени
+            rows = np.searchsorted(time, x[::2])
+            np.testing.assert_array_equal(y[::2], values[rows])
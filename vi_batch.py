@@ -0,0 +1,83 @@
+'''
+Пакетная обработка записей без графического интерфейса: декодирование
+файлов и папок в нескольких процессах, сводка и статистика каналов
+каждого файла и, по желанию, преобразование в Parquet/HDF5/CSV.
+
+Отчет в JSON (--report, "-" - стандартный вывод) перечисляет результат
+каждого файла. Код завершения: 0 - все файлы обработаны, 1 - часть файлов
+не обработана, 2 - ошибка параметров или нет файлов.
+
+Запуск: python vi_batch.py captures/ extra.pcap --output-dir out --convert .parquet
+        python vi_batch.py captures/ --report - --jobs 4 > report.json
+'''
+import argparse
+import json
+import multiprocessing
+import sys
+
+from app.formats import AUTO, layout_titles
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help='файлы и папки с записями')
+    parser.add_argument('--format', default=AUTO, choices=[AUTO, *layout_titles()],
+                        help='формат пакетов, по умолчанию по длине пакета')
+    parser.add_argument('--jobs', type=int, help='количество процессов, по умолчанию по числу ядер')
+    parser.add_argument('--output-dir', help='папка для сводок файлов и преобразованных файлов')
+    parser.add_argument('--convert', metavar='EXT',
+                        help='преобразовать файлы в .parquet, .h5 или .csv (нужен --output-dir)')
+    parser.add_argument('--with-vi', action='store_true',
+                        help='записывать кадры data_vi в преобразованные файлы')
+    parser.add_argument('--report', default='report.json',
+                        help='файл отчета JSON, "-" - стандартный вывод')
+    parser.add_argument('--cache-dir',
+                        help='папка кэша декодирования, по умолчанию кэш не используется')
+    parser.add_argument('--quiet', action='store_true', help='не выводить ход обработки')
+    args = parser.parse_args()
+
+    # модули декодирования импортируются после разбора параметров,
+    # чтобы --help и ошибки параметров не ждали загрузки pandas
+    from app.batch import batch_report, capture_files, run_batch
+
+    def progress(result: dict, done: int, total: int) -> None:
+        if args.quiet:
+            return
+        if result['status'] == 'ok':
+            text = f'{result["packets"]} пакетов, {result["seconds"]:.2f} с'
+        else:
+            text = f'ошибка: {result["error"]}'
+        print(f'[{done}/{total}] {result["path"]}: {text}', file=sys.stderr)
+
+    try:
+        files = capture_files(args.paths)
+        if not files:
+            raise ValueError('Нет файлов для обработки')
+        results = run_batch(
+            files, args.format, args.output_dir, args.convert, args.with_vi,
+            args.jobs, progress, args.cache_dir
+        )
+    except (OSError, ValueError) as error:
+        print(f'Ошибка: {error}', file=sys.stderr)
+        return EXIT_USAGE
+
+    report = batch_report(results, args.format)
+    if args.report == '-':
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=1)
+        print()
+    else:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+    if not args.quiet:
+        print(f'Обработано файлов: {report["ok"]} из {report["files"]}', file=sys.stderr)
+    return EXIT_FAILED if report['failed'] else EXIT_OK
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
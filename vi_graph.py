@@ -1,17 +1,28 @@
+import multiprocessing
 import sys
 
-from PyQt5.QtWidgets import QApplication
-
-from app.view import MainWindow
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QPixmap
+from PyQt5.QtWidgets import QApplication, QSplashScreen
 
 
 def main() -> None:
     app = QApplication(sys.argv)
     app.setStyle('Fusion')
+    # заставка видна, пока импортируется и строится главное окно;
+    # модули чтения данных и графиков загружаются уже после его появления
+    splash = QSplashScreen(QPixmap('icon.ico'))
+    splash.showMessage('Загрузка...', Qt.AlignBottom | Qt.AlignHCenter)
+    splash.show()
+    app.processEvents()
+
+    from app.view import MainWindow
     main_window = MainWindow(app=app)
     main_window.show()
+    splash.finish(main_window)
     app.exec_()
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     main()